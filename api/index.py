@@ -1,14 +1,17 @@
 import sys
 import os
-from flask import Flask, jsonify, send_from_directory
+from flask import Flask, jsonify
 import traceback
 
 # Add the backend directory to Python path
 backend_path = os.path.join(os.path.dirname(__file__), '..', 'backend')
 sys.path.insert(0, backend_path)
 
-# Create a simple app first with static files in the backend/static directory
-app = Flask(__name__, static_folder='../backend/static', static_url_path='')
+from static_assets import StaticManifest
+
+# Create a simple app first; static files are served from the manifest below,
+# not Flask's built-in static route
+app = Flask(__name__, static_folder=None)
 app.config['DEBUG'] = True
 
 @app.route('/health')
@@ -51,28 +54,26 @@ def debug():
         "api_dir_files": os.listdir(os.path.dirname(__file__)),
         "backend_exists": os.path.exists(backend_path),
         "backend_files": os.listdir(backend_path) if os.path.exists(backend_path) else "not found",
-        "static_path": app.static_folder,
-        "static_exists": os.path.exists(app.static_folder) if app.static_folder else False,
+        "static_path": static_manifest.roots[0],
+        "static_exists": os.path.exists(static_manifest.roots[0]),
         "static_directories": static_info,
+        "static_manifest_files": len(static_manifest.assets),
         "available_routes": routes_info
     }
 
+# Every static file, resolved once across the candidate directories (first match wins)
+static_manifest = StaticManifest([
+    os.path.join(os.path.dirname(__file__), static_dir)
+    for static_dir in ['../backend/static', '../frontend/dist', './static', '../static']
+])
+
 # Simple route to serve the frontend
 @app.route('/')
 def index():
     try:
-        # Try to serve from multiple possible locations (prioritize existing ones)
-        static_dirs = [
-            '../backend/static',  # This exists according to debug
-            '../frontend/dist',
-            './static',
-            '../static'
-        ]
-        
-        for static_dir in static_dirs:
-            index_path = os.path.join(os.path.dirname(__file__), static_dir, 'index.html')
-            if os.path.exists(index_path):
-                return send_from_directory(os.path.join(os.path.dirname(__file__), static_dir), 'index.html')
+        response = static_manifest.serve('/index.html')
+        if response is not None:
+            return response
         
         # If no static files found, return a basic HTML page
         return '''
@@ -88,27 +89,7 @@ def index():
     except Exception as e:
         return f"Error serving index: {str(e)}", 500
 
-# Route to serve static assets (CSS, JS files)
-@app.route('/assets/<path:filename>')
-def serve_assets(filename):
-    try:
-        static_dirs = [
-            '../backend/static/assets',  # This exists according to debug
-            '../frontend/dist/assets',
-            './static/assets', 
-            '../static/assets'
-        ]
-        
-        for static_dir in static_dirs:
-            asset_path = os.path.join(os.path.dirname(__file__), static_dir, filename)
-            if os.path.exists(asset_path):
-                return send_from_directory(os.path.join(os.path.dirname(__file__), static_dir), filename)
-        
-        return f"Asset not found: {filename}", 404
-    except Exception as e:
-        return f"Error serving asset {filename}: {str(e)}", 500
-
-# Catch-all route for any other static files
+# Static assets (CSS, JS files) and any other static file, one manifest lookup each
 @app.route('/<path:filename>')
 def serve_static_files(filename):
     # Skip API routes
@@ -116,37 +97,18 @@ def serve_static_files(filename):
         return "Not found", 404
     
     try:
-        static_dirs = [
-            '../frontend/dist',
-            '../backend/static',
-            './static',
-            '../static'
-        ]
-        
-        for static_dir in static_dirs:
-            file_path = os.path.join(os.path.dirname(__file__), static_dir, filename)
-            if os.path.exists(file_path):
-                return send_from_directory(os.path.join(os.path.dirname(__file__), static_dir), filename)
-        
+        response = static_manifest.serve('/' + filename)
+        if response is not None:
+            return response
         return f"File not found: {filename}", 404
     except Exception as e:
         return f"Error serving file {filename}: {str(e)}", 500
 
 try:
-    # Try to import the main app's API routes
-    from app import app as main_app
-    
-    # Copy the API routes from main app (look for URLs starting with /api/)
-    for rule in main_app.url_map.iter_rules():
-        if rule.rule.startswith('/api/'):  # Only copy API routes based on URL path
-            app.add_url_rule(
-                rule.rule, 
-                rule.endpoint + '_imported',  # Rename endpoint to avoid conflicts
-                main_app.view_functions[rule.endpoint],
-                methods=rule.methods
-            )
-    
-    print("Successfully imported API routes from main app")
+    # Mount the main app's API blueprint; importing it makes no RPC calls
+    from app import api
+    app.register_blueprint(api)
+    print("Successfully registered API routes from main app")
     
 except Exception as e:
     print(f"Failed to import main app: {str(e)}")
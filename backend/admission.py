@@ -0,0 +1,199 @@
+"""Admission control for the claim endpoints.
+
+A claim holds a worker for as long as its RPC calls take, so under a spike
+queueing every request only makes all of them slow and then time out.
+Claims are admitted instead through a token bucket sized to what the hot
+wallets can actually broadcast, then a concurrency limit with a short,
+bounded wait queue. Anything over either limit is refused at once with 503
+and a Retry-After computed from the bucket refill or the queue length.
+
+Only the claim endpoints are limited: /api/status, /metrics, claim status
+lookups and static files never wait behind claims.
+"""
+import logging
+import math
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+from logs import log_fields
+from metrics import CLAIMS_SHED_TOTAL
+from rate_limit import USE_REDIS
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Reasons a claim was shed, for CLAIMS_SHED_TOTAL
+SHED_RATE = "rate"
+SHED_QUEUE_FULL = "queue_full"
+SHED_QUEUE_TIMEOUT = "queue_timeout"
+
+
+class MemoryTokenBucket:
+    """Token bucket for one process: `rate` tokens per second, at most `burst` saved up"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, cost=1):
+        """0 if `cost` tokens were taken, otherwise seconds until they will be available"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= cost:
+                self._tokens -= cost
+                return 0
+            return (cost - self._tokens) / self.rate
+
+
+class RedisTokenBucket:
+    """Token bucket shared by every web process, refilled and taken in one script"""
+
+    _TAKE_SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local cost = tonumber(ARGV[4])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - updated) * rate / 1000)
+    local wait = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+    else
+        wait = math.ceil((cost - tokens) * 1000 / rate)
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+    return wait
+    """
+
+    def __init__(self, client, rate, burst, key="faucet:admission"):
+        self.rate = rate
+        self.burst = burst
+        self.key = key
+        self._take = client.register_script(self._TAKE_SCRIPT)
+
+    def take(self, cost=1):
+        # Millisecond wall clock, shared by every host; the script returns milliseconds to wait
+        wait_ms = self._take(keys=[self.key], args=[self.rate, self.burst, int(time.time() * 1000), cost])
+        return int(wait_ms) / 1000
+
+
+def create_token_bucket(rate, burst):
+    """Redis-backed bucket when Redis is available, in-process otherwise; None when rate <= 0"""
+    if rate <= 0:
+        return None
+    if USE_REDIS:
+        from rate_limit import redis_client
+        return RedisTokenBucket(redis_client, rate, burst)
+    return MemoryTokenBucket(rate, burst)
+
+
+class AdmissionController:
+    """Token bucket, then at most `max_concurrent` claims with a FIFO queue of `max_queue`.
+
+    A queued claim waits up to `queue_timeout` seconds for a slot. Freed
+    slots are handed straight to the oldest waiter, so new arrivals cannot
+    overtake the queue.
+    """
+
+    def __init__(self, bucket=None, max_concurrent=16, max_queue=32, queue_timeout=2.0):
+        self.bucket = bucket
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        # Moving average of how long an admitted claim holds its slot, for Retry-After
+        self._service_time = 1.0
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    def _queue_wait(self, position):
+        # Time until `position` claims ahead of a new arrival have been served
+        return position * self._service_time / self.max_concurrent
+
+    def acquire(self, cost=1):
+        """(None, None) once admitted, otherwise (reason, seconds to wait before retrying)"""
+        if self.bucket is not None:
+            wait = self.bucket.take(cost)
+            if wait > 0:
+                return SHED_RATE, wait
+
+        with self._lock:
+            if self.in_flight < self.max_concurrent:
+                self.in_flight += 1
+                return None, None
+            if len(self._waiters) >= self.max_queue:
+                return SHED_QUEUE_FULL, self._queue_wait(len(self._waiters) + 1)
+            granted = threading.Event()
+            self._waiters.append(granted)
+
+        if granted.wait(self.queue_timeout):
+            return None, None
+        with self._lock:
+            # The slot may have been handed over just as the wait timed out
+            if granted.is_set():
+                return None, None
+            self._waiters.remove(granted)
+            return SHED_QUEUE_TIMEOUT, self._queue_wait(len(self._waiters) + 1)
+
+    def release(self, held):
+        """Free a slot held for `held` seconds, passing it to the oldest waiter if any"""
+        with self._lock:
+            self._service_time += 0.1 * (held - self._service_time)
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self.in_flight -= 1
+
+    def status(self):
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "rate": self.bucket.rate if self.bucket else None,
+        }
+
+
+def overloaded_response(wait):
+    retry_after = max(1, math.ceil(wait))
+    return {
+        "error": f"The faucet is handling too many claims. Try again in {retry_after} seconds.",
+        "retry_after": retry_after,
+    }, 503, {"Retry-After": str(retry_after)}
+
+
+def admitted(controller, cost=None):
+    """Decorator for a claim endpoint: 503 with Retry-After unless `controller` admits it.
+
+    `cost()`, when given, is the number of transfers the request asks for.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            reason, wait = controller.acquire(cost() if cost else 1)
+            if reason is not None:
+                CLAIMS_SHED_TOTAL.inc(reason=reason)
+                log_fields(shed=reason)
+                logger.debug("Shed claim (%s), retry in %.2fs", reason, wait)
+                return overloaded_response(wait)
+            started = time.perf_counter()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                controller.release(time.perf_counter() - started)
+        return wrapper
+    return decorator
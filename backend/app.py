@@ -1,274 +1,445 @@
-from flask import Flask, request, jsonify, send_from_directory, send_file
+from flask import Blueprint, Flask, Response, request, jsonify
 from flask_cors import CORS
 from web3 import Web3
 from dotenv import load_dotenv
 import os
+import hmac
+import json
 import logging
-from tokens import TOKENS
-from rate_limit import check_rate_limit
+import re
+import sqlite3
+import time
+import redis
+from functools import wraps
+from rate_limit import (
+    check_rate_limit, check_rate_limits, check_redis, format_duration,
+    clear_rate_limits, clear_rate_limits_with_prefix, get_rate_limit_statuses, scan_rate_limits,
+    LIMIT_COOLDOWN, LIMIT_WALLET, LIMIT_IP, LIMIT_GLOBAL,
+)
+from disburse import (
+    w3, FAUCET_ADDRESS, chain_info, token_registry, wallet_pool, fee_oracle, tx_tracker,
+    BATCH_CONTRACT, disburse_batch, disburse_claim, disburse_multi, has_balance_for, ledger,
+)
+from claims import create_claim_queue, create_claim_workers, outcome_fields, FAILED, UNKNOWN
+from static_assets import StaticManifest
+from idempotency import create_idempotency_store, idempotency_key
+from admission import AdmissionController, admitted, create_token_bucket
+from logs import configure_logging, log_fields, logged_claim
+from metrics import CLAIM_STAGE_SECONDS, CLAIMS_TOTAL, CLAIM_ERRORS_TOTAL, CONTENT_TYPE, INSUFFICIENT_BALANCE, REGISTRY, Gauge
 
 load_dotenv()
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__, static_folder='static')
-CORS(app)  # Enable CORS for all routes
+# API routes live on a blueprint so api/index.py can mount them directly
+api = Blueprint("api", __name__)
+
+
+def default_claim_mode():
+    """Sync on serverless platforms, unless worker.py drains a shared Redis queue elsewhere"""
+    # Vercel sets VERCEL=1; its functions freeze after responding, so in-process workers never run
+    external_workers = os.getenv("REDIS_URL") and os.getenv("CLAIM_WORKERS") == "0"
+    return "sync" if os.getenv("VERCEL") and not external_workers else "async"
+
+
+# "async" answers 202 and lets the workers disburse; "sync" disburses inline
+# for platforms that cannot run background workers
+CLAIM_MODE = os.getenv("CLAIM_MODE") or default_claim_mode()
+
+
+claim_queue = create_claim_queue()
+# Set CLAIM_WORKERS=0 when worker.py runs the disbursement side separately
+claim_workers = create_claim_workers(
+    claim_queue, disburse_claim,
+    batch_handler=disburse_batch if BATCH_CONTRACT else None,
+    multi_handler=disburse_multi,
+    count=int(os.getenv("CLAIM_WORKERS", "2")),
+)
+# Receipts and replacements found by the tracker are written back to the claims
+tx_tracker.on_update = claim_queue.update
+if ledger is not None:
+    claim_queue.on_change = ledger.record
+
+# Completed claim responses are replayed to duplicates for this many seconds
+idempotency_store = create_idempotency_store(ttl=int(os.getenv("IDEMPOTENCY_TTL", "600")))
+# How long a duplicate waits for the original request before giving up with 409
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", "30"))
+
+# Claims per second the hot wallets can broadcast; beyond it claims are shed with 503.
+# Defaults to 10 per hot wallet; ADMISSION_RATE=0 turns the bucket off
+ADMISSION_RATE = float(os.getenv("ADMISSION_RATE", str(10 * len(wallet_pool))))
+admission = AdmissionController(
+    create_token_bucket(ADMISSION_RATE, burst=float(os.getenv("ADMISSION_BURST", str(2 * ADMISSION_RATE)))),
+    max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", "16")),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "32")),
+    queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2")),
+)
+
+
+# Bearer token required by every /api/admin/* route; unset, they are refused outright
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+@api.before_request
+def require_admin_token():
+    if not request.path.startswith("/api/admin/"):
+        return None
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Admin endpoints are disabled; set ADMIN_TOKEN to enable them"}), 403
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        logger.warning(f"Rejected admin request to {request.path} from {request.remote_addr}")
+        return jsonify({"error": "Unauthorized"}), 401, {"WWW-Authenticate": "Bearer"}
+    return None
+
+
+@api.errorhandler(redis.ConnectionError)
+@api.errorhandler(redis.TimeoutError)
+def redis_unavailable(e):
+    """Limits, claims and nonces live in Redis; without it nothing can be checked or sent"""
+    logger.error(f"Redis unavailable during {request.path}: {e}")
+    return jsonify({"error": "The faucet is temporarily unavailable. Try again shortly."}), 503, {"Retry-After": "5"}
+
+
+def batch_cost():
+    # One transfer per distinct token asked for
+    tokens = (request.get_json(silent=True) or {}).get("tokens")
+    return max(1, len(set(map(str, tokens)))) if isinstance(tokens, list) else 1
 
-w3 = Web3(Web3.HTTPProvider(os.getenv("RPC_URL")))
-PRIVATE_KEY = os.getenv("PRIVATE_KEY")
-FAUCET_ADDRESS = Web3.to_checksum_address(os.getenv("FAUCET_ADDRESS"))
-
-# Log connection status with error handling
-try:
-    logger.info(f"Web3 connected: {w3.is_connected()}")
-except Exception as e:
-    logger.warning(f"Could not check connection status: {e}")
-
-try:
-    logger.info(f"Chain ID: {w3.eth.chain_id}")
-except Exception as e:
-    logger.warning(f"Could not get chain ID: {e}")
-
-try:
-    logger.info(f"Latest block: {w3.eth.block_number}")
-except Exception as e:
-    logger.warning(f"Could not get latest block (RPC limitation): {e}")
-
-try:
-    eth_balance = w3.eth.get_balance(FAUCET_ADDRESS) / 10**18
-    logger.info(f"Faucet ETH balance: {eth_balance} ETH")
-except Exception as e:
-    logger.warning(f"Could not get ETH balance: {e}")
-
-# ERC20 ABI (transfer and balanceOf)
-erc20_abi = [{
-    "constant": False,
-    "inputs": [
-        {"name": "_to", "type": "address"},
-        {"name": "_value", "type": "uint256"}
-    ],
-    "name": "transfer",
-    "outputs": [{"name": "", "type": "bool"}],
-    "type": "function"
-}, {
-    "constant": True,
-    "inputs": [
-        {"name": "_owner", "type": "address"}
-    ],
-    "name": "balanceOf",
-    "outputs": [{"name": "balance", "type": "uint256"}],
-    "type": "function"
-}]
-
-
-@app.route("/api/faucet", methods=["POST"])
+
+# Proxies in front of the app that append the address they saw to X-Forwarded-For
+# (1 for Render or Vercel). Set 0 when clients reach the app directly
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "1"))
+
+
+def client_ip():
+    """Caller's IP: the X-Forwarded-For hop added by the outermost trusted proxy.
+
+    Earlier hops are whatever the client sent and are ignored, like
+    werkzeug's ProxyFix with x_for=TRUSTED_PROXIES.
+    """
+    if TRUSTED_PROXIES > 0:
+        hops = [hop.strip() for hop in request.headers.get("X-Forwarded-For", "").split(",") if hop.strip()]
+        if len(hops) >= TRUSTED_PROXIES:
+            return hops[-TRUSTED_PROXIES]
+    return request.remote_addr
+
+
+RATE_LIMIT_MESSAGES = {
+    LIMIT_COOLDOWN: "Rate limit reached for {token}",
+    LIMIT_WALLET: "This wallet has reached its claim limit",
+    LIMIT_IP: "Too many claims from your network",
+    LIMIT_GLOBAL: "The faucet is busy",
+}
+
+
+def rate_limited_response(limit, token):
+    message = RATE_LIMIT_MESSAGES[limit.limit].format(token=token)
+    return {
+        "error": f"{message}. Try again in {format_duration(limit.reset_in)}.",
+        "limit": limit.limit,
+        "retry_after": limit.reset_in,
+    }, 429, {"Retry-After": str(limit.reset_in)}
+
+
+@api.route("/api/faucet", methods=["POST"])
+@logged_claim("claim")
+@admitted(admission)
 def faucet():
+    started = time.perf_counter()
     data = request.json
     wallet = data.get("wallet")
     requested_token = data.get("token")
 
-    logger.info(f"Faucet request received: wallet={wallet}, token={requested_token}")
+    logger.debug("Faucet request received: wallet=%s, token=%s", wallet, requested_token)
 
     if not wallet:
         logger.warning("Faucet request missing wallet address")
         return jsonify({"error": "Missing wallet address"}), 400
+
+    if not isinstance(wallet, str) or not Web3.is_address(wallet):
+        logger.warning(f"Invalid wallet address: {wallet}")
+        return jsonify({"error": f"Invalid wallet address: {wallet}"}), 400
     
     if not requested_token:
         logger.warning("Faucet request missing token selection")
         return jsonify({"error": "Missing token selection"}), 400
 
-    if requested_token not in TOKENS:
+    if not isinstance(requested_token, str) or requested_token not in token_registry:
         logger.warning(f"Invalid token requested: {requested_token}")
         return jsonify({"error": f"Invalid token: {requested_token}"}), 400
 
     wallet = Web3.to_checksum_address(wallet)
+    CLAIM_STAGE_SECONDS.observe(time.perf_counter() - started, stage="validation")
+    log_fields(wallet=wallet, token=requested_token)
 
-    # Rate limit per wallet per token
-    rate_limit_key = f"{wallet}:{requested_token}"
-    if not check_rate_limit(rate_limit_key):
-        logger.warning(f"Rate limit exceeded for {wallet} requesting {requested_token}")
-        return jsonify({"error": f"Rate limit reached for {requested_token}. Try again in 24h."}), 429
+    # Duplicates (double clicks, client retries) share one claim and one response
+    key = idempotency_key(request.headers.get("Idempotency-Key"), wallet, requested_token)
+    (body, status, headers), replayed = idempotency_store.run(
+        key, lambda: submit_claim(wallet, requested_token, client_ip()), wait_timeout=IDEMPOTENCY_WAIT
+    )
+    log_fields(replayed=replayed, claim_id=body.get("claim_id"), claim_status=body.get("status"))
+    if replayed:
+        logger.debug("Replayed response for duplicate claim: wallet=%s, token=%s", wallet, requested_token)
+        headers = dict(headers, **{"Idempotent-Replayed": "true"})
+    return body, status, headers
+
+
+def submit_claim(wallet, requested_token, ip):
+    """Rate-limit and submit one claim; returns (body, status, headers)"""
+    token = token_registry[requested_token]
+
+    # Wallet+token cooldown, wallet, client IP and global limits in one atomic check
+    with CLAIM_STAGE_SECONDS.time(stage="rate_limit"):
+        limit = check_rate_limit(wallet, requested_token, client_ip=ip, cooldown=token.cooldown)
+    if not limit:
+        logger.debug("Rate limit '%s' exceeded for %s requesting %s", limit.limit, wallet, requested_token)
+        CLAIMS_TOTAL.inc(token=requested_token, outcome="rate_limited")
+        log_fields(outcome="rate_limited", limit=limit.limit)
+        return rate_limited_response(limit, requested_token)
+
+    # Cheap local check so claims that cannot be paid are refused up front
+    with CLAIM_STAGE_SECONDS.time(stage="balance_check"):
+        funded = has_balance_for(requested_token)
+    if not funded:
+        CLAIMS_TOTAL.inc(token=requested_token, outcome="unfunded")
+        CLAIM_ERRORS_TOTAL.inc(error=INSUFFICIENT_BALANCE)
+        log_fields(outcome="unfunded", error="insufficient balance")
+        return {"error": f"Faucet doesn't have enough {requested_token} tokens"}, 500, {}
+    CLAIMS_TOTAL.inc(token=requested_token, outcome="accepted")
+    log_fields(outcome="accepted")
+
+    if CLAIM_MODE == "sync":
+        claim = claim_queue.submit(wallet, requested_token, enqueue=False)
+        claim = claim_workers.process(claim)
+        return claim_response(claim)
+
+    claim = claim_queue.submit(wallet, requested_token)
+    logger.debug("Claim %s queued: %s %s to %s", claim["claim_id"], token.amount, requested_token, wallet)
+
+    claim_workers.start()
+    return {
+        "message": f"Claim for {token.amount} {requested_token} queued",
+        "claim_id": claim["claim_id"],
+        "status": claim["status"],
+        "status_url": f"/api/faucet/{claim['claim_id']}",
+        "token": requested_token,
+        "amount": token.amount,
+        "wallet": wallet,
+    }, 202, {}
+
+
+def claim_response(claim):
+    """(body, status, headers) describing a claim"""
+    token = token_registry[claim["token"]]
+    body = {
+        "claim_id": claim["claim_id"],
+        "status": claim["status"],
+        "token": claim["token"],
+        "amount": token.amount,
+        "wallet": claim["wallet"],
+    }
+    if claim["status"] == FAILED:
+        body["error"] = claim["error"]
+        return body, 500, {}
+    if claim["status"] == UNKNOWN:
+        body["error"] = claim["error"]
+        return body, 200, {}
+    if claim["tx_hash"]:
+        body["message"] = f"Successfully sent {token.amount} {claim['token']} tokens"
+        body["tx_hash"] = claim["tx_hash"]
+        body["etherscan_url"] = f"https://sepolia.etherscan.io/tx/{claim['tx_hash']}"
+    return body, 200, {}
+
+
+@api.route("/api/faucet/batch", methods=["POST"])
+@logged_claim("batch_claim")
+@admitted(admission, cost=batch_cost)
+def faucet_batch():
+    started = time.perf_counter()
+    data = request.json
+    wallet = data.get("wallet")
+    requested_tokens = data.get("tokens")
 
-    try:
-        token = TOKENS[requested_token]
-        contract = w3.eth.contract(address=Web3.to_checksum_address(token["address"]), abi=erc20_abi)
+    logger.debug("Batch faucet request received: wallet=%s, tokens=%s", wallet, requested_tokens)
 
-        # Check token balance first
-        try:
-            token_balance = contract.functions.balanceOf(FAUCET_ADDRESS).call()
-            logger.info(f"Faucet {requested_token} balance: {token_balance / 10**token['decimals']}")
-        except Exception as balance_error:
-            logger.warning(f"Could not check token balance: {balance_error}")
+    if not wallet:
+        logger.warning("Batch faucet request missing wallet address")
+        return jsonify({"error": "Missing wallet address"}), 400
 
-        amount = 10 * (10 ** token["decimals"])
-        
-        # Add small random delay to spread out rapid requests
-        import time
-        import random
-        delay = random.uniform(0.1, 0.5)  # 100-500ms random delay
-        logger.info(f"Adding {delay:.2f}s delay to spread out requests")
-        time.sleep(delay)
-        
-        # Get nonce with improved retry logic for rapid transactions
-        max_retries = 5
-        base_delay = 0.2  # Start with 200ms delay
-        
-        for retry in range(max_retries):
-            try:
-                # Use 'pending' to include pending transactions in nonce calculation
-                nonce = w3.eth.get_transaction_count(FAUCET_ADDRESS, 'pending')
-                logger.info(f"Got nonce {nonce} for transaction (attempt {retry + 1})")
-                
-                # Small delay to avoid rapid-fire nonce collisions
-                if retry > 0:
-                    import time
-                    delay = base_delay * (2 ** retry)  # Exponential backoff
-                    logger.info(f"Waiting {delay}s before retry...")
-                    time.sleep(delay)
-                
-                break
-            except Exception as nonce_error:
-                if retry == max_retries - 1:
-                    logger.error(f"Failed to get nonce after {max_retries} attempts: {nonce_error}")
-                    raise nonce_error
-                logger.warning(f"Nonce fetch failed (attempt {retry + 1}/{max_retries}): {nonce_error}")
-                
-                import time
-                delay = base_delay * (2 ** retry)
-                time.sleep(delay)
-
-        logger.info(f"Building transaction: amount={amount}, nonce={nonce}")
-
-        # Check if we have enough tokens
-        try:
-            token_balance = contract.functions.balanceOf(FAUCET_ADDRESS).call()
-            if token_balance < amount:
-                logger.error(f"Insufficient token balance: have {token_balance / 10**token['decimals']}, need {amount / 10**token['decimals']}")
-                return jsonify({"error": f"Faucet doesn't have enough {requested_token} tokens"}), 500
-        except Exception as balance_error:
-            logger.warning(f"Could not verify token balance: {balance_error}")
-
-        tx = contract.functions.transfer(wallet, amount).build_transaction({
-            "from": FAUCET_ADDRESS,
-            "nonce": nonce,
-            "gas": 120000,
-            "gasPrice": w3.to_wei("20", "gwei"),  # Increased gas price
-            "chainId": 11155111  # Sepolia chain ID
-        })
-
-        logger.info(f"Transaction built successfully: {tx}")
-        
-        signed_tx = w3.eth.account.sign_transaction(tx, private_key=PRIVATE_KEY)
-        logger.info(f"Transaction signed, sending to network...")
-        
-        # Handle both old and new Web3.py versions
-        raw_tx = getattr(signed_tx, 'raw_transaction', getattr(signed_tx, 'rawTransaction', None))
-        if raw_tx is None:
-            raise Exception("Could not get raw transaction data")
-        
-        # Send transaction with retry logic for "already known" errors
-        max_tx_retries = 3
-        for tx_retry in range(max_tx_retries):
-            try:
-                tx_hash = w3.eth.send_raw_transaction(raw_tx)
-                logger.info(f"Transaction sent successfully on attempt {tx_retry + 1}")
-                logger.info(f"Raw tx_hash type: {type(tx_hash)}, value: {tx_hash}")
-                break
-            except Exception as send_error:
-                error_msg = str(send_error).lower()
-                if ("already known" in error_msg or "could not replace" in error_msg or "nonce too low" in error_msg) and tx_retry < max_tx_retries - 1:
-                    logger.warning(f"Transaction collision detected (attempt {tx_retry + 1}): {send_error}")
-                    logger.info("Regenerating transaction with new nonce...")
-                    
-                    # Get fresh nonce and rebuild transaction
-                    import time
-                    time.sleep(0.3)  # Small delay before retry
-                    nonce = w3.eth.get_transaction_count(FAUCET_ADDRESS, 'pending')
-                    logger.info(f"Rebuilding with fresh nonce: {nonce}")
-                    
-                    tx = contract.functions.transfer(wallet, amount).build_transaction({
-                        "from": FAUCET_ADDRESS,
-                        "nonce": nonce,
-                        "gas": 120000,
-                        "gasPrice": w3.to_wei("20", "gwei"),
-                        "chainId": 11155111
-                    })
-                    signed_tx = w3.eth.account.sign_transaction(tx, private_key=PRIVATE_KEY)
-                    raw_tx = getattr(signed_tx, 'raw_transaction', getattr(signed_tx, 'rawTransaction', None))
-                    continue
-                else:
-                    logger.error(f"Transaction send failed after {tx_retry + 1} attempts: {send_error}")
-                    raise send_error
-
-        # Ensure transaction hash is properly formatted with 0x prefix
-        if hasattr(tx_hash, 'hex'):
-            tx_hash_str = tx_hash.hex()
-        elif isinstance(tx_hash, bytes):
-            tx_hash_str = tx_hash.hex()
-        else:
-            tx_hash_str = str(tx_hash)
-        
-        # Ensure it starts with 0x
-        if not tx_hash_str.startswith('0x'):
-            tx_hash_str = '0x' + tx_hash_str
-        
-        # Validate hash format (should be 66 characters: 0x + 64 hex chars)
-        if len(tx_hash_str) != 66 or not all(c in '0123456789abcdefABCDEF' for c in tx_hash_str[2:]):
-            logger.warning(f"Invalid transaction hash format: {tx_hash_str}")
-            
-        logger.info(f"Successfully sent {amount} {requested_token} to {wallet}, tx_hash: {tx_hash_str}")
-        logger.info(f"Etherscan URL: https://sepolia.etherscan.io/tx/{tx_hash_str}")
-
-        return jsonify({
-            "message": f"Successfully sent 10 {requested_token} tokens",
-            "token": requested_token,
-            "amount": 10,
-            "tx_hash": tx_hash_str,
-            "wallet": wallet,
-            "etherscan_url": f"https://sepolia.etherscan.io/tx/{tx_hash_str}"
-        })
+    if not isinstance(wallet, str) or not Web3.is_address(wallet):
+        logger.warning(f"Invalid wallet address: {wallet}")
+        return jsonify({"error": f"Invalid wallet address: {wallet}"}), 400
 
-    except Exception as e:
-        logger.error(f"Transaction failed for {wallet} requesting {requested_token}: {str(e)}")
-        logger.error(f"Error type: {type(e)}")
-        if hasattr(e, 'response'):
-            logger.error(f"Error response: {e.response}")
-        return jsonify({"error": f"Transaction failed: {str(e)}"}), 500
+    if not requested_tokens or not isinstance(requested_tokens, list):
+        logger.warning("Batch faucet request missing token list")
+        return jsonify({"error": "Missing token list"}), 400
 
+    if not all(isinstance(symbol, str) for symbol in requested_tokens):
+        logger.warning(f"Batch faucet request with non-string tokens: {requested_tokens}")
+        return jsonify({"error": "Tokens must be a list of token symbols"}), 400
 
-@app.route("/")
-def index():
-    return send_file('static/index.html')
+    # Keep the caller's order, drop repeats
+    requested_tokens = list(dict.fromkeys(requested_tokens))
+    if not any(symbol in token_registry for symbol in requested_tokens):
+        logger.warning(f"No valid tokens requested: {requested_tokens}")
+        return jsonify({"error": f"Invalid tokens: {', '.join(requested_tokens)}"}), 400
 
-@app.route("/<path:path>")
-def serve_static(path):
-    return send_from_directory('static', path)
+    wallet = Web3.to_checksum_address(wallet)
+    CLAIM_STAGE_SECONDS.observe(time.perf_counter() - started, stage="validation")
+    log_fields(wallet=wallet, tokens=requested_tokens)
 
-@app.route("/api/status")
+    key = idempotency_key(request.headers.get("Idempotency-Key"), wallet, "+".join(sorted(map(str, requested_tokens))))
+    (body, status, headers), replayed = idempotency_store.run(
+        key, lambda: submit_claims(wallet, requested_tokens, client_ip()), wait_timeout=IDEMPOTENCY_WAIT
+    )
+    log_fields(replayed=replayed)
+    if replayed:
+        logger.debug("Replayed response for duplicate batch claim: wallet=%s, tokens=%s", wallet, requested_tokens)
+        headers = dict(headers, **{"Idempotent-Replayed": "true"})
+    return body, status, headers
+
+
+def submit_claims(wallet, requested_tokens, ip):
+    """Rate-limit and submit one claim per token; returns (body, status, headers) with per-token results.
+
+    Tokens that are invalid, rate limited or unfunded are reported without
+    holding back the others. The accepted tokens go out from one hot wallet
+    with consecutive nonces, broadcast in one batch: inline in sync mode, or
+    as one queued job in async mode.
+    """
+    results = {symbol: {"token": symbol, "error": f"Invalid token: {symbol}"}
+               for symbol in requested_tokens if symbol not in token_registry}
+    symbols = [symbol for symbol in requested_tokens if symbol in token_registry]
+
+    # Every token's limits in one round-trip
+    with CLAIM_STAGE_SECONDS.time(stage="rate_limit"):
+        limits = check_rate_limits(wallet, [(symbol, token_registry[symbol].cooldown) for symbol in symbols], client_ip=ip)
+    accepted = []
+    retry_after = []
+    for symbol, limit in zip(symbols, limits):
+        if not limit:
+            logger.debug("Rate limit '%s' exceeded for %s requesting %s", limit.limit, wallet, symbol)
+            CLAIMS_TOTAL.inc(token=symbol, outcome="rate_limited")
+            body, _, _ = rate_limited_response(limit, symbol)
+            results[symbol] = dict(body, token=symbol)
+            retry_after.append(limit.reset_in)
+            continue
+        with CLAIM_STAGE_SECONDS.time(stage="balance_check"):
+            funded = has_balance_for(symbol)
+        if not funded:
+            CLAIMS_TOTAL.inc(token=symbol, outcome="unfunded")
+            CLAIM_ERRORS_TOTAL.inc(error=INSUFFICIENT_BALANCE)
+            results[symbol] = {"token": symbol, "error": f"Faucet doesn't have enough {symbol} tokens"}
+        else:
+            CLAIMS_TOTAL.inc(token=symbol, outcome="accepted")
+            accepted.append(symbol)
+
+    if accepted and CLAIM_MODE == "sync":
+        claims = [claim_queue.submit(wallet, symbol, enqueue=False) for symbol in accepted]
+        outcomes = disburse_multi(claims)
+        for claim in claims:
+            claim = claim_queue.update(claim["claim_id"], **outcome_fields(outcomes[claim["claim_id"]]))
+            results[claim["token"]] = claim_response(claim)[0]
+        accepted = [symbol for symbol in accepted if "error" not in results[symbol]]
+    elif accepted:
+        for claim in claim_queue.submit_group(wallet, accepted):
+            results[claim["token"]] = {
+                "token": claim["token"],
+                "amount": token_registry[claim["token"]].amount,
+                "claim_id": claim["claim_id"],
+                "status": claim["status"],
+                "status_url": f"/api/faucet/{claim['claim_id']}",
+            }
+        logger.debug("Queued one job for %d claims for %s: %s", len(accepted), wallet, accepted)
+        claim_workers.start()
+
+    body = {"wallet": wallet, "results": [results[symbol] for symbol in requested_tokens]}
+    log_fields(accepted=accepted)
+    if accepted:
+        return body, 200 if CLAIM_MODE == "sync" else 202, {}
+    if retry_after:
+        return body, 429, {"Retry-After": str(min(retry_after))}
+    return body, 500, {}
+
+
+@api.route("/api/faucet/<claim_id>", methods=["GET"])
+def claim_status(claim_id):
+    claim = claim_queue.get(claim_id)
+    if claim is None:
+        return jsonify({"error": f"Unknown claim: {claim_id}"}), 404
+    return claim_response(claim)
+
+
+def rpc_status():
+    provider_status = getattr(w3.provider, "status", None)
+    return provider_status() if provider_status else []
+
+@api.route("/api/status")
 def api_status():
-    return jsonify({"status": "Faucet backend running"})
-
-@app.route("/api/admin/rate-limit/<wallet>", methods=["GET"])
+    # Served from the balance cache, never hits the node
+    return jsonify({
+        "status": "Faucet backend running",
+        "faucet_address": FAUCET_ADDRESS,
+        "tokens": token_registry.symbols(),
+        "balances": wallet_pool.snapshot(),
+        "wallets": wallet_pool.status(),
+        "fees": fee_oracle.status(),
+        "rpc": rpc_status(),
+        "queue_depth": claim_queue.depth(),
+        "admission": admission.status(),
+        "ledger": ledger.status() if ledger else None,
+        "transactions": tx_tracker.status(),
+    })
+
+def balance_samples():
+    for symbol, entry in wallet_pool.snapshot().items():
+        yield (symbol,), entry["balance"]
+
+
+# Read from the caches when scraped, never from the node
+REGISTRY.register(Gauge("faucet_balance", "Cached balance summed over hot wallets", ("token",), collect=balance_samples))
+REGISTRY.register(Gauge("faucet_pending_transactions", "Sent transactions not yet mined",
+                        collect=lambda: [((), tx_tracker.status()["pending"])]))
+REGISTRY.register(Gauge("faucet_wallet_in_flight", "Claims in flight per hot wallet", ("address",),
+                        collect=lambda: [((wallet.address,), wallet.in_flight) for wallet in wallet_pool]))
+REGISTRY.register(Gauge("faucet_admission_in_flight", "Claim requests admitted and not yet answered",
+                        collect=lambda: [((), admission.in_flight)]))
+REGISTRY.register(Gauge("faucet_admission_waiting", "Claim requests queued for admission",
+                        collect=lambda: [((), admission.waiting)]))
+REGISTRY.register(Gauge("faucet_queue_depth", "Claims waiting for a worker",
+                        collect=lambda: [((), claim_queue.depth())]))
+
+
+@api.route("/metrics")
+def metrics():
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+@api.route("/api/admin/rate-limit/<wallet>", methods=["GET"])
 def check_wallet_rate_limit(wallet):
     """Admin endpoint to check rate limit status for a wallet"""
     try:
         from rate_limit import get_rate_limit_status
-        is_limited, remaining_seconds = get_rate_limit_status(wallet)
+        token = request.args.get("token")
+        if not token:
+            return jsonify(wallet_rate_limits(wallet))
+        is_limited, remaining_seconds = get_rate_limit_status(wallet, token)
         
         if is_limited:
-            hours = remaining_seconds // 3600
-            minutes = (remaining_seconds % 3600) // 60
+            remaining_time = format_duration(remaining_seconds)
             return jsonify({
                 "wallet": wallet,
+                "token": token,
                 "rate_limited": True,
                 "remaining_seconds": remaining_seconds,
-                "remaining_time": f"{hours}h {minutes}m",
-                "message": f"Rate limit active. Try again in {hours}h {minutes}m."
+                "remaining_time": remaining_time,
+                "message": f"Rate limit active. Try again in {remaining_time}."
             })
         else:
             return jsonify({
                 "wallet": wallet,
+                "token": token,
                 "rate_limited": False,
                 "message": "No rate limit active for this wallet."
             })
@@ -276,19 +447,183 @@ def check_wallet_rate_limit(wallet):
         return jsonify({"error": str(e)}), 500
 
 
+def wallet_rate_limits(wallet):
+    """Every token's cooldown and the wallet-wide counter for one wallet"""
+    limits = list(get_rate_limit_statuses([wallet], token_registry.symbols()))
+    active = [limit for limit in limits if limit["rate_limited"]]
+    for limit in active:
+        limit["remaining_time"] = format_duration(limit["remaining_seconds"])
+    body = {"wallet": wallet, "token": None, "rate_limited": bool(active), "limits": limits}
+    if active:
+        names = ", ".join(limit["token"] or "all tokens" for limit in active)
+        body["message"] = f"Rate limit active for {names}."
+    else:
+        body["message"] = "No rate limit active for this wallet."
+    return body
+
+
+NDJSON = "application/x-ndjson"
+WALLET_PREFIX = re.compile(r"0x[0-9a-fA-F]{0,40}")
+
+
+def rate_limit_selection(data):
+    """(wallets, prefix, tokens) from an admin bulk request body; raises ValueError when invalid"""
+    wallets, prefix = data.get("wallets"), data.get("prefix")
+    if (wallets is None) == (prefix is None):
+        raise ValueError("Send either a list of wallets or a wallet prefix")
+    if wallets is not None:
+        if not isinstance(wallets, list):
+            raise ValueError("wallets must be a list")
+        invalid = [wallet for wallet in wallets if not isinstance(wallet, str) or not Web3.is_address(wallet)]
+        if invalid:
+            raise ValueError(f"Invalid wallet addresses: {', '.join(map(str, invalid[:10]))}")
+    elif not isinstance(prefix, str) or not WALLET_PREFIX.fullmatch(prefix):
+        raise ValueError("prefix must be 0x followed by up to 40 hex digits")
+    tokens = data.get("tokens")
+    if tokens is not None:
+        unknown = [token for token in tokens if token not in token_registry]
+        if unknown:
+            raise ValueError(f"Invalid tokens: {', '.join(map(str, unknown))}")
+    return wallets, prefix and prefix.lower(), tokens
+
+
+def ndjson(entries):
+    for entry in entries:
+        yield json.dumps(entry, separators=(",", ":")) + "\n"
+
+
+@api.route("/api/admin/rate-limits/status", methods=["POST"])
+def bulk_rate_limit_status():
+    """Admin endpoint: status of many wallets' limits, streamed as one JSON object per line.
+
+    Body: {"wallets": [...]} for every wallet/token pair, or {"prefix": "0x12",
+    "cursor": 0, "max_keys": N} for the stored limits of matching wallets,
+    ending with a {"cursor": n} line (0 when the scan is complete).
+    Optional "tokens" narrows the tokens reported for a wallet list.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        wallets, prefix, tokens = rate_limit_selection(data)
+        cursor = int(data.get("cursor", 0))
+        max_keys = int(data["max_keys"]) if data.get("max_keys") else None
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    if wallets is not None:
+        entries = get_rate_limit_statuses(wallets, tokens or token_registry.symbols())
+    else:
+        entries = scan_rate_limits(prefix, cursor=cursor, max_keys=max_keys)
+    return Response(ndjson(entries), mimetype=NDJSON)
+
+
+@api.route("/api/admin/rate-limits/clear", methods=["POST"])
+def bulk_clear_rate_limits():
+    """Admin endpoint: clear the limits of a list of wallets or of every wallet with a prefix.
+
+    Without "tokens" every cooldown and the wallet-wide counter are cleared;
+    with it only those tokens' cooldowns.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        wallets, prefix, tokens = rate_limit_selection(data)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    if wallets is not None:
+        cleared = clear_rate_limits(wallets, tokens or token_registry.symbols(), wallet_wide=not tokens)
+    else:
+        cleared = clear_rate_limits_with_prefix(prefix, tokens, wallet_wide=not tokens)
+    return jsonify({"cleared": cleared})
+
+
+def ledger_filters():
+    """Common ?token=&status=&since=&until= filters of the ledger endpoints"""
+    filters = {"token": request.args.get("token")}
+    if request.args.get("status"):
+        filters["status"] = request.args["status"]
+    for name in ("since", "until"):
+        if request.args.get(name):
+            filters[name] = float(request.args[name])
+    return filters
+
+
+def ledger_limit(default, maximum=1000):
+    return min(maximum, max(1, int(request.args.get("limit", default))))
+
+
+def ledger_query(view):
+    """Decorator for a ledger endpoint: 404 when it is off, 400 on bad filters, 503 when SQLite fails"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if ledger is None:
+            return jsonify({"error": "Ledger is disabled"}), 404
+        try:
+            return view(*args, **kwargs)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid query: {e}"}), 400
+        except sqlite3.Error as e:
+            logger.error(f"Ledger query failed: {e}")
+            return jsonify({"error": "Ledger is unavailable", "detail": ledger.error or str(e)}), 503
+    return wrapper
+
+
+@api.route("/api/admin/ledger", methods=["GET"])
+@ledger_query
+def ledger_history():
+    """Admin endpoint: ledger rows newest first; follow next_before for older pages"""
+    before = int(request.args["before"]) if request.args.get("before") else None
+    limit = ledger_limit(100)
+    entries = ledger.history(wallet=request.args.get("wallet"), before=before, limit=limit, **ledger_filters())
+    return jsonify({
+        "entries": entries,
+        "next_before": entries[-1]["id"] if len(entries) == limit else None,
+    })
+
+
+@api.route("/api/admin/ledger/totals", methods=["GET"])
+@ledger_query
+def ledger_totals():
+    """Admin endpoint: claims and amount per token, e.g. ?since=<unix time> for what went out today"""
+    return jsonify({"totals": ledger.totals(**ledger_filters())})
+
+
+@api.route("/api/admin/ledger/top-wallets", methods=["GET"])
+@ledger_query
+def ledger_top_wallets():
+    """Admin endpoint: wallets with the most claims"""
+    return jsonify({"wallets": ledger.top_wallets(limit=ledger_limit(20, maximum=500), **ledger_filters())})
+
+
+app = Flask(__name__, static_folder='static')
+CORS(app)  # Enable CORS for all routes
+app.register_blueprint(api)
+
+
+static_manifest = StaticManifest([os.path.join(app.root_path, 'static')])
+
+
+@app.route("/")
+def index():
+    return serve_static("index.html")
+
+@app.route("/<path:path>")
+def serve_static(path):
+    response = static_manifest.serve("/" + path)
+    if response is None:
+        return jsonify({"error": f"Not found: {path}"}), 404
+    return response
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     debug = os.environ.get("FLASK_ENV") != "production"
     
-    # Configure logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    # JSON lines written by a background thread; LOG_FORMAT=text for the old format
+    configure_logging()
     
     logger.info(f"Starting faucet application on port {port}")
     logger.info(f"Debug mode: {debug}")
     logger.info(f"Faucet address: {FAUCET_ADDRESS}")
+    chain_info.log_status(FAUCET_ADDRESS)
+    check_redis()
     
     app.run(host="0.0.0.0", port=port, debug=debug)
 
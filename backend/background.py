@@ -0,0 +1,55 @@
+import logging
+import threading
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+
+class BackgroundLoop:
+    """Daemon thread that calls `fn()` every `interval` seconds until stopped.
+
+    The thread is started by the first `start()` call rather than at import,
+    so processes that never use a component never run its loop. An exception
+    from `fn` is logged and the loop waits `error_interval` seconds (default
+    `interval`) before the next call.
+    """
+
+    def __init__(self, name, interval, fn, error_interval=None):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.error_interval = interval if error_interval is None else error_interval
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    @property
+    def started(self):
+        return self._thread is not None
+
+    @property
+    def stopping(self):
+        return self._stopping.is_set()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.fn()
+                wait = self.interval
+            except Exception as e:
+                logger.warning(f"{self.name} failed: {e}")
+                wait = self.error_interval
+            if wait:
+                self._stopping.wait(wait)
@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+
+from background import BackgroundLoop
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+ETH = "ETH"
+
+
+class BalanceCache:
+    """Local view of the faucet's token and ETH balances.
+
+    A background thread re-reads every balance (at the 'pending' block, so
+    unconfirmed payouts are already deducted) in one batched RPC round-trip
+    each time `refresh_blocks` new blocks have been mined (or after
+    `max_age` seconds). Between refreshes, claims reserve their payout from
+    the local view so the claim path never calls balanceOf.
+    """
+
+    def __init__(self, w3, registry, address, poll_interval=12, refresh_blocks=1, max_age=300):
+        self.w3 = w3
+        self.registry = registry
+        self.address = address
+        self.poll_interval = poll_interval
+        self.refresh_blocks = refresh_blocks
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._balances = {}
+        self._updated_at = {}
+        self._last_block = None
+        self._loop = BackgroundLoop("balance-cache", poll_interval, self._poll)
+
+    def start(self):
+        self._loop.start()
+
+    def _poll(self):
+        block = self.w3.eth.block_number
+        oldest = min(self._updated_at.values(), default=0)
+        stale = time.monotonic() - oldest > self.max_age
+        if self._last_block is None or block - self._last_block >= self.refresh_blocks or stale:
+            self.refresh()
+            self._last_block = block
+
+    def refresh(self):
+        """Re-read all balances from the node, batched into one request"""
+        tokens = list(self.registry)
+        try:
+            with self.w3.batch_requests() as batch:
+                batch.add(self.w3.eth.get_balance(self.address, 'pending'))
+                for token in tokens:
+                    batch.add(token.contract.functions.balanceOf(self.address).call(block_identifier='pending'))
+                results = batch.execute()
+        except Exception as e:
+            # Not every provider supports JSON-RPC batches
+            logger.info(f"Batched balance refresh unavailable ({e}), falling back to single calls")
+            results = [self.w3.eth.get_balance(self.address, 'pending')]
+            results += [token.contract.functions.balanceOf(self.address).call(block_identifier='pending') for token in tokens]
+
+        now = time.monotonic()
+        with self._lock:
+            for symbol, balance in zip([ETH] + [token.symbol for token in tokens], results):
+                self._balances[symbol] = balance
+                self._updated_at[symbol] = now
+        logger.info(f"Balance cache refreshed for {len(results)} assets")
+
+    def reserve(self, symbol, amount):
+        """Deduct `amount` from the local view. Returns False if we know it is not there.
+
+        Unknown balances (before the first refresh) are allowed through, like
+        the old best-effort balanceOf check.
+        """
+        self.start()
+        with self._lock:
+            balance = self._balances.get(symbol)
+            if balance is None:
+                return True
+            if balance < amount:
+                return False
+            self._balances[symbol] = balance - amount
+            return True
+
+    def release(self, symbol, amount):
+        """Give back a reservation whose transaction was never sent"""
+        with self._lock:
+            if symbol in self._balances:
+                self._balances[symbol] += amount
+
+    def get(self, symbol):
+        with self._lock:
+            return self._balances.get(symbol)
+
+    def snapshot(self):
+        """Cached balances and their age in seconds, for the status endpoint"""
+        self.start()
+        now = time.monotonic()
+        with self._lock:
+            balances = dict(self._balances)
+            updated_at = dict(self._updated_at)
+        result = {}
+        for symbol, balance in balances.items():
+            decimals = 18 if symbol == ETH else self.registry[symbol].decimals
+            result[symbol] = {
+                "balance": balance / 10 ** decimals,
+                "raw": str(balance),
+                "age_seconds": round(now - updated_at[symbol], 1),
+            }
+        return result
@@ -0,0 +1,58 @@
+"""Goodput as offered load rises past capacity, with and without admission control.
+
+Runs load_test.py at 1x, 2x and 4x the claim rate the mock chain can
+serve, once with admission control on (token bucket at that rate) and
+once with it off. With shedding, excess claims get a quick 503 and
+goodput, the successes answered within the deadline, stays flat; without
+it every claim queues and goodput falls as the load rises.
+
+    cd backend && python bench/bench_admission.py [capacity_rps] [latency_ms]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from common import BACKEND_DIR
+
+LOAD_TEST = os.path.join(BACKEND_DIR, "bench", "load_test.py")
+MULTIPLIERS = (1, 2, 4)
+DURATION = 5
+DEADLINE = 2
+
+
+def run_load(rps, latency, env):
+    with tempfile.NamedTemporaryFile(suffix=".json") as out:
+        subprocess.run(
+            [sys.executable, LOAD_TEST, "--rps", str(rps), "--duration", str(DURATION), "--latency", str(latency),
+             "--deadline", str(DEADLINE), "--workers", "256", "--out", out.name],
+            env=dict(os.environ, **env), check=True, stdout=subprocess.DEVNULL,
+        )
+        return json.load(open(out.name))["results"]
+
+
+def main():
+    capacity = float(sys.argv[1]) if len(sys.argv) > 1 else 30
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    configs = {
+        "off": {"ADMISSION_RATE": "0", "ADMISSION_MAX_CONCURRENT": "100000"},
+        "on": {"ADMISSION_RATE": str(capacity)},
+    }
+
+    goodput = {}
+    print(f"capacity={capacity}/s rpc latency={latency}ms deadline={DEADLINE}s")
+    for name, env in configs.items():
+        for multiplier in MULTIPLIERS:
+            results = run_load(capacity * multiplier, latency, env)
+            goodput[name, multiplier] = results["goodput"]
+            print(f"admission {name:3} offered={capacity * multiplier:6.0f}/s goodput={results['goodput']:6.1f}/s "
+                  f"shed={results['shed']:5} p50={results['p50_ms']:8.1f}ms p99={results['p99_ms']:8.1f}ms")
+
+    low, high = goodput["on", MULTIPLIERS[0]], goodput["on", MULTIPLIERS[-1]]
+    assert high >= 0.8 * low, f"goodput with admission fell from {low}/s to {high}/s"
+    assert high > goodput["off", MULTIPLIERS[-1]], "admission control did not improve goodput under overload"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Batched disbursement against a mocked RPC.
+
+Queues a burst of claims with BATCH_CONTRACT set and checks that they go
+out as a few disperseToken transactions instead of one transfer each:
+every claim must end up sent, carry its batch's tx hash, and the batch
+calldata must pay exactly the queued wallets. Reports nonces and gas
+limit used against the one-transfer-per-claim path.
+
+    cd backend && python bench/bench_batching.py [claims] [batch_size]
+"""
+import logging
+import os
+import sys
+import time
+
+from eth_abi import decode as abi_decode
+
+from common import load_app, wallet_for
+from mock_rpc import MockChain, decode_typed_tx
+
+BATCH_CONTRACT = "0xD152f549545093347A162Dce210e7293f1452150"
+
+
+def main():
+    claims = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    logging.disable(logging.CRITICAL)
+
+    os.environ["BATCH_CONTRACT"] = BATCH_CONTRACT
+    os.environ["BATCH_MAX_CLAIMS"] = str(batch_size)
+    os.environ.setdefault("BATCH_WINDOW", "0.2")
+    os.environ["CLAIM_MODE"] = "async"
+    chain = MockChain()
+    faucet_app = load_app(chain)
+    client = faucet_app.app.test_client()
+    symbols = faucet_app.token_registry.symbols()
+
+    start = time.perf_counter()
+    claim_ids = {}
+    for i in range(claims):
+        resp = client.post("/api/faucet", json={"wallet": wallet_for(i), "token": symbols[i % len(symbols)]})
+        assert resp.status_code == 202, resp.get_json()
+        claim_ids[resp.get_json()["claim_id"]] = wallet_for(i)
+
+    pending = set(claim_ids)
+    deadline = time.monotonic() + 30
+    results = {}
+    while pending and time.monotonic() < deadline:
+        for claim_id in list(pending):
+            claim = faucet_app.claim_queue.get(claim_id)
+            if claim["status"] not in ("queued", "sending"):
+                results[claim_id] = claim
+                pending.discard(claim_id)
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+
+    assert not pending, f"{len(pending)} claims never left the queue"
+    failed = [c for c in results.values() if c["status"] != "sent"]
+    assert not failed, failed[0]
+
+    # Every batch must pay exactly the wallets whose claims carry its hash
+    paid = {}
+    for raw_tx in chain.transactions:
+        tx = decode_typed_tx(raw_tx)
+        assert tx["to"].lower() == BATCH_CONTRACT.lower()
+        assert tx["data"][:4].hex() == "c73a2d60"
+        _, recipients, _ = abi_decode(["address", "address[]", "uint256[]"], tx["data"][4:])
+        for recipient in recipients:
+            assert recipient.lower() not in paid, f"{recipient} paid twice"
+            paid[recipient.lower()] = tx["gas"]
+    for claim_id, wallet in claim_ids.items():
+        assert wallet.lower() in paid, f"{wallet} was never paid"
+
+    batches = len(chain.transactions)
+    batch_gas = sum(decode_typed_tx(raw_tx)["gas"] for raw_tx in chain.transactions)
+    single_gas = sum(faucet_app.token_registry[c["token"]].gas for c in results.values())
+    print(f"claims={claims} batch_size={batch_size} elapsed={elapsed:.2f}s")
+    print(f"transactions={batches} (one per claim would be {claims})")
+    print(f"gas limit: batched={batch_gas} per-claim={single_gas} ({batch_gas / single_gas:.0%})")
+    assert chain.next_nonce == batches
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Bulk admin rate-limit endpoints vs one request per wallet and token.
+
+Fills the limiter with `wallets` claimed wallets, then reads every
+wallet/token status through the single-wallet endpoint and through one
+streamed bulk request, scans a prefix and clears it. The bulk response is
+consumed line by line to check that its memory use stays flat while the
+body grows. Uses Redis when REDIS_URL is set, the in-memory limiter
+otherwise.
+
+    cd backend && python bench/bench_bulk_rate_limits.py [wallets]
+"""
+import json
+import logging
+import sys
+import time
+import tracemalloc
+
+from common import ADMIN_HEADERS, load_app, wallet_for
+from mock_rpc import MockChain
+
+TOKENS = ["DAI", "USDC", "USDT", "WBTC"]
+
+
+def main():
+    wallets = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    logging.disable(logging.CRITICAL)
+    faucet_app = load_app(MockChain(latency=0))
+    client = faucet_app.app.test_client()
+    from rate_limit import check_rate_limits
+
+    addresses = [wallet_for(i) for i in range(wallets)]
+    for address in addresses:
+        check_rate_limits(address, [("USDC", 86400), ("DAI", 86400)])
+
+    sample = addresses[:1000]
+    started = time.perf_counter()
+    single = 0
+    for address in sample:
+        for token in TOKENS:
+            single += client.get(f"/api/admin/rate-limit/{address}?token={token}", headers=ADMIN_HEADERS).get_json()["rate_limited"]
+    single_us = (time.perf_counter() - started) / (len(sample) * len(TOKENS)) * 1e6
+
+    def read_bulk():
+        response = client.post("/api/admin/rate-limits/status", json={"wallets": addresses}, headers=ADMIN_HEADERS, buffered=False)
+        lines = limited = size = 0
+        for chunk in response.response:
+            for line in chunk.splitlines():
+                lines += 1
+                size += len(line)
+                limited += json.loads(line)["rate_limited"]
+        return lines, limited, size
+
+    started = time.perf_counter()
+    lines, limited, size = read_bulk()
+    bulk_us = (time.perf_counter() - started) / lines * 1e6
+    # Second pass under tracemalloc, which would distort the timing
+    tracemalloc.start()
+    read_bulk()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    scanned = client.post("/api/admin/rate-limits/status", json={"prefix": "0x000000000000000000000000000000000000"}, headers=ADMIN_HEADERS)
+    scan_lines = scanned.get_data(as_text=True).splitlines()
+    scan_ms = (time.perf_counter() - started) * 1000
+    # Without the admin token nothing is touched
+    anonymous = client.post("/api/admin/rate-limits/clear", json={"prefix": "0x"})
+    cleared = client.post("/api/admin/rate-limits/clear", json={"prefix": "0x000000000000000000000000000000000000"}, headers=ADMIN_HEADERS).get_json()
+    after = client.post("/api/admin/rate-limits/status", json={"prefix": "0x000000000000000000000000000000000000"}, headers=ADMIN_HEADERS)
+
+    print(f"wallets={wallets} tokens={len(TOKENS)}")
+    print(f"single-wallet endpoint: {single_us:.1f}us per pair ({single} of {len(sample) * len(TOKENS)} limited)")
+    print(f"bulk stream: {bulk_us:.1f}us per pair, {lines} lines, {size / 1e6:.1f}MB body, peak memory {peak / 1e6:.1f}MB")
+    print(f"prefix scan: {len(scan_lines) - 1} limits in {scan_ms:.0f}ms, {scan_lines[-1]}")
+    print(f"prefix clear: {cleared}, left after clear: {len(after.get_data(as_text=True).splitlines()) - 1}")
+
+    assert anonymous.status_code == 401, "an anonymous request reached the admin endpoints"
+    assert lines == wallets * (len(TOKENS) + 1) and limited == 2 * wallets
+    assert bulk_us < single_us, "bulk status was not cheaper per pair than the single-wallet endpoint"
+    assert peak < size / 2, "the bulk response was built in memory instead of streamed"
+    assert cleared["cleared"] > 0 and after.get_data(as_text=True).splitlines() == ['{"cursor":0}']
+
+
+if __name__ == "__main__":
+    main()
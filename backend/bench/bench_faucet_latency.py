@@ -0,0 +1,161 @@
+"""Claim latency against a mocked RPC, now and on the original claim path.
+
+The original faucet() slept random.uniform(0.1, 0.5) on every claim, fetched
+the nonce from the node with backoff sleeps and retried sends that collided.
+This runs claims through the current app, then runs more through a copy of
+the original claim logic (old_claim below, from the baseline commit) on the
+same mock chain. The current p50 must be lower than the measured old p50 by
+at least the smallest delay the old code always paid.
+
+    cd backend && python bench/bench_faucet_latency.py [claims] [threads]
+"""
+import logging
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from web3 import Web3
+
+from common import TEST_PRIVATE_KEY, load_app, percentile, wallet_for
+from mock_rpc import MockChain, MockProvider, SEPOLIA_CHAIN_ID
+from tokens import TOKENS
+
+REMOVED_MIN_DELAY = 0.1
+# The old path sleeps 0.3s per claim on average, so it gets fewer claims
+OLD_PATH_CLAIMS = 50
+# transfer and balanceOf, as the original app.py declared them
+OLD_ERC20_ABI = [{
+    "constant": False,
+    "inputs": [{"name": "_to", "type": "address"}, {"name": "_value", "type": "uint256"}],
+    "name": "transfer",
+    "outputs": [{"name": "", "type": "bool"}],
+    "type": "function",
+}, {
+    "constant": True,
+    "inputs": [{"name": "_owner", "type": "address"}],
+    "name": "balanceOf",
+    "outputs": [{"name": "balance", "type": "uint256"}],
+    "type": "function",
+}]
+
+
+def run_claims(client, first, count, threads):
+    """(statuses, latencies, elapsed) for `count` claims from distinct wallets"""
+    def claim(i):
+        start = time.perf_counter()
+        resp = client.post("/api/faucet", json={"wallet": wallet_for(i), "token": "USDC"})
+        return resp.status_code, time.perf_counter() - start
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(claim, range(first, first + count)))
+    elapsed = time.perf_counter() - started
+    return [status for status, _ in results], [latency for _, latency in results], elapsed
+
+
+def old_claim(w3, account, token, wallet):
+    """The baseline faucet()'s chain work for one claim, minus its logging; returns the tx hash"""
+    contract = w3.eth.contract(address=Web3.to_checksum_address(token["address"]), abi=OLD_ERC20_ABI)
+    contract.functions.balanceOf(account.address).call()
+    amount = 10 * (10 ** token["decimals"])
+
+    time.sleep(random.uniform(0.1, 0.5))
+
+    max_retries = 5
+    base_delay = 0.2
+    for retry in range(max_retries):
+        try:
+            nonce = w3.eth.get_transaction_count(account.address, "pending")
+            if retry > 0:
+                time.sleep(base_delay * (2 ** retry))
+            break
+        except Exception:
+            if retry == max_retries - 1:
+                raise
+            time.sleep(base_delay * (2 ** retry))
+
+    if contract.functions.balanceOf(account.address).call() < amount:
+        raise RuntimeError("insufficient token balance")
+
+    def signed(nonce):
+        tx = contract.functions.transfer(wallet, amount).build_transaction({
+            "from": account.address,
+            "nonce": nonce,
+            "gas": 120000,
+            "gasPrice": w3.to_wei("20", "gwei"),
+            "chainId": SEPOLIA_CHAIN_ID,
+        })
+        return account.sign_transaction(tx).raw_transaction
+
+    raw_tx = signed(nonce)
+    max_tx_retries = 3
+    for tx_retry in range(max_tx_retries):
+        try:
+            return w3.eth.send_raw_transaction(raw_tx)
+        except Exception as send_error:
+            message = str(send_error).lower()
+            collided = "already known" in message or "could not replace" in message or "nonce too low" in message
+            if not collided or tx_retry == max_tx_retries - 1:
+                raise
+            time.sleep(0.3)
+            raw_tx = signed(w3.eth.get_transaction_count(account.address, "pending"))
+
+
+def run_old_claims(chain, token, first, count, threads):
+    """(failures, latencies, elapsed) for `count` claims through old_claim on `chain`"""
+    w3 = Web3(MockProvider(chain))
+    account = w3.eth.account.from_key(TEST_PRIVATE_KEY)
+
+    def claim(i):
+        start = time.perf_counter()
+        try:
+            old_claim(w3, account, token, Web3.to_checksum_address(wallet_for(i)))
+            failed = False
+        except Exception:
+            failed = True
+        return failed, time.perf_counter() - start
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(claim, range(first, first + count)))
+    elapsed = time.perf_counter() - started
+    return sum(failed for failed, _ in results), [latency for _, latency in results], elapsed
+
+
+def main():
+    claims = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    logging.disable(logging.CRITICAL)
+
+    # Measure the whole disbursement path, not just the 202 accept
+    os.environ.setdefault("CLAIM_MODE", "sync")
+    chain = MockChain()
+    faucet_app = load_app(chain)
+    client = faucet_app.app.test_client()
+
+    statuses, latencies, elapsed = run_claims(client, 0, claims, threads)
+    failures = [status for status in statuses if status >= 300]
+    p50 = percentile(latencies, 50)
+    print(f"claims={claims} threads={threads} failures={len(failures)} throughput={claims / elapsed:.1f}/s")
+    print(f"p50={p50 * 1000:.1f}ms p95={percentile(latencies, 95) * 1000:.1f}ms")
+    print(f"nonces used={chain.next_nonce} (expected {claims - len(failures)})")
+    assert not failures, f"{len(failures)} claims failed: {failures[:5]}"
+    assert chain.next_nonce == claims, "nonce sequence has gaps or duplicates"
+
+    # The original claim logic on the same mock chain, with the same token
+    random.seed(0)
+    old_claims = min(claims, OLD_PATH_CLAIMS)
+    old_failures, old_latencies, old_elapsed = run_old_claims(chain, TOKENS["USDC"], claims, old_claims, threads)
+    old_p50 = percentile(old_latencies, 50)
+    print(f"old path: claims={old_claims} failures={old_failures} throughput={old_claims / old_elapsed:.1f}/s "
+          f"p50={old_p50 * 1000:.1f}ms p95={percentile(old_latencies, 95) * 1000:.1f}ms")
+    print(f"p50 saved per claim: {(old_p50 - p50) * 1000:.1f}ms")
+
+    assert old_p50 - p50 >= REMOVED_MIN_DELAY, \
+        f"p50 is only {(old_p50 - p50) * 1000:.1f}ms below the old path, less than the removed {REMOVED_MIN_DELAY}s delay"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Duplicate claims against a mocked RPC.
+
+Every wallet is claimed by several concurrent requests at once, half with a
+shared Idempotency-Key header and half with none (the wallet+token key).
+Each wallet must cost exactly one nonce, every duplicate must get the same
+response, and replaying after completion must not touch the chain.
+
+    cd backend && python bench/bench_idempotency.py [wallets] [duplicates]
+"""
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from common import load_app, wallet_for
+from mock_rpc import MockChain
+
+
+def main():
+    wallets = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    duplicates = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    logging.disable(logging.CRITICAL)
+
+    # Inline disbursement with some RPC latency keeps duplicates overlapping
+    os.environ.setdefault("CLAIM_MODE", "sync")
+    chain = MockChain(latency=0.005)
+    faucet_app = load_app(chain)
+    client = faucet_app.app.test_client()
+    barrier = threading.Barrier(duplicates)
+
+    def claim_wallet(i):
+        headers = {"Idempotency-Key": f"click-{i}"} if i % 2 else {}
+
+        def post(_):
+            barrier.wait()
+            return client.post("/api/faucet", json={"wallet": wallet_for(i), "token": "USDC"}, headers=headers)
+
+        with ThreadPoolExecutor(max_workers=duplicates) as pool:
+            return list(pool.map(post, range(duplicates)))
+
+    results = [claim_wallet(i) for i in range(wallets)]
+
+    statuses = [resp.status_code for responses in results for resp in responses]
+    replayed = sum(resp.headers.get("Idempotent-Replayed") == "true" for responses in results for resp in responses)
+    distinct = [len({resp.get_json()["tx_hash"] for resp in responses}) for responses in results]
+    print(f"wallets={wallets} duplicates={duplicates} requests={len(statuses)} replayed={replayed}")
+    print(f"nonces used={chain.next_nonce} (expected {wallets})")
+
+    sends = chain.calls["eth_sendRawTransaction"]
+    rpc_calls = sum(chain.calls.values())
+    replays = [client.post("/api/faucet", json={"wallet": wallet_for(i), "token": "USDC"},
+                           headers={"Idempotency-Key": f"click-{i}"} if i % 2 else {})
+               for i in range(wallets)]
+    replay_calls = sum(chain.calls.values()) - rpc_calls
+    print(f"late replays={len(replays)} extra rpc calls={replay_calls}")
+
+    assert all(status == 200 for status in statuses), f"unexpected statuses: {set(statuses)}"
+    assert chain.next_nonce == wallets and sends == wallets, "a duplicate claim was disbursed twice"
+    assert all(count == 1 for count in distinct), "duplicates saw different transactions"
+    assert replayed == wallets * (duplicates - 1), "not every duplicate shared the first response"
+    assert all(resp.status_code == 200 and resp.headers.get("Idempotent-Replayed") == "true" for resp in replays)
+    assert replay_calls == 0, "a replay reached the chain"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Ledger write cost on the claim path and query times on a large table.
+
+Bulk-loads a ledger with `rows` synthetic entries spread over 30 days, then
+measures what `record()` costs the calling thread, how fast the writer
+drains, and how long a history page, a deep page, today's totals and the
+day's top wallets take. The aggregates must be answered from the covering
+index. Finally a few sync claims go through the app to check that their
+rows carry the nonce and tx hash and show up on the admin endpoints.
+
+    cd backend && python bench/bench_ledger.py [rows]
+"""
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+from common import ADMIN_HEADERS, load_app, percentile, wallet_for
+from mock_rpc import MockChain
+
+from ledger import COLUMNS, SCHEMA, ClaimLedger, connect
+
+TOKENS = ["DAI", "USDC", "USDT", "WBTC"]
+DAY = 86400
+MAX_RECORD_US = 20
+MAX_QUERY_MS = 50
+
+
+def bulk_load(path, rows, now):
+    conn = connect(path)
+    conn.executescript(SCHEMA)
+    insert = f"INSERT INTO ledger ({', '.join(COLUMNS[1:])}) VALUES ({', '.join('?' * (len(COLUMNS) - 1))})"
+    rng = random.Random(1)
+    chunk = 100000
+    for start in range(0, rows, chunk):
+        batch = []
+        for i in range(start, min(rows, start + chunk)):
+            ts = now - 30 * DAY + i * 30 * DAY / rows
+            batch.append((ts, f"{i:032x}", wallet_for(rng.randrange(rows // 4)), rng.choice(TOKENS), 10.0,
+                          "sent", i, "0xsender", f"0x{i:064x}", None, 25.0))
+        with conn:
+            conn.executemany(insert, batch)
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def timed(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return result, percentile(times, 50) * 1000
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    logging.disable(logging.CRITICAL)
+    path = os.path.join(tempfile.mkdtemp(prefix="faucet-ledger-"), "ledger.sqlite3")
+    now = time.time()
+
+    started = time.perf_counter()
+    bulk_load(path, rows, now)
+    print(f"rows={rows} bulk load {time.perf_counter() - started:.1f}s")
+
+    ledger = ClaimLedger(path, amount_of=lambda symbol: 10)
+    claims = [{"claim_id": f"new{i}", "wallet": wallet_for(i), "token": "USDC", "status": "sent",
+               "tx_hash": "0xabc", "error": None, "created_at": now, "updated_at": now + 0.02} for i in range(20000)]
+    started = time.perf_counter()
+    for claim in claims:
+        ledger.track("0xsender", 7, "0xabc", [claim["claim_id"]])
+        ledger.record(claim)
+    record_us = (time.perf_counter() - started) / len(claims) * 1e6
+    ledger.flush()
+    drained = time.perf_counter() - started
+    print(f"record+track: {record_us:.1f}us per claim on the caller, {len(claims) / drained:.0f} rows/s written")
+
+    wallet = claims[0]["wallet"]
+    page, history_ms = timed(lambda: ledger.history(limit=100))
+    _, deep_ms = timed(lambda: ledger.history(before=rows // 2, limit=100))
+    _, wallet_ms = timed(lambda: ledger.history(wallet=wallet, limit=100))
+    totals, totals_ms = timed(lambda: ledger.totals(since=now - DAY))
+    _, top_ms = timed(lambda: ledger.top_wallets(since=now - DAY))
+    print(f"history page {history_ms:.2f}ms, deep page {deep_ms:.2f}ms, wallet page {wallet_ms:.2f}ms")
+    print(f"totals today {totals_ms:.2f}ms {totals}")
+    print(f"top wallets today {top_ms:.2f}ms")
+
+    conn = connect(path)
+    plans = {}
+    for name, sql, params in [
+        ("totals", "SELECT token, COUNT(*), SUM(amount) FROM ledger WHERE status = ? AND ts >= ? AND ts < ? GROUP BY token",
+         ["sent", now - DAY, float("inf")]),
+        ("top_wallets", "SELECT wallet, COUNT(*) AS claims FROM ledger WHERE status = ? AND ts >= ? AND ts < ? "
+                        "GROUP BY wallet ORDER BY claims DESC LIMIT 20", ["sent", now - DAY, float("inf")]),
+    ]:
+        plans[name] = " / ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+        print(f"{name} plan: {plans[name]}")
+
+    # End to end: claims through the app land in the ledger with their nonce
+    os.environ["CLAIM_MODE"] = "sync"
+    os.environ["LEDGER_PATH"] = os.path.join(os.path.dirname(path), "app-ledger.sqlite3")
+    faucet_app = load_app(MockChain(latency=0))
+    client = faucet_app.app.test_client()
+    for i in range(5):
+        client.post("/api/faucet", json={"wallet": wallet_for(i), "token": "USDC"})
+    faucet_app.ledger.flush()
+    entries = client.get("/api/admin/ledger?limit=3", headers=ADMIN_HEADERS).get_json()
+    app_totals = client.get("/api/admin/ledger/totals", headers=ADMIN_HEADERS).get_json()["totals"]
+    print(f"app ledger: {len(entries['entries'])} entries, next_before={entries['next_before']}, totals={app_totals}")
+
+    assert len(page) == 100 and page[0]["id"] > page[-1]["id"]
+    assert record_us < MAX_RECORD_US, f"record() costs {record_us:.1f}us on the claim path"
+    assert all("COVERING INDEX" in plan for plan in plans.values()), plans
+    assert max(history_ms, deep_ms, wallet_ms) < MAX_QUERY_MS, "a history page was slow"
+    assert all(entry["nonce"] is not None and entry["tx_hash"] for entry in entries["entries"])
+    assert app_totals == [{"token": "USDC", "claims": 5, "amount": app_totals[0]["amount"]}]
+
+
+if __name__ == "__main__":
+    main()
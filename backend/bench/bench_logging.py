@@ -0,0 +1,91 @@
+"""Logging cost on the request thread, per claim.
+
+"old" replays the ten INFO lines the original faucet() wrote for every
+claim, f-string formatted (including the whole tx dict) and written by a
+synchronous StreamHandler. "new" is what a claim logs now: DEBUG detail
+with lazy arguments (dropped at INFO) and one structured event, handed to
+a queue and written as JSON by a background thread.
+
+    cd backend && python bench/bench_logging.py [claims]
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import common  # noqa: F401  (puts backend/ on the path)
+from logs import claim_log, configure_logging, log_fields
+
+TX = {
+    "type": 2, "chainId": 11155111, "nonce": 42, "gas": 65000,
+    "maxFeePerGas": 30000000000, "maxPriorityFeePerGas": 1500000000,
+    "to": "0x1c7D4B196Cb0C7B01d743Fbc6116a902379C7238", "value": 0,
+    "data": "0xa9059cbb" + "00" * 12 + "11" * 20 + "00" * 31 + "0a",
+}
+WALLET = "0x" + "11" * 20
+TX_HASH = "0x" + "ab" * 32
+
+
+def old_claim(logger, i):
+    logger.info(f"Faucet request received: wallet={WALLET}, token=USDC")
+    logger.info(f"Faucet USDC balance: {10**24 / 10**6}")
+    logger.info(f"Adding {0.3:.2f}s delay to spread out requests")
+    logger.info(f"Got nonce {i} for transaction (attempt 1)")
+    logger.info(f"Building transaction: amount={10 * 10**6}, nonce={i}")
+    logger.info(f"Transaction built successfully: {TX}")
+    logger.info("Transaction signed, sending to network...")
+    logger.info("Transaction sent successfully on attempt 1")
+    logger.info(f"Raw tx_hash type: {type(TX_HASH)}, value: {TX_HASH}")
+    logger.info(f"Successfully sent 10 USDC to {WALLET}, tx_hash: {TX_HASH}")
+
+
+def new_claim(logger, i):
+    with claim_log("claim") as log:
+        logger.debug("Faucet request received: wallet=%s, token=%s", WALLET, "USDC")
+        log_fields(wallet=WALLET, token="USDC", outcome="accepted")
+        log.timing("rate_limit", 0.00005)
+        logger.debug("Transaction signed with nonce %s, sending to network...", i)
+        logger.debug("Transaction sent successfully on attempt %d", 1)
+        log_fields(nonce=i, attempts=1, tx_hash=TX_HASH, status_code=200)
+
+
+def measure(claim, logger, claims):
+    started = time.perf_counter()
+    for i in range(claims):
+        claim(logger, i)
+    return (time.perf_counter() - started) / claims * 1e6
+
+
+def main():
+    claims = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    with tempfile.TemporaryDirectory() as tmp:
+        root = logging.getLogger()
+        root.setLevel(logging.INFO)
+        old_handler = logging.FileHandler(os.path.join(tmp, "old.log"))
+        old_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        root.addHandler(old_handler)
+        old_us = measure(old_claim, logging.getLogger("app"), claims)
+        root.removeHandler(old_handler)
+        old_handler.close()
+
+        with open(os.path.join(tmp, "new.log"), "w") as stream:
+            listener = configure_logging(level="INFO", fmt="json", stream=stream)
+            new_us = measure(new_claim, logging.getLogger("app"), claims)
+            listener.stop()
+        with open(os.path.join(tmp, "new.log")) as f:
+            lines = f.read().splitlines()
+        old_size = os.path.getsize(os.path.join(tmp, "old.log"))
+        new_size = os.path.getsize(os.path.join(tmp, "new.log"))
+
+    print(f"claims={claims}")
+    print(f"old: {old_us:.1f}us/claim on the request thread, {old_size / claims:.0f} bytes/claim")
+    print(f"new: {new_us:.1f}us/claim on the request thread, {new_size / claims:.0f} bytes/claim")
+    print(f"speedup: {old_us / new_us:.1f}x")
+
+    assert len(lines) == claims, f"expected one event per claim, got {len(lines)} lines"
+    assert new_us < old_us, "structured logging costs the request thread more than the old lines"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Memory and per-check cost of the in-memory rate limiter under millions of distinct keys.
+
+Every key is new, as with a flood of unique wallet:token pairs. Memory must
+stay flat once the limiter reaches max_keys, and the time per check must
+not grow with the number of keys seen.
+
+    cd backend && python bench/bench_memory_limiter.py [total_keys] [max_keys]
+"""
+import resource
+import statistics
+import sys
+import time
+
+import common  # noqa: F401  (puts backend/ on sys.path)
+from rate_limit import MemoryLimiter
+
+COOLDOWN = 60 * 60 * 24
+REPORT_EVERY = 250_000
+# Late-phase checks may be this much slower than early ones; a scan over every key would be far past it
+MAX_TIME_GROWTH = 1.5
+
+
+def main():
+    total_keys = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    max_keys = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+
+    limiter = MemoryLimiter(max_keys=max_keys)
+    samples = []
+    start = time.perf_counter()
+    for i in range(total_keys):
+        limiter.hit([(f"faucet:0x{i:040x}:usdc", 1, COOLDOWN)])
+        if (i + 1) % REPORT_EVERY == 0:
+            elapsed = time.perf_counter() - start
+            # Peak RSS in KiB on Linux; flat once the store is full
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            per_check = elapsed / REPORT_EVERY * 1e6
+            samples.append((peak_rss, per_check))
+            print(f"{i + 1:>10,} keys  live={len(limiter):>8,}  evicted={limiter.evictions:>10,}  "
+                  f"peak rss={peak_rss / 1024:7.1f} MiB  {per_check:5.2f} us/check")
+            start = time.perf_counter()
+
+    # Steady state starts once the store has filled up
+    steady = samples[1:] or samples
+    mem_growth = steady[-1][0] / steady[0][0]
+    # Median per-check time of the late half against the early half, so one GC pause cannot decide it
+    half = max(1, len(steady) // 2)
+    early = statistics.median(per_check for _, per_check in steady[:half])
+    late = statistics.median(per_check for _, per_check in steady[half:] or steady)
+    time_growth = late / early
+    print(f"memory growth over steady state: {mem_growth:.2f}x, "
+          f"check time early {early:.2f} us, late {late:.2f} us ({time_growth:.2f}x)")
+    assert len(limiter) <= max_keys, "limiter exceeded max_keys"
+    assert mem_growth < 1.2, "memory kept growing after the limiter filled up"
+    assert time_growth < MAX_TIME_GROWTH, \
+        f"checks got {time_growth:.2f}x slower as keys accumulated, over the {MAX_TIME_GROWTH}x bound"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""All four tokens per wallet: /api/faucet/batch vs four /api/faucet calls.
+
+Runs against a mocked RPC with per-call latency. The batch endpoint checks
+every rate limit at once, takes a block of consecutive nonces and sends
+all transfers in one JSON-RPC batch, so it must use fewer send round-trips
+and less wall time per wallet. It also checks partial failure: a wallet
+that already claimed one token still gets the others, and that in async
+mode a batch request is queued as one job the workers pay the same way.
+
+    cd backend && python bench/bench_multi_token.py [wallets] [latency_ms]
+"""
+import logging
+import os
+import sys
+import time
+
+from common import load_app, wallet_for
+from mock_rpc import MockChain, decode_nonce
+
+TOKENS = ["DAI", "USDC", "USDT", "WBTC"]
+
+
+def main():
+    wallets = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.005
+    logging.disable(logging.CRITICAL)
+
+    os.environ.setdefault("CLAIM_MODE", "sync")
+    # Four claims per wallet would trip the default wallet-wide limit quickly
+    os.environ.setdefault("WALLET_CLAIM_LIMIT", "0")
+    # Keep the tracker's receipt batches out of the round-trip counts
+    os.environ.setdefault("TX_POLL_INTERVAL", "3600")
+    chain = MockChain(latency=latency)
+    faucet_app = load_app(chain)
+    client = faucet_app.app.test_client()
+
+    # Warm up gas estimates and fee/balance caches outside the timings
+    client.post("/api/faucet/batch", json={"wallet": wallet_for(10**6), "tokens": TOKENS})
+
+    sends = chain.calls["eth_sendRawTransaction"]
+    started = time.perf_counter()
+    for i in range(wallets):
+        for symbol in TOKENS:
+            resp = client.post("/api/faucet", json={"wallet": wallet_for(i), "token": symbol})
+            assert resp.status_code == 200, resp.get_json()
+    single_elapsed = time.perf_counter() - started
+    single_sends = chain.calls["eth_sendRawTransaction"] - sends
+
+    sends, batches, first_tx = chain.calls["eth_sendRawTransaction"], chain.calls["batch"], len(chain.transactions)
+    started = time.perf_counter()
+    for i in range(wallets, 2 * wallets):
+        resp = client.post("/api/faucet/batch", json={"wallet": wallet_for(i), "tokens": TOKENS})
+        results = resp.get_json()["results"]
+        assert resp.status_code == 200 and all("tx_hash" in result for result in results), results
+    batch_elapsed = time.perf_counter() - started
+    # Sends inside a batch are counted per transaction too; only the rest are extra round-trips
+    batch_count = chain.calls["batch"] - batches
+    batch_round_trips = batch_count + chain.calls["eth_sendRawTransaction"] - sends - len(TOKENS) * batch_count
+
+    nonces = [decode_nonce(raw_tx) for raw_tx in chain.transactions[first_tx:]]
+    groups = [nonces[i:i + len(TOKENS)] for i in range(0, len(nonces), len(TOKENS))]
+    consecutive = all(group == list(range(group[0], group[0] + len(TOKENS))) for group in groups)
+
+    print(f"wallets={wallets} tokens={len(TOKENS)} rpc latency={latency * 1000:.1f}ms")
+    print(f"single: {single_elapsed / wallets * 1000:.1f}ms/wallet, {single_sends / wallets:.1f} send round-trips/wallet")
+    print(f"batch:  {batch_elapsed / wallets * 1000:.1f}ms/wallet, {batch_round_trips / wallets:.1f} send round-trips/wallet")
+    print(f"consecutive nonces per request: {consecutive}")
+
+    # Partial failure: one token still cooling down, one unknown
+    partial_wallet = wallet_for(3 * wallets)
+    client.post("/api/faucet", json={"wallet": partial_wallet, "token": "USDC"})
+    resp = client.post("/api/faucet/batch", json={"wallet": partial_wallet, "tokens": TOKENS + ["NOPE"]})
+    results = {result["token"]: result for result in resp.get_json()["results"]}
+    print(f"partial: status={resp.status_code} " + " ".join(
+        f"{symbol}={'sent' if 'tx_hash' in result else result.get('limit', 'error')}" for symbol, result in results.items()))
+
+    # Async: each request is one queued job, paid with one JSON-RPC batch by a worker
+    faucet_app.CLAIM_MODE = "async"
+    sends, batches, first_tx = chain.calls["eth_sendRawTransaction"], chain.calls["batch"], len(chain.transactions)
+    async_wallets = 10
+    claim_ids = []
+    for i in range(4 * wallets, 4 * wallets + async_wallets):
+        queued = client.post("/api/faucet/batch", json={"wallet": wallet_for(i), "tokens": TOKENS})
+        assert queued.status_code == 202, queued.get_json()
+        claim_ids += [result["claim_id"] for result in queued.get_json()["results"]]
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        claims = [faucet_app.claim_queue.get(claim_id) for claim_id in claim_ids]
+        if all(claim["status"] not in ("queued", "sending") for claim in claims):
+            break
+        time.sleep(0.05)
+    async_batches = chain.calls["batch"] - batches
+    async_nonces = [decode_nonce(raw_tx) for raw_tx in chain.transactions[first_tx:]]
+    async_groups = [async_nonces[i:i + len(TOKENS)] for i in range(0, len(async_nonces), len(TOKENS))]
+    print(f"async:  {async_batches} send batches for {async_wallets} wallets, "
+          f"{sum(claim['status'] == 'sent' for claim in claims)}/{len(claims)} claims sent")
+
+    assert consecutive, f"nonces were not consecutive per request: {groups[:3]}"
+    assert all(claim["status"] == "sent" for claim in claims), claims
+    assert async_batches == async_wallets, "async batch requests were not paid one JSON-RPC batch each"
+    assert chain.calls["eth_sendRawTransaction"] - sends == len(TOKENS) * async_wallets
+    assert all(group == list(range(group[0], group[0] + len(TOKENS))) for group in async_groups), async_groups
+    assert batch_round_trips < single_sends, "batch endpoint did not save send round-trips"
+    assert batch_elapsed < single_elapsed, "batch endpoint was slower than single claims"
+    assert resp.status_code == 200
+    assert results["USDC"]["limit"] == "cooldown" and "error" in results["NOPE"]
+    assert all("tx_hash" in results[symbol] for symbol in ("DAI", "USDT", "WBTC"))
+
+
+if __name__ == "__main__":
+    main()
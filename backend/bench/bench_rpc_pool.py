@@ -0,0 +1,74 @@
+"""RPCPool routing and failover against local stub JSON-RPC servers.
+
+Three stubs share one MockChain: a fast one, a slow one and a flaky one.
+Reads should settle on the fast node; when it is shut down mid-run the
+pool should fail over without errors, and broadcasts should reach every node.
+
+    cd backend && python bench/bench_rpc_pool.py [reads]
+"""
+import logging
+import sys
+import time
+
+from eth_account import Account
+from web3 import Web3
+
+from common import TEST_PRIVATE_KEY, percentile
+from mock_rpc import MockChain
+from rpc_pool import RPCPool
+from stub_rpc_server import StubRPCServer
+
+
+def run_reads(w3, count):
+    latencies = []
+    errors = 0
+    for _ in range(count):
+        start = time.perf_counter()
+        try:
+            w3.eth.block_number
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    return latencies, errors
+
+
+def main():
+    reads = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    logging.disable(logging.WARNING)
+
+    chain = MockChain()
+    fast = StubRPCServer(chain, latency=0.002).start()
+    slow = StubRPCServer(chain, latency=0.030).start()
+    flaky = StubRPCServer(chain, latency=0.005, error_rate=0.3).start()
+    pool = RPCPool([slow.url, flaky.url, fast.url], timeout=2, health_interval=1)
+    w3 = Web3(pool)
+
+    latencies, errors = run_reads(w3, reads)
+    print(f"warm:     p50={percentile(latencies, 50) * 1000:.1f}ms errors={errors} "
+          f"requests fast/slow/flaky={fast.requests}/{slow.requests}/{flaky.requests}")
+    share = fast.requests / max(1, fast.requests + slow.requests + flaky.requests)
+    assert share > 0.8, f"only {share:.0%} of reads went to the fastest node"
+
+    fast.stop()
+    latencies, errors = run_reads(w3, reads)
+    print(f"failover: p50={percentile(latencies, 50) * 1000:.1f}ms errors={errors}")
+    assert errors == 0, "reads failed after the fastest node went away"
+
+    before = (slow.requests, flaky.requests)
+    raw_tx_nonce = chain.next_nonce
+    signed = Account.from_key(TEST_PRIVATE_KEY).sign_transaction({
+        "to": "0x" + "11" * 20, "value": 0, "gas": 21000, "nonce": raw_tx_nonce,
+        "maxFeePerGas": 2 * 10**9, "maxPriorityFeePerGas": 10**9, "chainId": 11155111, "type": 2,
+    })
+    w3.eth.send_raw_transaction(signed.raw_transaction)
+    reached = (slow.requests > before[0]) + (flaky.requests > before[1])
+    print(f"broadcast reached {reached}/2 remaining nodes")
+    print(pool.status())
+    assert chain.next_nonce == raw_tx_nonce + 1
+
+    slow.stop()
+    flaky.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Send throughput against the number of hot wallets.
+
+Each run imports the app in a fresh process with PRIVATE_KEYS holding
+`shards` throwaway keys and its real RPC pool pointed at a stub HTTP node
+that takes `latency` seconds per call, then pushes claims through it from
+a thread pool. Every wallet has its own nonce lock, so throughput should
+grow roughly linearly with the number of shards until the pool runs out
+of threads. The node is slow enough that client and stub together stay
+well under one CPU core even at 8 shards.
+
+    cd backend && python bench/bench_shards.py [claims] [max_shards]
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from eth_utils import keccak
+
+from common import load_app, wallet_for
+from mock_rpc import MockChain
+from stub_rpc_server import StubRPCServer
+
+LATENCY = 0.1
+THREADS = 32
+
+
+def shard_keys(count):
+    return ["0x" + keccak(text=f"faucet-bench-shard-{i}").hex() for i in range(count)]
+
+
+def run(shards, claims):
+    logging.disable(logging.CRITICAL)
+    os.environ["PRIVATE_KEYS"] = ",".join(shard_keys(shards))
+    os.environ["CLAIM_MODE"] = "sync"
+    chain = MockChain()
+    server = StubRPCServer(chain).start()
+    os.environ["RPC_URLS"] = server.url
+    faucet_app = load_app(chain, mock_provider=False)
+    client = faucet_app.app.test_client()
+    symbol = faucet_app.token_registry.symbols()[0]
+    # Warm the gas estimate and balance caches before the node gets slow
+    client.post("/api/faucet", json={"wallet": wallet_for(claims), "token": symbol})
+    server.latency = LATENCY
+
+    def claim(i):
+        return client.post("/api/faucet", json={"wallet": wallet_for(i), "token": symbol}).status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(THREADS) as pool:
+        statuses = list(pool.map(claim, range(claims)))
+    elapsed = time.perf_counter() - start
+    server.stop()
+
+    senders = {wallet["address"]: wallet["sent"] for wallet in faucet_app.wallet_pool.status()}
+    print(json.dumps({
+        "shards": shards,
+        "failures": sum(1 for status in statuses if status != 200),
+        "throughput": claims / elapsed,
+        "nonces": chain.next_nonce,
+        "per_wallet": sorted(senders.values()),
+    }))
+
+
+def main():
+    if sys.argv[1:2] == ["--run"]:
+        return run(int(sys.argv[2]), int(sys.argv[3]))
+
+    claims = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    max_shards = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    results = []
+    shards = 1
+    while shards <= max_shards:
+        output = subprocess.run(
+            [sys.executable, __file__, "--run", str(shards), str(claims)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        results.append(result)
+        print(f"shards={shards} throughput={result['throughput']:.0f}/s failures={result['failures']} per wallet={result['per_wallet']}")
+        assert result["failures"] == 0
+        assert result["nonces"] == claims + 1
+        shards *= 2
+
+    speedup = results[-1]["throughput"] / results[0]["throughput"]
+    print(f"speedup with {results[-1]['shards']} shards: {speedup:.1f}x")
+    assert speedup > results[-1]["shards"] / 2, "throughput is not scaling with the number of shards"
+
+
+if __name__ == "__main__":
+    main()
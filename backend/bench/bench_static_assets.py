@@ -0,0 +1,122 @@
+"""Static asset serving: per-request directory probing vs the manifest.
+
+Builds a fake Vite dist (index.html plus content-hashed bundles) in a temp
+directory, then serves it through api/index.py's old lookup (os.path.exists
+over four candidate directories, then send_from_directory) and through
+StaticManifest. Checks gzip/brotli negotiation, 304 on a matching ETag and
+immutable caching for /assets/.
+
+The win asserted is on the wire: a browser gets the bundle compressed, and
+never asks for it again. Server time per request is printed for reference;
+both paths are dominated by Flask's request handling, so it is not asserted.
+
+    cd backend && python bench/bench_static_assets.py [requests]
+"""
+import gzip
+import os
+import sys
+import tempfile
+import time
+
+from flask import Flask, send_from_directory
+
+import common  # noqa: F401  (puts backend/ on sys.path)
+from static_assets import IMMUTABLE_CACHE, REVALIDATE_CACHE, StaticManifest, precompress
+
+
+def build_dist(root):
+    os.makedirs(os.path.join(root, "assets"))
+    with open(os.path.join(root, "index.html"), "w") as f:
+        f.write("<!doctype html><script src='/assets/index-4f3a9c.js'></script>" + "<p>faucet</p>" * 200)
+    with open(os.path.join(root, "assets", "index-4f3a9c.js"), "w") as f:
+        f.write("export const abi = " + repr(list(range(20000))) + ";\n")
+    with open(os.path.join(root, "assets", "index-77b1e0.css"), "w") as f:
+        f.write("body { margin: 0 }\n" * 500)
+
+
+def old_app(dirs):
+    app = Flask(__name__, static_folder=None)
+
+    @app.route("/<path:filename>")
+    def serve(filename):
+        for static_dir in dirs:
+            if os.path.exists(os.path.join(static_dir, filename)):
+                return send_from_directory(static_dir, filename)
+        return "not found", 404
+    return app
+
+
+def new_app(dirs):
+    app = Flask(__name__, static_folder=None)
+    manifest = StaticManifest(dirs)
+
+    @app.route("/<path:filename>")
+    def serve(filename):
+        return manifest.serve("/" + filename) or ("not found", 404)
+    return app
+
+
+# What a browser sends for a script
+BROWSER_HEADERS = {"Accept-Encoding": "gzip, deflate, br"}
+# A browser does not revalidate a fresh response before this, so a year means never
+MIN_IMMUTABLE_AGE = 60 * 60 * 24 * 365
+
+
+def time_requests(client, path, count, headers=None):
+    start = time.perf_counter()
+    for _ in range(count):
+        client.get(path, headers=headers or {})
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with tempfile.TemporaryDirectory() as tmp:
+        # The real file lives in the third candidate directory, like a miss-heavy deploy
+        dirs = [os.path.join(tmp, name) for name in ("a", "b", "dist", "c")]
+        build_dist(dirs[2])
+        print(f"precompressed {precompress(dirs[2])} files")
+
+        old = old_app(dirs).test_client()
+        new = new_app(dirs).test_client()
+        bundle = "/assets/index-4f3a9c.js"
+
+        resp = new.get(bundle, headers={"Accept-Encoding": "gzip, br"})
+        raw_size = os.path.getsize(os.path.join(dirs[2], bundle[1:]))
+        print(f"bundle: {raw_size} bytes raw, {len(resp.data)} bytes {resp.headers.get('Content-Encoding')}")
+        assert resp.headers["Cache-Control"] == IMMUTABLE_CACHE
+        assert resp.headers.get("Content-Encoding") in ("gzip", "br")
+        if resp.headers["Content-Encoding"] == "gzip":
+            assert len(gzip.decompress(resp.data)) == raw_size
+        assert "Accept-Encoding" in resp.headers["Vary"]
+
+        etag = resp.headers["ETag"]
+        resp = new.get(bundle, headers={"Accept-Encoding": "gzip, br", "If-None-Match": etag})
+        assert resp.status_code == 304 and not resp.data
+        plain = new.get(bundle)
+        assert "Content-Encoding" not in plain.headers and len(plain.data) == raw_size
+        assert plain.headers["ETag"] != etag, "each encoding needs its own ETag"
+        index = new.get("/index.html")
+        assert index.headers["Cache-Control"] == REVALIDATE_CACHE
+
+        # Bytes a browser downloads for the bundle, and whether a repeat visit asks again
+        old_resp, new_resp = old.get(bundle, headers=BROWSER_HEADERS), new.get(bundle, headers=BROWSER_HEADERS)
+        new_max_age = new_resp.cache_control.max_age or 0
+        print(f"browser download: old {len(old_resp.data)} bytes, manifest {len(new_resp.data)} bytes "
+              f"({len(old_resp.data) / len(new_resp.data):.1f}x less)")
+        print(f"repeat visits: old Cache-Control={old_resp.headers.get('Cache-Control')!r}, "
+              f"manifest Cache-Control={new_resp.headers.get('Cache-Control')!r}")
+        assert len(new_resp.data) * 2 < len(old_resp.data), "the manifest should at least halve the bundle download"
+        assert not (old_resp.cache_control.max_age or 0) and new_max_age >= MIN_IMMUTABLE_AGE \
+            and new_resp.cache_control.immutable, "hashed bundles should be cached for good, not revalidated"
+
+        old_time = time_requests(old, bundle, count, BROWSER_HEADERS)
+        new_time = time_requests(new, bundle, count, BROWSER_HEADERS)
+        revalidate = time_requests(new, bundle, count, {"Accept-Encoding": "gzip", "If-None-Match": new.get(bundle, headers={"Accept-Encoding": "gzip"}).headers["ETag"]})
+        print(f"old lookup + send:   {old_time * 1e6:7.1f} us/request")
+        print(f"manifest + send:     {new_time * 1e6:7.1f} us/request")
+        print(f"manifest 304:        {revalidate * 1e6:7.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
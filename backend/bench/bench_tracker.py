@@ -0,0 +1,76 @@
+"""Transaction tracker against a mocked RPC.
+
+Sends a burst of claims, then walks the mock chain through two phases:
+
+1. Nothing is mined for longer than STUCK_TX_SECONDS. Every pending
+   nonce must be re-signed once with higher fees.
+2. A block is mined. One batched receipt request must confirm every
+   claim and record the replacement hash that was actually mined.
+
+Reports how many receipt lookups went out and how many RPC round-trips they took.
+
+    cd backend && python bench/bench_tracker.py [claims]
+"""
+import logging
+import os
+import sys
+import time
+
+from common import load_app, wallet_for
+from mock_rpc import MockChain
+
+STUCK_AFTER = 0.2
+
+
+def main():
+    claims = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    logging.disable(logging.CRITICAL)
+
+    os.environ["CLAIM_MODE"] = "sync"
+    os.environ["STUCK_TX_SECONDS"] = str(STUCK_AFTER)
+    # The bench drives poll() itself; keep the background thread out of the way
+    os.environ["TX_POLL_INTERVAL"] = "3600"
+    chain = MockChain()
+    faucet_app = load_app(chain)
+    tracker = faucet_app.tx_tracker
+    client = faucet_app.app.test_client()
+    symbol = faucet_app.token_registry.symbols()[0]
+
+    claim_ids = []
+    for i in range(claims):
+        resp = client.post("/api/faucet", json={"wallet": wallet_for(i), "token": symbol})
+        assert resp.status_code == 200, resp.get_json()
+        claim_ids.append(resp.get_json()["claim_id"])
+    original = {claim_id: faucet_app.claim_queue.get(claim_id)["tx_hash"] for claim_id in claim_ids}
+
+    status = tracker.status()
+    print(f"after send: {status}")
+    assert status["pending"] == claims
+
+    # Phase 1: nothing mined, every transaction goes stale and is replaced
+    time.sleep(STUCK_AFTER * 1.5)
+    tracker.poll()
+    print(f"after stall: replaced={tracker.replaced} mempool replacements={chain.replaced}")
+    assert tracker.replaced == claims and chain.replaced == claims
+
+    # Phase 2: one block confirms everything with one batched receipt request
+    chain.mine()
+    batches = chain.calls["batch"]
+    receipts = chain.calls["eth_getTransactionReceipt"]
+    tracker.poll()
+    batches = chain.calls["batch"] - batches
+    receipts = chain.calls["eth_getTransactionReceipt"] - receipts
+    status = tracker.status()
+    print(f"after block: {status}")
+    print(f"receipt lookups={receipts} in {batches} RPC round-trip(s)")
+    assert status["pending"] == 0 and status["confirmed"] == claims
+    assert batches == 1
+
+    for claim_id in claim_ids:
+        claim = faucet_app.claim_queue.get(claim_id)
+        assert claim["status"] == "confirmed", claim
+        assert claim["tx_hash"] != original[claim_id], "claim still points at the replaced hash"
+
+
+if __name__ == "__main__":
+    main()
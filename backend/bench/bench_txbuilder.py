@@ -0,0 +1,111 @@
+"""Microbenchmark: web3 build_transaction + sign_transaction vs TransferBuilder.
+
+Both paths must produce byte-identical signed transactions; the script also
+reports how many RPC calls each path made against the mock node.
+
+    cd backend && python bench/bench_txbuilder.py [iterations]
+"""
+import sys
+import time
+import tracemalloc
+
+from web3 import Web3
+
+from common import TEST_PRIVATE_KEY, wallet_for
+from mock_rpc import MockChain, MockProvider, SEPOLIA_CHAIN_ID
+from fees import FeeOracle
+from txbuilder import TransferBuilder
+
+TOKEN = Web3.to_checksum_address("0xcF9884827F587Cd9a0bDce33995B2333eE7e8285")
+AMOUNT = 10 * 10**6
+
+ERC20_TRANSFER_ABI = [{
+    "constant": False,
+    "inputs": [
+        {"name": "_to", "type": "address"},
+        {"name": "_value", "type": "uint256"}
+    ],
+    "name": "transfer",
+    "outputs": [{"name": "", "type": "bool"}],
+    "type": "function"
+}]
+
+
+def measure(label, fn, iterations):
+    fn(0)  # warm caches
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    # tracemalloc slows everything down, so allocation is sampled separately
+    tracemalloc.start()
+    for i in range(10):
+        fn(i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_call = elapsed / iterations * 1e6
+    print(f"{label:<32} {per_call:9.1f} us/tx   peak alloc {peak / 1024:8.1f} KiB")
+    return per_call
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    chain = MockChain()
+    w3 = Web3(MockProvider(chain))
+    fee_oracle = FeeOracle(w3)
+    fee_oracle.refresh()
+    fees = fee_oracle.current()
+    builder = TransferBuilder(TEST_PRIVATE_KEY, SEPOLIA_CHAIN_ID, fee_oracle)
+    contract = w3.eth.contract(address=TOKEN, abi=ERC20_TRANSFER_ABI)
+
+    def web3_path(i):
+        tx = contract.functions.transfer(Web3.to_checksum_address(wallet_for(i)), AMOUNT).build_transaction({
+            "from": builder.address,
+            "nonce": i,
+            "gas": 120000,
+            "maxFeePerGas": fees["maxFeePerGas"],
+            "maxPriorityFeePerGas": fees["maxPriorityFeePerGas"],
+            "chainId": SEPOLIA_CHAIN_ID,
+        })
+        signed_tx = w3.eth.account.sign_transaction(tx, private_key=TEST_PRIVATE_KEY)
+        return signed_tx.raw_transaction
+
+    def local_path(i):
+        return builder.build_and_sign(TOKEN, Web3.to_checksum_address(wallet_for(i)), AMOUNT, i)
+
+    for i in range(5):
+        assert web3_path(i) == local_path(i), "local builder output differs from web3"
+
+    chain.calls.clear()
+    before = measure("build_transaction + sign", web3_path, iterations)
+    web3_calls = sum(chain.calls.values())
+    chain.calls.clear()
+    after = measure("TransferBuilder.build_and_sign", local_path, iterations)
+    local_calls = sum(chain.calls.values())
+
+    print(f"RPC calls: web3 path {web3_calls}, local path {local_calls}")
+    print(f"speedup: {before / after:.2f}x")
+
+    # Building alone, to separate calldata encoding from ECDSA signing
+    def web3_build(i):
+        return contract.functions.transfer(Web3.to_checksum_address(wallet_for(i)), AMOUNT).build_transaction({
+            "from": builder.address,
+            "nonce": i,
+            "gas": 120000,
+            "maxFeePerGas": fees["maxFeePerGas"],
+            "maxPriorityFeePerGas": fees["maxPriorityFeePerGas"],
+            "chainId": SEPOLIA_CHAIN_ID,
+        })
+
+    def local_build(i):
+        return builder.build(TOKEN, Web3.to_checksum_address(wallet_for(i)), AMOUNT, i)
+
+    build_before = measure("build_transaction only", web3_build, iterations)
+    build_after = measure("TransferBuilder.build only", local_build, iterations)
+    print(f"build speedup: {build_before / build_after:.2f}x")
+    assert local_calls == 0, "local builder must not touch the node"
+
+
+if __name__ == "__main__":
+    main()
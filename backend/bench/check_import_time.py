@@ -0,0 +1,107 @@
+"""Import-time regression check for serverless cold starts.
+
+Imports api/index.py (the Vercel entry point) in a fresh interpreter under
+`python -X importtime`, pointed at a stub RPC node that counts requests
+and at a REDIS_URL whose listener counts connections. Fails if the import
+calls the node, connects to Redis or takes more than `budget_seconds` longer
+than importing the third-party packages alone, and lists the slowest modules.
+
+The baseline import runs first, in the same fresh-interpreter setup, so a
+cold disk cache slows the baseline rather than failing the check.
+
+    cd backend && python bench/check_import_time.py [budget_seconds]
+"""
+import os
+import socket
+import subprocess
+import sys
+
+from eth_account import Account
+
+from common import TEST_PRIVATE_KEY
+from mock_rpc import MockChain
+from stub_rpc_server import StubRPCServer
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "api")
+# What api/index.py would cost if the app added nothing on top of its dependencies
+BASELINE_IMPORT = "import dotenv, flask, flask_cors, redis, web3"
+
+
+def parse_importtime(stderr):
+    """(cumulative_us, self_us, module) for every line -X importtime printed"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), module.rstrip()))
+    return rows
+
+
+def import_time(statement, env):
+    """(total_seconds, rows, result) for `statement` run under -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=API_DIR, env=env, capture_output=True, text=True, timeout=60,
+    )
+    rows = parse_importtime(result.stderr)
+    return sum(self_us for _, self_us, _ in rows) / 1e6, rows, result
+
+
+def count_connections(listener):
+    """Connections waiting on a listening socket that was never accepted from"""
+    listener.setblocking(False)
+    count = 0
+    while True:
+        try:
+            conn, _ = listener.accept()
+        except BlockingIOError:
+            return count
+        conn.close()
+        count += 1
+
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+
+    server = StubRPCServer(MockChain()).start()
+    redis_listener = socket.socket()
+    redis_listener.bind(("127.0.0.1", 0))
+    redis_listener.listen(16)
+    env = dict(
+        os.environ,
+        RPC_URL=server.url,
+        REDIS_URL=f"redis://127.0.0.1:{redis_listener.getsockname()[1]}/0",
+        PRIVATE_KEY=TEST_PRIVATE_KEY,
+        FAUCET_ADDRESS=Account.from_key(TEST_PRIVATE_KEY).address,
+    )
+    env.pop("RPC_URLS", None)
+    env.pop("CHAIN_ID", None)
+    try:
+        baseline, _, _ = import_time(BASELINE_IMPORT, env)
+        # A connection to the Redis listener is never answered, so it would hang the import
+        total, rows, result = import_time("import index", env)
+    except subprocess.TimeoutExpired:
+        raise SystemExit("importing api/index.py hung, most likely waiting on Redis")
+    finally:
+        server.stop()
+    redis_connections = count_connections(redis_listener)
+    redis_listener.close()
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        raise SystemExit("importing api/index.py failed")
+
+    print("slowest imports (cumulative):")
+    for cumulative_us, _, module in sorted(rows, reverse=True)[:10]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {module.strip()}")
+    print(f"total import time: {total:.3f}s, dependencies alone: {baseline:.3f}s "
+          f"(budget {budget:.1f}s over the dependencies)")
+    print(f"RPC requests during import: {server.requests}, Redis connections: {redis_connections}")
+    assert server.requests == 0, "importing the app must not call the RPC node"
+    assert redis_connections == 0, "importing the app must not connect to Redis"
+    assert total - baseline < budget, \
+        f"the app adds {total - baseline:.3f}s to its dependencies' import time, over the {budget:.1f}s budget"
+
+
+if __name__ == "__main__":
+    main()
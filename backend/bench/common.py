@@ -0,0 +1,47 @@
+"""Shared setup for the benchmark scripts: import the Flask app against a mock chain"""
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+# Well-known throwaway key (hardhat account #0), never holds real funds
+TEST_PRIVATE_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80"
+# Sent by benchmarks that call the /api/admin/* endpoints
+ADMIN_TOKEN = "bench-admin-token"
+ADMIN_HEADERS = {"Authorization": f"Bearer {ADMIN_TOKEN}"}
+
+
+def load_app(chain, mock_provider=True):
+    """Import backend/app.py with test credentials and point it at `chain`.
+
+    With mock_provider=False the app keeps its real RPC pool, so set
+    RPC_URL(S) to a stub server first.
+    """
+    os.environ.setdefault("RPC_URL", "http://127.0.0.1:1")
+    # Every benchmark claim comes from 127.0.0.1, so only the per-wallet limits apply
+    os.environ.setdefault("IP_CLAIM_LIMIT", "0")
+    os.environ.setdefault("GLOBAL_CLAIMS_PER_MINUTE", "0")
+    # Benchmarks measure the claim path itself; bench_admission.py turns shedding back on
+    os.environ.setdefault("ADMISSION_RATE", "0")
+    # Keep the ledger writes in the measured path, but out of the source tree
+    os.environ.setdefault("LEDGER_PATH", os.path.join(tempfile.mkdtemp(prefix="faucet-bench-"), "ledger.sqlite3"))
+    os.environ["PRIVATE_KEY"] = TEST_PRIVATE_KEY
+    os.environ.setdefault("ADMIN_TOKEN", ADMIN_TOKEN)
+    from mock_rpc import MockProvider
+    import app as faucet_app
+    if mock_provider:
+        faucet_app.w3.provider = MockProvider(chain)
+    return faucet_app
+
+
+def wallet_for(i):
+    """Distinct, valid recipient address per claim so rate limits never trip"""
+    return "0x" + f"{i + 1:040x}"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
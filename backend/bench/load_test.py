@@ -0,0 +1,253 @@
+"""Open-loop load test of POST /api/faucet against a mock chain.
+
+Requests are fired on a fixed schedule at the target rate whether or not
+earlier ones have finished, and each latency is measured from the
+request's scheduled start. A server that falls behind therefore shows
+queueing delay instead of quietly lowering the offered rate, and goodput
+counts only the successes answered within --deadline.
+
+The chain is a MockChain, reached in-process or through stub HTTP JSON-RPC
+servers (--transport http), with configurable latency, injected nonce
+errors, a capped pending pool and a block interval. Results are written as
+JSON, by default to bench/results/load-<commit>.json, and --compare checks
+them against an earlier run:
+
+    cd backend && python bench/load_test.py --rps 100 --duration 10 --latency 20
+    cd backend && python bench/load_test.py --nonce-error-rate 0.05 --compare bench/results/load-f1c754c.json
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from common import BACKEND_DIR, load_app, percentile, wallet_for
+from mock_rpc import MockChain
+from stub_rpc_server import StubRPCServer
+
+RESULTS_DIR = os.path.join(BACKEND_DIR, "bench", "results")
+# Compared with --compare: (metric, higher is better)
+COMPARED = [("throughput", True), ("goodput", True), ("p50_ms", False), ("p95_ms", False), ("p99_ms", False), ("rpc_round_trips_per_claim", False)]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rps", type=float, default=100, help="offered claims per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load")
+    parser.add_argument("--mode", choices=["sync", "async"], default="sync",
+                        help="CLAIM_MODE; sync puts the whole disbursement inside the measured latency")
+    parser.add_argument("--transport", choices=["inproc", "http"], default="inproc")
+    parser.add_argument("--endpoints", type=int, default=1, help="stub RPC servers with --transport http")
+    parser.add_argument("--latency", type=float, default=0, help="RPC latency in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="extra random RPC latency in ms (http only)")
+    parser.add_argument("--nonce-error-rate", type=float, default=0, help="share of sends rejected with a nonce error")
+    parser.add_argument("--pending-limit", type=int, default=None, help="pending pool size before 'txpool is full'")
+    parser.add_argument("--block-time", type=float, default=2, help="seconds between mined blocks")
+    parser.add_argument("--workers", type=int, default=64, help="client threads")
+    parser.add_argument("--deadline", type=float, default=2, help="seconds within which a success counts as goodput")
+    parser.add_argument("--token", default="USDC")
+    parser.add_argument("--out", help="results file (default bench/results/load-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="fail --compare if a metric is this much worse (0.25 = 25%%)")
+    return parser.parse_args()
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def setup(args):
+    """Start the chain (and stub servers) and import the app against it"""
+    os.environ["CLAIM_MODE"] = args.mode
+    # Every client wallet is new, so only the limits that would throttle the test are off
+    os.environ.setdefault("WALLET_CLAIM_LIMIT", "0")
+    chain = MockChain(
+        latency=args.latency / 1000 if args.transport == "inproc" else 0,
+        nonce_error_rate=args.nonce_error_rate,
+        pending_limit=args.pending_limit,
+    )
+    servers = []
+    if args.transport == "http":
+        servers = [StubRPCServer(chain, latency=args.latency / 1000, jitter=args.jitter / 1000).start()
+                   for _ in range(args.endpoints)]
+        os.environ["RPC_URLS"] = ",".join(server.url for server in servers)
+    faucet_app = load_app(chain, mock_provider=args.transport == "inproc")
+    return chain, servers, faucet_app
+
+
+def round_trips(chain, servers):
+    return sum(server.requests for server in servers) if servers else chain.round_trips
+
+
+def wait_for_claims(faucet_app, claim_ids, timeout=60):
+    """Async mode: wait until every accepted claim has left the queue; returns the claims"""
+    deadline = time.monotonic() + timeout
+    claims = {}
+    while time.monotonic() < deadline:
+        for claim_id in claim_ids:
+            if claim_id not in claims:
+                claim = faucet_app.claim_queue.get(claim_id)
+                if claim and claim["status"] not in ("queued", "sending"):
+                    claims[claim_id] = claim
+        if len(claims) == len(claim_ids):
+            break
+        time.sleep(0.1)
+    return list(claims.values())
+
+
+def run(args):
+    chain, servers, faucet_app = setup(args)
+    from metrics import CLAIM_ERRORS_TOTAL, NONCE_COLLISION
+    client = faucet_app.app.test_client()
+    stop_mining = chain.start_mining(args.block_time)
+
+    # Warm up gas estimates, fee and balance caches and the nonce sequence
+    warm_up = [client.post("/api/faucet", json={"wallet": wallet_for(10**6 + i), "token": args.token}) for i in range(5)]
+    if args.mode == "async":
+        # Let the warm-up claims be sent before the counters are snapshotted
+        wait_for_claims(faucet_app, [resp.get_json().get("claim_id") for resp in warm_up if resp.status_code == 202])
+
+    trips_before = round_trips(chain, servers)
+    calls_before = Counter(chain.calls)
+    collisions_before = CLAIM_ERRORS_TOTAL.value(error=NONCE_COLLISION)
+    injected_before = chain.injected_nonce_errors
+    rejections_before = chain.pool_rejections
+    transactions_before = chain.next_nonce
+
+    total = int(args.rps * args.duration)
+    results = [None] * total
+    finished = threading.Event()
+    remaining = [total]
+    remaining_lock = threading.Lock()
+
+    def claim(i, scheduled):
+        resp = client.post("/api/faucet", json={"wallet": wallet_for(i), "token": args.token})
+        body = resp.get_json(silent=True) or {}
+        results[i] = (resp.status_code, time.perf_counter() - scheduled, body.get("claim_id"))
+        with remaining_lock:
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                finished.set()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for i in range(total):
+            scheduled = started + i / args.rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(claim, i, scheduled)
+        finished.wait()
+    elapsed = time.perf_counter() - started
+
+    statuses = Counter(status for status, _, _ in results)
+    ok = [result for result in results if result[0] < 300]
+    latencies = [latency for _, latency, _ in ok] or [0]
+    on_time = sum(latency <= args.deadline for _, latency, _ in ok)
+
+    disbursement = {}
+    if args.mode == "async":
+        claims = wait_for_claims(faucet_app, [claim_id for _, _, claim_id in ok if claim_id])
+        sent = [claim for claim in claims if claim["status"] != "failed"]
+        times = [claim["updated_at"] - claim["created_at"] for claim in sent] or [0]
+        disbursement = {
+            "sent": len(sent),
+            "failed": len(claims) - len(sent),
+            "p50_ms": round(percentile(times, 50) * 1000, 2),
+            "p95_ms": round(percentile(times, 95) * 1000, 2),
+        }
+    stop_mining.set()
+    for server in servers:
+        server.stop()
+
+    claims_done = max(1, len(ok))
+    calls = Counter(chain.calls)
+    calls.subtract(calls_before)
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {key: value for key, value in vars(args).items() if key not in ("out", "compare", "max_regression")},
+        "results": {
+            "requests": total,
+            "succeeded": len(ok),
+            "statuses": {str(status): count for status, count in sorted(statuses.items())},
+            "elapsed_s": round(elapsed, 3),
+            "offered_rps": args.rps,
+            "throughput": round(len(ok) / elapsed, 2),
+            "goodput": round(on_time / elapsed, 2),
+            "shed": statuses.get(503, 0),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "max_ms": round(max(latencies) * 1000, 2),
+            "nonce_collisions": CLAIM_ERRORS_TOTAL.value(error=NONCE_COLLISION) - collisions_before,
+            "injected_nonce_errors": chain.injected_nonce_errors - injected_before,
+            "pool_rejections": chain.pool_rejections - rejections_before,
+            "transactions": chain.next_nonce - transactions_before,
+            "rpc_round_trips_per_claim": round((round_trips(chain, servers) - trips_before) / claims_done, 2),
+            "rpc_calls_per_claim": {method: round(count / claims_done, 2)
+                                    for method, count in sorted(calls.items()) if count > 0},
+            "disbursement": disbursement,
+        },
+    }
+
+
+def compare(report, baseline_path, max_regression):
+    """Print the change of each compared metric; returns the names that regressed too far"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline['commit']} ({baseline_path}):")
+    regressed = []
+    for name, higher_is_better in COMPARED:
+        old, new = baseline["results"].get(name), report["results"].get(name)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        flag = "  REGRESSION" if worse > max_regression else ""
+        print(f"  {name}: {old} -> {new} ({change:+.1%}){flag}")
+        if flag:
+            regressed.append(name)
+    if baseline["config"] != report["config"]:
+        print("  note: configs differ, compare with care")
+    return regressed
+
+
+def main():
+    args = parse_args()
+    logging.disable(logging.CRITICAL)
+    report = run(args)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"load-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    results = report["results"]
+    print(f"offered={args.rps}/s for {args.duration}s ({args.mode}, {args.transport}, rpc latency {args.latency}ms)")
+    print(f"succeeded={results['succeeded']}/{results['requests']} statuses={results['statuses']} "
+          f"throughput={results['throughput']}/s goodput={results['goodput']}/s")
+    print(f"p50={results['p50_ms']}ms p95={results['p95_ms']}ms p99={results['p99_ms']}ms max={results['max_ms']}ms")
+    print(f"nonce collisions={results['nonce_collisions']} (injected {results['injected_nonce_errors']}) "
+          f"pool rejections={results['pool_rejections']}")
+    print(f"rpc round-trips/claim={results['rpc_round_trips_per_claim']} calls/claim={results['rpc_calls_per_claim']}")
+    if results["disbursement"]:
+        print(f"disbursement: {results['disbursement']}")
+    print(f"results written to {out}")
+
+    if args.compare and compare(report, args.compare, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""In-process stand-in for a Sepolia JSON-RPC node, used by the benchmarks"""
+import random
+import threading
+import time
+from collections import Counter
+
+import rlp
+from eth_account import Account
+from eth_utils import keccak
+from web3.providers.base import JSONBaseProvider
+
+SEPOLIA_CHAIN_ID = 11155111
+
+
+def decode_nonce(raw_tx):
+    """Pull the nonce out of a signed legacy or typed transaction"""
+    if raw_tx[0] >= 0xc0:
+        fields = rlp.decode(raw_tx)
+        nonce_field = fields[0]
+    else:
+        fields = rlp.decode(raw_tx[1:])
+        nonce_field = fields[1]
+    return int.from_bytes(nonce_field, "big")
+
+
+def decode_typed_tx(raw_tx):
+    """Fees, gas limit, recipient and calldata of a signed EIP-1559 transaction"""
+    fields = rlp.decode(raw_tx[1:])
+    return {
+        "maxPriorityFeePerGas": int.from_bytes(fields[2], "big"),
+        "maxFeePerGas": int.from_bytes(fields[3], "big"),
+        "gas": int.from_bytes(fields[4], "big"),
+        "to": "0x" + fields[5].hex(),
+        "data": fields[7],
+    }
+
+
+class MockChain:
+    """Minimal account/mempool model: tracks one pending nonce sequence per
+    sender (recovered from the signature) and rejects stale or duplicate
+    transactions like geth does. A pending transaction can be replaced by
+    one with the same nonce and fees at least 10% higher. Nothing is mined
+    until `mine()` is called, or every `block_time` seconds after
+    `start_mining()`.
+
+    For load tests, `nonce_error_rate` rejects that share of raw
+    transactions with a nonce error before looking at them, and
+    `pending_limit` caps the pending pool ("txpool is full")."""
+
+    def __init__(self, latency=0.0, token_balance=10**30, eth_balance=10**20,
+                 nonce_error_rate=0.0, pending_limit=None):
+        self.latency = latency
+        self.nonce_error_rate = nonce_error_rate
+        self.pending_limit = pending_limit
+        self.injected_nonce_errors = 0
+        self.pool_rejections = 0
+        # Standalone requests plus whole batches, i.e. what a node would see
+        self.round_trips = 0
+        self.token_balance = token_balance
+        self.eth_balance = eth_balance
+        self.block_number = 1
+        self.base_fee = 10**9
+        self.nonces = Counter()
+        self.queued = set()
+        self.seen = set()
+        self.transactions = []
+        self.pending = {}  # (sender, nonce) -> (tx_hash, maxFeePerGas, maxPriorityFeePerGas)
+        self.receipts = {}
+        self.replaced = 0
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def handle(self, method, params, delay=True):
+        """Return (result, error_message) for one JSON-RPC call"""
+        self.calls[method] += 1
+        if delay:
+            self.round_trips += 1
+        if self.latency and delay:
+            time.sleep(self.latency)
+        handler = getattr(self, f"rpc_{method}", None)
+        if handler is None:
+            return None, f"method {method} not supported"
+        try:
+            return handler(*params), None
+        except ValueError as e:
+            return None, str(e)
+
+    def rpc_eth_chainId(self):
+        return hex(SEPOLIA_CHAIN_ID)
+
+    def rpc_net_version(self):
+        return str(SEPOLIA_CHAIN_ID)
+
+    def rpc_web3_clientVersion(self):
+        return "MockChain/v0"
+
+    def rpc_eth_blockNumber(self):
+        return hex(self.block_number)
+
+    def rpc_eth_gasPrice(self):
+        return hex(20 * 10**9)
+
+    def rpc_eth_maxPriorityFeePerGas(self):
+        return hex(10**9)
+
+    def rpc_eth_feeHistory(self, block_count, newest_block, percentiles):
+        count = int(block_count, 16) if isinstance(block_count, str) else block_count
+        return {
+            "oldestBlock": hex(max(0, self.block_number - count + 1)),
+            "baseFeePerGas": [hex(self.base_fee)] * (count + 1),
+            "gasUsedRatio": [0.5] * count,
+            "reward": [[hex(10**9)] * len(percentiles)] * count,
+        }
+
+    def rpc_eth_estimateGas(self, tx, *args):
+        return hex(52000)
+
+    def rpc_eth_getBalance(self, address, block="latest"):
+        return hex(self.eth_balance)
+
+    @property
+    def next_nonce(self):
+        """Transactions accepted so far, over every sender"""
+        with self._lock:
+            return sum(self.nonces.values())
+
+    def rpc_eth_getTransactionCount(self, address, block="latest"):
+        with self._lock:
+            return hex(self.nonces[address.lower()])
+
+    def rpc_eth_call(self, tx, block="latest"):
+        # Only balanceOf is ever called on the token contracts
+        return "0x" + self.token_balance.to_bytes(32, "big").hex()
+
+    def rpc_eth_sendRawTransaction(self, raw_hex):
+        raw_tx = bytes.fromhex(raw_hex[2:])
+        tx_hash = keccak(raw_tx)
+        nonce = decode_nonce(raw_tx)
+        sender = Account.recover_transaction(raw_tx).lower()
+        fees = decode_typed_tx(raw_tx) if raw_tx[0] < 0xc0 else {"maxFeePerGas": 0, "maxPriorityFeePerGas": 0}
+        key = (sender, nonce)
+        with self._lock:
+            if self.nonce_error_rate and random.random() < self.nonce_error_rate:
+                self.injected_nonce_errors += 1
+                raise ValueError(random.choice(["nonce too low", "already known"]))
+            if self.pending_limit is not None and key not in self.pending and len(self.pending) >= self.pending_limit:
+                self.pool_rejections += 1
+                raise ValueError("txpool is full")
+            if tx_hash in self.seen:
+                raise ValueError("already known")
+            if key in self.pending:
+                _, max_fee, priority = self.pending[key]
+                if fees["maxFeePerGas"] < max_fee * 1.1 or fees["maxPriorityFeePerGas"] < priority * 1.1:
+                    raise ValueError("replacement transaction underpriced")
+                self.replaced += 1
+            elif nonce < self.nonces[sender]:
+                raise ValueError("nonce too low")
+            else:
+                self.queued.add(key)
+                while (sender, self.nonces[sender]) in self.queued:
+                    self.queued.discard((sender, self.nonces[sender]))
+                    self.nonces[sender] += 1
+            self.seen.add(tx_hash)
+            self.transactions.append(raw_tx)
+            self.pending[key] = (tx_hash, fees["maxFeePerGas"], fees["maxPriorityFeePerGas"])
+        return "0x" + tx_hash.hex()
+
+    def rpc_eth_getTransactionReceipt(self, tx_hash):
+        with self._lock:
+            block = self.receipts.get(bytes.fromhex(tx_hash[2:]))
+        if block is None:
+            return None
+        return {"transactionHash": tx_hash, "blockNumber": hex(block), "status": "0x1"}
+
+    def mine(self):
+        """Include every pending transaction in a new block"""
+        with self._lock:
+            self.block_number += 1
+            for tx_hash, _, _ in self.pending.values():
+                self.receipts[tx_hash] = self.block_number
+            self.pending.clear()
+
+    def start_mining(self, block_time):
+        """Mine a block every `block_time` seconds in the background; returns a stop Event"""
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(block_time):
+                self.mine()
+
+        threading.Thread(target=run, name="mock-miner", daemon=True).start()
+        return stop
+
+
+class MockProvider(JSONBaseProvider):
+    """web3 provider that answers from a MockChain without any network I/O"""
+
+    def __init__(self, chain=None):
+        super().__init__()
+        self.chain = chain or MockChain()
+
+    def make_request(self, method, params, delay=True):
+        result, error = self.chain.handle(method, params or [], delay)
+        if error is not None:
+            return {"jsonrpc": "2.0", "id": 1, "error": {"code": -32000, "message": error}}
+        return {"jsonrpc": "2.0", "id": 1, "result": result}
+
+    def make_batch_request(self, requests):
+        # One round-trip for the whole batch
+        self.chain.calls["batch"] += 1
+        self.chain.round_trips += 1
+        if self.chain.latency:
+            time.sleep(self.chain.latency)
+        return [self.make_request(method, params, delay=False) for method, params in requests]
+
+    def is_connected(self, show_traceback=False):
+        return True
@@ -0,0 +1,66 @@
+"""Stub JSON-RPC HTTP servers backed by a MockChain, with injected latency and errors"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubRPCServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, chain, latency=0.0, jitter=0.0, error_rate=0.0, port=0):
+        super().__init__(("127.0.0.1", port), StubRPCHandler)
+        self.chain = chain
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate  # share of requests answered with HTTP 502
+        self.requests = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class StubRPCHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        server.requests += 1
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        delay = server.latency + random.uniform(0, server.jitter)
+        if delay:
+            time.sleep(delay)
+        if server.error_rate and random.random() < server.error_rate:
+            self.send_response(502)
+            self.end_headers()
+            return
+        request = json.loads(body)
+        if isinstance(request, list):
+            response = [self._dispatch(item) for item in request]
+        else:
+            response = self._dispatch(request)
+        payload = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _dispatch(self, request):
+        result, error = self.server.chain.handle(request["method"], request.get("params") or [])
+        if error is not None:
+            return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": -32000, "message": error}}
+        return {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
@@ -0,0 +1,66 @@
+import logging
+import threading
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+
+class ChainInfo:
+    """Chain metadata resolved once and cached.
+
+    A configured chain ID is used as is and never checked against the node.
+    Without one, the first caller pays for a single eth_chainId lookup and
+    everyone after reads the cached value, so importing the app stays free
+    of RPC traffic. If the lookup fails the error is raised and nothing is
+    cached: the claim fails and can be retried, rather than being signed
+    for a guessed chain.
+    """
+
+    def __init__(self, w3, chain_id=None):
+        self.w3 = w3
+        self._chain_id = chain_id
+        self._lock = threading.Lock()
+
+    def get_chain_id(self):
+        if self._chain_id is not None:
+            return self._chain_id
+        with self._lock:
+            if self._chain_id is None:
+                try:
+                    self._chain_id = self.w3.eth.chain_id
+                except Exception as e:
+                    logger.warning(f"Could not get chain ID, set CHAIN_ID to skip the lookup: {e}")
+                    raise
+                logger.info(f"Chain ID: {self._chain_id}")
+        return self._chain_id
+
+    @property
+    def chain_id(self):
+        return self.get_chain_id()
+
+    def log_status(self, address):
+        """Log connection, chain and faucet balance details.
+
+        Only long-running entry points call this at startup; serverless
+        imports skip it so a cold start makes no RPC calls.
+        """
+        try:
+            logger.info(f"Web3 connected: {self.w3.is_connected()}")
+        except Exception as e:
+            logger.warning(f"Could not check connection status: {e}")
+
+        try:
+            self.get_chain_id()
+        except Exception:
+            pass
+
+        try:
+            logger.info(f"Latest block: {self.w3.eth.block_number}")
+        except Exception as e:
+            logger.warning(f"Could not get latest block (RPC limitation): {e}")
+
+        try:
+            eth_balance = self.w3.eth.get_balance(address) / 10**18
+            logger.info(f"Faucet ETH balance: {eth_balance} ETH")
+        except Exception as e:
+            logger.warning(f"Could not get ETH balance: {e}")
@@ -0,0 +1,475 @@
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from background import BackgroundLoop
+from logs import claim_log
+from rate_limit import USE_REDIS
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+# Set just before a worker signs and broadcasts, so a claim is never paid twice by recovery
+SENDING = "sending"
+SENT = "sent"
+CONFIRMED = "confirmed"
+FAILED = "failed"
+# The worker stopped while sending, or the node never answered the send;
+# the transaction may or may not be on chain
+UNKNOWN = "unknown"
+
+FINAL_STATUSES = {CONFIRMED, FAILED, UNKNOWN}
+
+# How long claim records are kept for status lookups
+CLAIM_TTL = 60 * 60 * 24 * 7  # 7 days
+
+# "group" is set on the first claim of a multi-token job: the space separated ids of every claim it pays
+_FIELDS = ("claim_id", "wallet", "token", "status", "tx_hash", "error", "created_at", "updated_at", "group")
+
+
+def new_claim(wallet, token):
+    now = time.time()
+    return {
+        "claim_id": uuid.uuid4().hex,
+        "wallet": wallet,
+        "token": token,
+        "status": QUEUED,
+        "tx_hash": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def new_group(wallet, tokens):
+    """One claim per token; only the first is queued, carrying the ids of the whole group"""
+    claims = [new_claim(wallet, token) for token in tokens]
+    claims[0]["group"] = " ".join(claim["claim_id"] for claim in claims)
+    return claims
+
+
+def outcome_fields(outcome):
+    """Claim fields for a handler's result: a tx hash, or an exception (unknown if it has `in_doubt`)"""
+    if not isinstance(outcome, Exception):
+        return {"status": SENT, "tx_hash": outcome}
+    return {"status": UNKNOWN if getattr(outcome, "in_doubt", False) else FAILED, "error": str(outcome)}
+
+
+def group_claims(claim_queue, claim):
+    """The claims a queued job pays: the whole group for a multi-token job, otherwise just `claim`"""
+    if not claim.get("group"):
+        return [claim]
+    members = (claim_queue.get(claim_id) for claim_id in claim["group"].split())
+    return [member for member in members if member is not None]
+
+
+class MemoryClaimQueue:
+    """In-process queue and claim store for development and single-process deploys"""
+
+    # Called with the updated claim whenever its status changes
+    on_change = None
+
+    def __init__(self, max_records=10000):
+        self.max_records = max_records
+        self._queue = queue.Queue()
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, wallet, token, enqueue=True):
+        claim = new_claim(wallet, token)
+        with self._lock:
+            self._records[claim["claim_id"]] = claim
+            while len(self._records) > self.max_records:
+                self._records.popitem(last=False)
+        if enqueue:
+            self._queue.put(claim["claim_id"])
+        return dict(claim)
+
+    def submit_group(self, wallet, tokens):
+        """Queue one job paying a claim per token; returns the claims"""
+        claims = new_group(wallet, tokens)
+        with self._lock:
+            for claim in claims:
+                self._records[claim["claim_id"]] = claim
+            while len(self._records) > self.max_records:
+                self._records.popitem(last=False)
+        self._queue.put(claims[0]["claim_id"])
+        return [dict(claim) for claim in claims]
+
+    def get(self, claim_id):
+        with self._lock:
+            claim = self._records.get(claim_id)
+            return dict(claim) if claim else None
+
+    def update(self, claim_id, **fields):
+        with self._lock:
+            claim = self._records.get(claim_id)
+            if claim is None:
+                return None
+            claim.update(fields, updated_at=time.time())
+            claim = dict(claim)
+        if self.on_change is not None and "status" in fields:
+            self.on_change(claim)
+        return claim
+
+    def next(self, timeout=1.0):
+        """Block up to `timeout` seconds for the next queued claim"""
+        try:
+            claim_id = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        return self.get(claim_id)
+
+    def done(self, claim_id):
+        pass
+
+    def depth(self):
+        return self._queue.qsize()
+
+
+class RedisClaimQueue:
+    """Durable queue shared by web and worker processes.
+
+    Claims are hashes under faucet:claim:<id>. Workers move ids from the
+    queue list to a processing list with BLMOVE and note when they took
+    each one, so a worker that dies mid-claim leaves it there for
+    `recover()` to requeue, or to flag if it may already have been sent.
+    """
+
+    # Requeue only if this caller is the one that removed the id from processing
+    _REQUEUE_SCRIPT = """
+    if redis.call('LREM', KEYS[1], 1, ARGV[1]) > 0 then
+        redis.call('LPUSH', KEYS[2], ARGV[1])
+        return 1
+    end
+    return 0
+    """
+
+    # Update only a claim that still exists: HSET on an expired or unknown id
+    # would create a partial hash with no TTL
+    _UPDATE_SCRIPT = """
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return {}
+    end
+    redis.call('HSET', KEYS[1], unpack(ARGV))
+    return redis.call('HGETALL', KEYS[1])
+    """
+
+    # Called with the updated claim whenever its status changes
+    on_change = None
+
+    def __init__(self, client, prefix="faucet:claims"):
+        self.client = client
+        self.queue_key = f"{prefix}:queue"
+        self.processing_key = f"{prefix}:processing"
+        # claim_id -> time a worker took it off the queue
+        self.taken_key = f"{prefix}:taken"
+        self._requeue = client.register_script(self._REQUEUE_SCRIPT)
+        self._update = client.register_script(self._UPDATE_SCRIPT)
+
+    @staticmethod
+    def _key(claim_id):
+        return f"faucet:claim:{claim_id}"
+
+    @staticmethod
+    def _encode(claim):
+        return {field: "" if claim.get(field) is None else str(claim[field]) for field in _FIELDS if field in claim}
+
+    @staticmethod
+    def _decode(raw):
+        claim = {key.decode(): value.decode() or None for key, value in raw.items()}
+        for field in ("created_at", "updated_at"):
+            if claim.get(field):
+                claim[field] = float(claim[field])
+        return claim
+
+    def submit(self, wallet, token, enqueue=True):
+        claim = new_claim(wallet, token)
+        key = self._key(claim["claim_id"])
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping=self._encode(claim))
+        pipe.expire(key, CLAIM_TTL)
+        if enqueue:
+            pipe.lpush(self.queue_key, claim["claim_id"])
+        pipe.execute()
+        return claim
+
+    def submit_group(self, wallet, tokens):
+        """Queue one job paying a claim per token; returns the claims"""
+        claims = new_group(wallet, tokens)
+        pipe = self.client.pipeline()
+        for claim in claims:
+            key = self._key(claim["claim_id"])
+            pipe.hset(key, mapping=self._encode(claim))
+            pipe.expire(key, CLAIM_TTL)
+        pipe.lpush(self.queue_key, claims[0]["claim_id"])
+        pipe.execute()
+        return claims
+
+    def get(self, claim_id):
+        raw = self.client.hgetall(self._key(claim_id))
+        return self._decode(raw) if raw else None
+
+    def update(self, claim_id, **fields):
+        """Set fields on an existing claim and return it, or None if the claim is gone"""
+        fields["updated_at"] = time.time()
+        args = [item for pair in self._encode(fields).items() for item in pair]
+        raw = self._update(keys=[self._key(claim_id)], args=args)
+        if not raw:
+            return None
+        claim = self._decode(dict(zip(raw[::2], raw[1::2])))
+        if self.on_change is not None and "status" in fields:
+            self.on_change(claim)
+        return claim
+
+    def next(self, timeout=1.0):
+        claim_id = self.client.blmove(self.queue_key, self.processing_key, timeout, "RIGHT", "LEFT")
+        if claim_id is None:
+            return None
+        self.client.hset(self.taken_key, claim_id, time.time())
+        claim = self.get(claim_id.decode())
+        if claim is None:
+            self.done(claim_id.decode())
+        return claim
+
+    def done(self, claim_id):
+        pipe = self.client.pipeline()
+        pipe.lrem(self.processing_key, 1, claim_id)
+        pipe.hdel(self.taken_key, claim_id)
+        pipe.execute()
+
+    def depth(self):
+        return self.client.llen(self.queue_key)
+
+    def recover(self, stale_after=300):
+        """Settle claims taken more than `stale_after` seconds ago that were never finished.
+
+        A claim still queued was never handed to the handler and is requeued.
+        One left sending may have been broadcast, so paying it again could pay
+        twice; it is marked unknown and logged for manual reconciliation.
+        """
+        now = time.time()
+        for claim_id in self.client.lrange(self.processing_key, 0, -1):
+            claim = self.get(claim_id.decode())
+            if claim is None:
+                self.done(claim_id)
+                continue
+            # A worker that died between BLMOVE and noting the time leaves no entry
+            taken_at = self.client.hget(self.taken_key, claim_id)
+            taken_at = float(taken_at) if taken_at else claim["updated_at"]
+            if now - taken_at <= stale_after:
+                continue
+            if claim["status"] == QUEUED:
+                if self._requeue(keys=[self.processing_key, self.queue_key], args=[claim_id]):
+                    self.client.hdel(self.taken_key, claim_id)
+                    logger.warning(f"Requeued stale claim {claim['claim_id']}")
+            elif claim["status"] == SENDING:
+                self.update(claim["claim_id"], status=UNKNOWN,
+                            error="The worker stopped while sending; check the chain before paying again")
+                self.done(claim_id)
+                logger.error(f"Claim {claim['claim_id']} to {claim['wallet']} ({claim['token']}) was left sending "
+                             f"{now - taken_at:.0f}s ago and may have been paid; reconcile it by hand")
+
+
+def recovery_loop(claim_queue, interval, stale_after):
+    """Loop that periodically requeues claims stranded by dead workers, None if the queue cannot strand any"""
+    recover = getattr(claim_queue, "recover", None)
+    if recover is None or interval <= 0:
+        return None
+    return BackgroundLoop("claim-recovery", interval, lambda: recover(stale_after=stale_after))
+
+
+def create_claim_queue():
+    """Redis-backed queue when Redis is available, in-process otherwise"""
+    if USE_REDIS:
+        from rate_limit import redis_client
+        return RedisClaimQueue(redis_client)
+    return MemoryClaimQueue()
+
+
+class ClaimWorkers:
+    """Pool of threads that take claims off the queue and disburse them.
+
+    A multi-token job is paid with `multi_handler(claims)`, which returns
+    {claim_id: tx hash or exception}; without one its claims are paid one
+    at a time. Claims are marked sending before the handler runs. Every
+    `recover_interval` seconds, claims another worker took more than
+    `stale_after` seconds ago are put back on the queue if they never reached
+    the handler, and marked unknown if they did.
+    """
+
+    def __init__(self, claim_queue, handler, multi_handler=None, count=2, recover_interval=60, stale_after=300):
+        self.claim_queue = claim_queue
+        self.handler = handler
+        self.multi_handler = multi_handler
+        self.count = count
+        self._loops = [BackgroundLoop(f"claim-worker-{i}", 0, self.process_next, error_interval=1) for i in range(count)]
+        self._recovery = recovery_loop(claim_queue, recover_interval, stale_after)
+
+    def start(self):
+        if self.count <= 0 or self._loops[0].started:
+            return
+        if self._recovery is not None:
+            self._recovery.start()
+        for loop in self._loops:
+            loop.start()
+        logger.info(f"Started {self.count} claim workers")
+
+    def stop(self):
+        for loop in self._loops + [self._recovery]:
+            if loop is not None:
+                loop.stop()
+
+    def process_next(self):
+        claim = self.claim_queue.next(timeout=1.0)
+        if claim is None:
+            return
+        if claim.get("group"):
+            self.process_group(claim)
+        else:
+            self.process(claim)
+
+    def process_group(self, lead):
+        """Pay every claim of a multi-token job, from one hot wallet when a multi handler is set"""
+        claims = group_claims(self.claim_queue, lead)
+        if self.multi_handler is None or len(claims) < 2:
+            for claim in claims:
+                self.process(claim)
+            self.claim_queue.done(lead["claim_id"])
+            return
+        with claim_log("multi_disbursement", wallet=lead["wallet"], tokens=[claim["token"] for claim in claims]) as log:
+            for claim in claims:
+                self.claim_queue.update(claim["claim_id"], status=SENDING)
+            try:
+                outcomes = self.multi_handler(claims)
+            except Exception as e:
+                outcomes = {claim["claim_id"]: e for claim in claims}
+            sent = 0
+            for claim in claims:
+                fields = outcome_fields(outcomes[claim["claim_id"]])
+                self.claim_queue.update(claim["claim_id"], **fields)
+                sent += fields["status"] == SENT
+            log.update(sent=sent)
+            self.claim_queue.done(lead["claim_id"])
+
+    def process(self, claim):
+        """Run the handler for one claim and record the outcome"""
+        claim_id = claim["claim_id"]
+        with claim_log("disbursement", claim_id=claim_id, token=claim["token"], wallet=claim["wallet"]) as log:
+            try:
+                self.claim_queue.update(claim_id, status=SENDING)
+                fields = outcome_fields(self.handler(claim))
+            except Exception as e:
+                fields = outcome_fields(e)
+            try:
+                log.update(claim_status=fields["status"], **{key: value for key, value in fields.items() if key != "status"})
+                return self.claim_queue.update(claim_id, **fields)
+            finally:
+                self.claim_queue.done(claim_id)
+
+
+class BatchWorker:
+    """Single consumer that groups queued claims and pays each token's group in one transaction.
+
+    A batch is sent when `max_size` claims are waiting or `max_wait` seconds
+    after its first claim arrived, whichever comes first. `handler(symbol,
+    claims)` returns one tx hash that is recorded on every claim in the group.
+    Stranded claims are requeued as in `ClaimWorkers`.
+    """
+
+    def __init__(self, claim_queue, handler, max_size=50, max_wait=2.0, enabled=True,
+                 recover_interval=60, stale_after=300):
+        self.claim_queue = claim_queue
+        self.handler = handler
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.enabled = enabled
+        self._loop = BackgroundLoop("claim-batcher", 0, self.process_next, error_interval=1)
+        self._recovery = recovery_loop(claim_queue, recover_interval, stale_after)
+
+    def start(self):
+        if self._loop.started or not self.enabled:
+            return
+        if self._recovery is not None:
+            self._recovery.start()
+        self._loop.start()
+        logger.info(f"Started claim batcher: up to {self.max_size} claims every {self.max_wait}s")
+
+    def stop(self):
+        self._loop.stop()
+        if self._recovery is not None:
+            self._recovery.stop()
+
+    def process_next(self):
+        claims = self.collect()
+        if claims:
+            self.process_batch(claims)
+
+    def collect(self):
+        """Wait for a first claim, then gather more until the batch is full or the window closes"""
+        claims = []
+        deadline = None
+        while len(claims) < self.max_size and not self._loop.stopping:
+            if deadline is None:
+                timeout = 1.0
+            else:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+            # A zero timeout would block forever on BLMOVE
+            claim = self.claim_queue.next(timeout=max(timeout, 0.01))
+            if claim is None:
+                if claims:
+                    break
+                continue
+            if deadline is None:
+                deadline = time.monotonic() + self.max_wait
+            # A multi-token job's claims join their tokens' batches
+            claims.extend(group_claims(self.claim_queue, claim))
+        return claims
+
+    def process_batch(self, claims):
+        """Send one transaction per token and record the outcome on each claim"""
+        groups = {}
+        for claim in claims:
+            groups.setdefault(claim["token"], []).append(claim)
+        results = {}
+        for symbol, group in groups.items():
+            with claim_log("batch_disbursement", token=symbol, claims=len(group)) as log:
+                for claim in group:
+                    self.claim_queue.update(claim["claim_id"], status=SENDING)
+                try:
+                    fields = outcome_fields(self.handler(symbol, group))
+                except Exception as e:
+                    fields = outcome_fields(e)
+                log.update(claim_status=fields["status"], **{key: value for key, value in fields.items() if key != "status"})
+                for claim in group:
+                    results[claim["claim_id"]] = self.claim_queue.update(claim["claim_id"], **fields)
+                    self.claim_queue.done(claim["claim_id"])
+        return [results[claim["claim_id"]] for claim in claims]
+
+    def process(self, claim):
+        """Send a single claim as a batch of one"""
+        return self.process_batch([claim])[0]
+
+
+def create_claim_workers(claim_queue, handler, batch_handler=None, multi_handler=None, count=2):
+    """Batching consumer when a batch handler is configured, a worker pool otherwise"""
+    recovery = {
+        "recover_interval": float(os.getenv("CLAIM_RECOVER_INTERVAL", "60")),
+        "stale_after": float(os.getenv("CLAIM_STALE_AFTER", "300")),
+    }
+    if batch_handler is not None:
+        return BatchWorker(
+            claim_queue, batch_handler,
+            max_size=int(os.getenv("BATCH_MAX_CLAIMS", "50")),
+            max_wait=float(os.getenv("BATCH_WINDOW", "2")),
+            enabled=count > 0,
+            **recovery,
+        )
+    return ClaimWorkers(claim_queue, handler, multi_handler=multi_handler, count=count, **recovery)
@@ -0,0 +1,487 @@
+from web3 import Web3
+from dotenv import load_dotenv
+import os
+import logging
+from eth_account import Account
+from tokens import TokenRegistry
+from nonce import account_lock, is_nonce_error, is_rejection
+from balances import ETH
+from fees import FeeOracle, GWEI
+from rpc_pool import RPCPool, rpc_urls_from_env, supports_batches
+from wallets import HotWallet, Rebalancer, WalletPool
+from tracker import TxTracker
+from ledger import create_ledger
+from chain import ChainInfo
+from txbuilder import format_tx_hash
+from logs import log_fields
+from metrics import (
+    CLAIM_STAGE_SECONDS, CLAIMS_TOTAL, CLAIM_ERRORS_TOTAL,
+    INSUFFICIENT_BALANCE, NONCE_COLLISION, RPC_ERROR,
+)
+
+load_dotenv()
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Reads go to the fastest healthy node in RPC_URLS, raw transactions to all of them
+w3 = Web3(RPCPool(rpc_urls_from_env(os.environ)))
+PRIVATE_KEY = os.getenv("PRIVATE_KEY")
+# PRIVATE_KEYS (comma separated) shards claims over several hot wallets
+PRIVATE_KEYS = [key.strip() for key in os.getenv("PRIVATE_KEYS", PRIVATE_KEY or "").split(",") if key.strip()]
+# The first hot wallet is the one shown as the faucet address
+FAUCET_ADDRESS = Account.from_key(PRIVATE_KEYS[0]).address
+# Set CHAIN_ID to skip the lookup; otherwise it is fetched once on first use
+chain_info = ChainInfo(w3, int(os.environ["CHAIN_ID"]) if os.getenv("CHAIN_ID") else None)
+
+# Fee suggestions are sampled in the background; claims only read the cache
+fee_oracle = FeeOracle(
+    w3,
+    max_fee_cap=int(float(os.getenv("MAX_FEE_GWEI", "100")) * GWEI),
+    max_priority_cap=int(float(os.getenv("MAX_PRIORITY_FEE_GWEI", "5")) * GWEI),
+    refresh_interval=float(os.getenv("FEE_REFRESH_INTERVAL", "12")),
+    ttl=float(os.getenv("FEE_TTL", "120")),
+)
+
+# Optional Disperse-style multi-transfer contract. When set, queued claims are
+# grouped per token and paid out by one disperseToken call per group. The
+# faucet accounts must have approved the contract to spend each token.
+BATCH_CONTRACT = os.getenv("BATCH_CONTRACT")
+if BATCH_CONTRACT:
+    BATCH_CONTRACT = Web3.to_checksum_address(BATCH_CONTRACT)
+BATCH_BASE_GAS = int(os.getenv("BATCH_BASE_GAS", "60000"))
+BATCH_GAS_PER_TRANSFER = int(os.getenv("BATCH_GAS_PER_TRANSFER", "35000"))
+
+# ERC20 ABI (transfer and balanceOf)
+erc20_abi = [{
+    "constant": False,
+    "inputs": [
+        {"name": "_to", "type": "address"},
+        {"name": "_value", "type": "uint256"}
+    ],
+    "name": "transfer",
+    "outputs": [{"name": "", "type": "bool"}],
+    "type": "function"
+}, {
+    "constant": True,
+    "inputs": [
+        {"name": "_owner", "type": "address"}
+    ],
+    "name": "balanceOf",
+    "outputs": [{"name": "balance", "type": "uint256"}],
+    "type": "function"
+}]
+
+# Contracts, checksummed addresses and payout amounts are built once here
+token_registry = TokenRegistry(w3, erc20_abi, FAUCET_ADDRESS)
+
+# Each hot wallet has its own signer, nonce sequence and balance cache, so
+# claims on different wallets never wait for each other
+wallet_pool = WalletPool([
+    HotWallet(
+        w3, key, chain_info.get_chain_id, fee_oracle, token_registry,
+        poll_interval=float(os.getenv("BALANCE_POLL_INTERVAL", "12")),
+        refresh_blocks=int(os.getenv("BALANCE_REFRESH_BLOCKS", "1")),
+    )
+    for key in PRIVATE_KEYS
+])
+logger.info(f"Sending from {len(wallet_pool)} hot wallet(s)")
+
+# Optional treasury that refills hot wallets when they run low
+rebalancer = None
+if os.getenv("TREASURY_PRIVATE_KEY"):
+    rebalancer = Rebalancer(
+        w3, os.getenv("TREASURY_PRIVATE_KEY"), chain_info.get_chain_id, fee_oracle, token_registry, wallet_pool,
+        min_eth=int(float(os.getenv("SHARD_MIN_ETH", "0.05")) * 10**18),
+        target_eth=int(float(os.getenv("SHARD_TARGET_ETH", "0.5")) * 10**18),
+        min_claims=int(os.getenv("SHARD_MIN_CLAIMS", "20")),
+        target_claims=int(os.getenv("SHARD_TARGET_CLAIMS", "200")),
+        interval=float(os.getenv("REBALANCE_INTERVAL", "60")),
+    )
+
+# Follows every sent transaction to its receipt and re-prices stuck ones.
+# The app points on_update at its claim store.
+tx_tracker = TxTracker(
+    w3, fee_oracle,
+    poll_interval=float(os.getenv("TX_POLL_INTERVAL", "4")),
+    stuck_after=float(os.getenv("STUCK_TX_SECONDS", "180")),
+    max_fee=int(float(os.getenv("MAX_REPLACEMENT_FEE_GWEI", "200")) * GWEI),
+)
+
+# Append-only history of what was sent; the app and worker point their claim
+# queue's on_change at ledger.record. LEDGER_PATH= (empty) turns it off. It is
+# off by default on Vercel, whose filesystem is read-only and per instance
+DEFAULT_LEDGER_PATH = "" if os.getenv("VERCEL") else os.path.join(os.path.dirname(os.path.abspath(__file__)), "faucet-ledger.sqlite3")
+ledger = create_ledger(os.getenv("LEDGER_PATH", DEFAULT_LEDGER_PATH), lambda symbol: token_registry[symbol].amount)
+if ledger is not None:
+    tx_tracker.on_track = ledger.track
+
+
+class DisbursementError(Exception):
+    """A claim that cannot be paid out, with a message safe to show the user"""
+
+
+class SendInDoubt(DisbursementError):
+    """The node never answered a send, so the transfer may or may not have been broadcast"""
+
+    # Read by the claim workers, which record the claim as unknown rather than failed
+    in_doubt = True
+
+
+def has_balance_for(symbol):
+    """Cheap pre-check against the cached balances, without reserving anything"""
+    return wallet_pool.has_balance_for(symbol, token_registry[symbol].raw_amount)
+
+
+def broadcast(sender, build_for_nonce, claim_ids=()):
+    """Assign a nonce, sign and send under the account lock; returns the 0x tx hash.
+
+    `build_for_nonce(nonce)` returns the unsigned transaction dict. It is
+    called again with a fresh nonce if the node rejects the first one. Sent
+    transactions are handed to the tracker on behalf of `claim_ids`.
+    """
+    nonce = None
+    # True while send_raw_transaction is in flight, when a failure may still mean the node has it
+    sending = False
+    try:
+        # Critical section per faucet account: nonce assignment, signing and
+        # broadcast stay in nonce order, everything before it runs in parallel
+        with account_lock(sender.address):
+            # Nonces come from the local sequence, not a per-request RPC poll
+            with CLAIM_STAGE_SECONDS.time(stage="nonce"):
+                nonce = sender.nonce_manager.acquire()
+            with CLAIM_STAGE_SECONDS.time(stage="build"):
+                tx = build_for_nonce(nonce)
+            with CLAIM_STAGE_SECONDS.time(stage="sign"):
+                raw_tx = sender.tx_builder.sign(tx)
+            logger.debug("Transaction signed with nonce %s, sending to network...", nonce)
+            if raw_tx is None:
+                raise Exception("Could not get raw transaction data")
+
+            # Send transaction, resyncing the nonce on "already known" style errors
+            max_tx_retries = 3
+            for tx_retry in range(max_tx_retries):
+                try:
+                    sending = True
+                    with CLAIM_STAGE_SECONDS.time(stage="broadcast" if tx_retry == 0 else "retry"):
+                        tx_hash = format_tx_hash(w3.eth.send_raw_transaction(raw_tx))
+                    logger.debug("Transaction sent successfully on attempt %d", tx_retry + 1)
+                    log_fields(nonce=nonce, attempts=tx_retry + 1)
+                    tx_tracker.track(sender, tx, tx_hash, claim_ids)
+                    return tx_hash
+                except Exception as send_error:
+                    CLAIM_ERRORS_TOTAL.inc(error=NONCE_COLLISION if is_nonce_error(send_error) else RPC_ERROR)
+                    if is_nonce_error(send_error) and tx_retry < max_tx_retries - 1:
+                        logger.warning(f"Transaction collision detected (attempt {tx_retry + 1}): {send_error}")
+                        logger.debug("Regenerating transaction with new nonce...")
+
+                        # The node rejected our nonce: resync the sequence and rebuild.
+                        # No sleep needed, the lock already orders our own sends.
+                        sending = False
+                        with CLAIM_STAGE_SECONDS.time(stage="retry"):
+                            sender.nonce_manager.resync()
+                            nonce = sender.nonce_manager.acquire()
+                            logger.debug("Rebuilding with fresh nonce: %s", nonce)
+
+                            tx = build_for_nonce(nonce)
+                            raw_tx = sender.tx_builder.sign(tx)
+                        continue
+                    else:
+                        logger.error(f"Transaction send failed after {tx_retry + 1} attempts: {send_error}")
+                        raise send_error
+    except Exception as e:
+        if nonce is not None and not is_nonce_error(e):
+            if sending and not is_rejection(e):
+                # Timed out or lost the connection: the node may have the transaction
+                resync_after_unknown_send(sender, nonce, e)
+                raise SendInDoubt(f"No answer from the node, the transfer may have been sent: {e}") from e
+            # Never reached the mempool, let the next claim reuse the nonce
+            sender.nonce_manager.release(nonce)
+        raise
+
+
+def resync_after_unknown_send(sender, nonce, error):
+    """Let the node's pending count decide whether an unanswered send took the nonce"""
+    logger.warning(f"Send with nonce {nonce} from {sender.address} may have reached the node ({error}), resyncing")
+    try:
+        sender.nonce_manager.resync()
+    except Exception as sync_error:
+        logger.error(f"Nonce resync for {sender.address} failed, keeping nonce {nonce} used: {sync_error}")
+
+
+def broadcast_many(sender, builds):
+    """Send several transactions from one account with consecutive nonces in one JSON-RPC batch.
+
+    `builds` is a list of (build_for_nonce, claim_ids). Returns a 0x tx hash
+    or the exception for each entry, in order. Entries the node rejected
+    for their nonce are sent again one by one through broadcast(). Entries
+    the node gave no answer for get a SendInDoubt and the nonce is resynced.
+    """
+    results = [None] * len(builds)
+    nonce_rejected = []
+    in_doubt = False
+    with account_lock(sender.address):
+        with CLAIM_STAGE_SECONDS.time(stage="nonce"):
+            nonces = sender.nonce_manager.acquire_many(len(builds))
+        try:
+            with CLAIM_STAGE_SECONDS.time(stage="build"):
+                txs = [build(nonce) for (build, _), nonce in zip(builds, nonces)]
+            with CLAIM_STAGE_SECONDS.time(stage="sign"):
+                raw_txs = [sender.tx_builder.sign(tx) for tx in txs]
+        except Exception:
+            for nonce in reversed(nonces):
+                sender.nonce_manager.release(nonce)
+            raise
+        logger.debug("Signed %d transactions with nonces %s..%s, sending in one batch...", len(txs), nonces[0], nonces[-1])
+
+        responses = None
+        if supports_batches(w3.provider):
+            try:
+                with CLAIM_STAGE_SECONDS.time(stage="broadcast"):
+                    responses = w3.provider.make_batch_request(
+                        [("eth_sendRawTransaction", ["0x" + bytes(raw_tx).hex()]) for raw_tx in raw_txs]
+                    )
+            except Exception as e:
+                # The node never answered, so any of the batch may have reached it
+                CLAIM_ERRORS_TOTAL.inc(error=RPC_ERROR)
+                resync_after_unknown_send(sender, nonces[0], e)
+                return [SendInDoubt(f"No answer from the node, the transfer may have been sent: {e}")] * len(builds)
+            if isinstance(responses, list) and len(responses) != len(raw_txs):
+                # Without one response per request, none can be tied to its transaction
+                logger.error(f"Batch of {len(raw_txs)} sends got {len(responses)} responses")
+                responses = [None] * len(raw_txs)
+        if not isinstance(responses, list):
+            # The provider does not take batches, or the node refused the whole batch: nothing was sent yet
+            reason = "not supported by the provider" if responses is None else responses.get("error")
+            logger.info(f"Batched broadcast unavailable ({reason}), sending one by one")
+            responses = []
+            for raw_tx in raw_txs:
+                try:
+                    responses.append({"result": w3.eth.send_raw_transaction(raw_tx)})
+                except Exception as send_error:
+                    responses.append({"error": {"message": str(send_error)}, "in_doubt": not is_rejection(send_error)})
+
+        for index, (tx, nonce, response) in enumerate(zip(txs, nonces, responses)):
+            if response is None:
+                CLAIM_ERRORS_TOTAL.inc(error=RPC_ERROR)
+                logger.error(f"No response for the transaction with nonce {nonce}")
+                in_doubt = True
+                results[index] = SendInDoubt("No answer from the node, the transfer may have been sent")
+                continue
+            if "error" not in response:
+                results[index] = format_tx_hash(response["result"])
+                tx_tracker.track(sender, tx, results[index], builds[index][1])
+                continue
+            error = Exception(response["error"].get("message", response["error"]))
+            if is_nonce_error(error):
+                CLAIM_ERRORS_TOTAL.inc(error=NONCE_COLLISION)
+                logger.warning(f"Transaction collision detected for nonce {nonce}: {error}")
+                nonce_rejected.append(index)
+            else:
+                CLAIM_ERRORS_TOTAL.inc(error=RPC_ERROR)
+                logger.error(f"Transaction with nonce {nonce} failed: {error}")
+                if response.get("in_doubt"):
+                    in_doubt = True
+                    error = SendInDoubt(f"No answer from the node, the transfer may have been sent: {error}")
+                else:
+                    sender.nonce_manager.release(nonce)
+                results[index] = error
+        if in_doubt:
+            resync_after_unknown_send(sender, nonces[0], "a send went unanswered")
+        elif nonce_rejected:
+            sender.nonce_manager.resync()
+
+    for index in nonce_rejected:
+        build, claim_ids = builds[index]
+        try:
+            results[index] = broadcast(sender, build, claim_ids)
+        except Exception as e:
+            results[index] = e
+    return results
+
+
+def unfunded_error(symbol, amount, gas_cost):
+    """DisbursementError saying whether tokens or gas ran out on every hot wallet"""
+    CLAIM_ERRORS_TOTAL.inc(error=INSUFFICIENT_BALANCE)
+    if not wallet_pool.has_balance_for(symbol, amount):
+        logger.error(f"Insufficient token balance on every hot wallet: need {token_registry[symbol].to_units(amount)} {symbol}")
+        return DisbursementError(f"Faucet doesn't have enough {symbol} tokens")
+    logger.error(f"Insufficient ETH for gas on every hot wallet: need {gas_cost / 10**18}")
+    return DisbursementError("Faucet doesn't have enough ETH for gas")
+
+
+def acquire_wallet(symbol, amount, gas_cost):
+    """Reserve token and gas funds on the least loaded hot wallet, or raise DisbursementError"""
+    if rebalancer is not None:
+        rebalancer.start()
+    wallet = wallet_pool.acquire(symbol, amount, gas_cost)
+    if wallet is not None:
+        return wallet
+    raise unfunded_error(symbol, amount, gas_cost)
+
+
+def release_wallet(sender, symbol, amount, gas_cost, sent):
+    """Hand the wallet back, returning the reservation if nothing was sent"""
+    if not sent:
+        sender.balance_cache.release(symbol, amount)
+        sender.balance_cache.release(ETH, gas_cost)
+    wallet_pool.finish(sender, sent)
+
+
+def send_tokens(wallet, symbol, claim_ids=()):
+    """Sign and broadcast one transfer; returns the 0x tx hash"""
+    token = token_registry[symbol]
+    amount = token.raw_amount
+    sender = None
+    sent = False
+    try:
+        # Estimated once per token; resolve it before taking the lock
+        gas = token.gas
+        fees = fee_oracle.current()
+        gas_cost = gas * fees["maxFeePerGas"]
+
+        # Pick a hot wallet with enough tokens and gas in its cached balances
+        sender = acquire_wallet(symbol, amount, gas_cost)
+
+        # Calldata is encoded locally and signed with the cached account, no RPC
+        tx_builder = sender.tx_builder
+        tx_hash = broadcast(sender, lambda nonce: tx_builder.build(token.address, wallet, amount, nonce, gas=gas, fees=fees), claim_ids)
+        sent = True
+
+        logger.debug("Sent %s %s to %s from %s, tx_hash: %s", amount, symbol, wallet, sender.address, tx_hash)
+        log_fields(sender=sender.address, tx_hash=tx_hash)
+        return tx_hash
+
+    except Exception as e:
+        logger.error(f"Transaction failed for {wallet} requesting {symbol}: {type(e).__name__}: {str(e)}")
+        if hasattr(e, 'response'):
+            logger.error(f"Error response: {e.response}")
+        raise
+    finally:
+        if sender is not None:
+            release_wallet(sender, symbol, amount, gas_cost, sent)
+
+
+def send_multi(wallet, symbols, claim_ids=None):
+    """Send several tokens to one wallet from one hot wallet, with consecutive nonces.
+
+    Returns {symbol: 0x tx hash or DisbursementError}. A token that fails
+    (no funds, rejected by the node) does not stop the others.
+    `claim_ids` maps each symbol to the claims its transfer pays.
+    """
+    claim_ids = claim_ids or {}
+    tokens = {symbol: token_registry[symbol] for symbol in symbols}
+    fees = fee_oracle.current()
+    amounts = {symbol: token.raw_amount for symbol, token in tokens.items()}
+    gas_costs = {symbol: token.gas * fees["maxFeePerGas"] for symbol, token in tokens.items()}
+
+    if rebalancer is not None:
+        rebalancer.start()
+    sender, reserved = wallet_pool.acquire_many(amounts, gas_costs)
+    results = {symbol: unfunded_error(symbol, amounts[symbol], gas_costs[symbol])
+               for symbol in symbols if symbol not in reserved}
+    if sender is None:
+        return results
+
+    def builder(token):
+        return lambda nonce: sender.tx_builder.build(token.address, wallet, token.raw_amount, nonce, gas=token.gas, fees=fees)
+
+    sent = 0
+    try:
+        outcomes = broadcast_many(sender, [(builder(tokens[symbol]), claim_ids.get(symbol, ())) for symbol in reserved])
+    except Exception as e:
+        logger.error(f"Multi-token transfer to {wallet} failed: {str(e)}")
+        outcomes = [e] * len(reserved)
+    for symbol, outcome in zip(reserved, outcomes):
+        if not isinstance(outcome, str):
+            # Anything but a tx hash is a failure; only an explicit hash counts as sent
+            sender.balance_cache.release(symbol, amounts[symbol])
+            sender.balance_cache.release(ETH, gas_costs[symbol])
+            if isinstance(outcome, SendInDoubt):
+                results[symbol] = outcome
+            else:
+                results[symbol] = DisbursementError(f"Transaction failed: {str(outcome)}")
+        else:
+            results[symbol] = outcome
+            sent += 1
+    wallet_pool.finish(sender, sent)
+    logger.debug("Sent %d/%d tokens to %s from %s", sent, len(symbols), wallet, sender.address)
+    log_fields(sender=sender.address, sent=sent)
+    return results
+
+
+def batch_gas(count):
+    """Gas limit for a disperseToken call paying `count` recipients"""
+    return BATCH_BASE_GAS + count * BATCH_GAS_PER_TRANSFER
+
+
+def send_batch(symbol, wallets, claim_ids=()):
+    """Pay every wallet the token's amount in one disperseToken call; returns the 0x tx hash"""
+    token = token_registry[symbol]
+    amounts = [token.raw_amount] * len(wallets)
+    total = sum(amounts)
+    sender = None
+    sent = False
+    try:
+        gas = batch_gas(len(wallets))
+        fees = fee_oracle.current()
+        gas_cost = gas * fees["maxFeePerGas"]
+
+        sender = acquire_wallet(symbol, total, gas_cost)
+
+        tx_builder = sender.tx_builder
+        tx_hash = broadcast(sender, lambda nonce: tx_builder.build_batch(
+            BATCH_CONTRACT, token.address, wallets, amounts, nonce, gas, fees=fees
+        ), claim_ids)
+        sent = True
+
+        logger.debug("Sent %s %s to %d wallets in one batch, tx_hash: %s", token.amount, symbol, len(wallets), tx_hash)
+        log_fields(sender=sender.address, tx_hash=tx_hash)
+        return tx_hash
+
+    except Exception as e:
+        logger.error(f"Batch of {len(wallets)} {symbol} transfers failed: {str(e)}")
+        raise
+    finally:
+        if sender is not None:
+            release_wallet(sender, symbol, total, gas_cost, sent)
+
+
+def disburse_claim(claim):
+    """Claim worker handler: send the tokens, or fail with a user-facing message"""
+    try:
+        tx_hash = send_tokens(claim["wallet"], claim["token"], claim_ids=[claim["claim_id"]])
+    except DisbursementError:
+        CLAIMS_TOTAL.inc(token=claim["token"], outcome="failed")
+        raise
+    except Exception as e:
+        CLAIMS_TOTAL.inc(token=claim["token"], outcome="failed")
+        raise DisbursementError(f"Transaction failed: {str(e)}") from e
+    CLAIMS_TOTAL.inc(token=claim["token"], outcome="sent")
+    return tx_hash
+
+
+def disburse_batch(symbol, claims):
+    """Batch worker handler: one transaction for a group of same-token claims"""
+    try:
+        tx_hash = send_batch(symbol, [claim["wallet"] for claim in claims], claim_ids=[claim["claim_id"] for claim in claims])
+    except DisbursementError:
+        CLAIMS_TOTAL.inc(len(claims), token=symbol, outcome="failed")
+        raise
+    except Exception as e:
+        CLAIMS_TOTAL.inc(len(claims), token=symbol, outcome="failed")
+        raise DisbursementError(f"Transaction failed: {str(e)}") from e
+    CLAIMS_TOTAL.inc(len(claims), token=symbol, outcome="sent")
+    return tx_hash
+
+
+def disburse_multi(claims):
+    """Pay several claims for one wallet in one request; returns {claim_id: tx hash or DisbursementError}"""
+    by_symbol = {claim["token"]: claim for claim in claims}
+    results = send_multi(
+        claims[0]["wallet"], list(by_symbol),
+        claim_ids={symbol: [claim["claim_id"]] for symbol, claim in by_symbol.items()},
+    )
+    for symbol, outcome in results.items():
+        CLAIMS_TOTAL.inc(token=symbol, outcome="failed" if isinstance(outcome, Exception) else "sent")
+    return {by_symbol[symbol]["claim_id"]: outcome for symbol, outcome in results.items()}
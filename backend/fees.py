@@ -0,0 +1,83 @@
+import logging
+import threading
+import time
+
+from background import BackgroundLoop
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+GWEI = 10**9
+
+
+class FeeOracle:
+    """EIP-1559 fee suggestions sampled from eth_feeHistory in the background.
+
+    `current()` only reads the cache, so requests never wait on a fee
+    lookup. Suggestions older than `ttl` seconds are replaced by the
+    configured ceilings until the next successful sample.
+    """
+
+    def __init__(self, w3, max_fee_cap=100 * GWEI, max_priority_cap=5 * GWEI,
+                 default_priority=int(1.5 * GWEI), refresh_interval=12, ttl=120,
+                 history_blocks=10, reward_percentile=50):
+        self.w3 = w3
+        self.max_fee_cap = max_fee_cap
+        self.max_priority_cap = max_priority_cap
+        self.default_priority = default_priority
+        self.refresh_interval = refresh_interval
+        self.ttl = ttl
+        self.history_blocks = history_blocks
+        self.reward_percentile = reward_percentile
+        self._lock = threading.Lock()
+        self._fees = None
+        self._base_fee = None
+        self._updated_at = None
+        self._loop = BackgroundLoop("fee-oracle", refresh_interval, self.refresh)
+
+    def start(self):
+        self._loop.start()
+
+    def refresh(self):
+        """Sample recent blocks and cache a capped maxFee/priority suggestion"""
+        history = self.w3.eth.fee_history(self.history_blocks, 'latest', [self.reward_percentile])
+        # The last entry is the base fee of the next block
+        base_fee = history["baseFeePerGas"][-1]
+        rewards = sorted(block[0] for block in history.get("reward") or [] if block and block[0] > 0)
+        priority = rewards[len(rewards) // 2] if rewards else self.default_priority
+        priority = min(priority, self.max_priority_cap)
+        # Twice the base fee survives six consecutive full blocks
+        max_fee = min(2 * base_fee + priority, self.max_fee_cap)
+        max_fee = max(max_fee, priority)
+        with self._lock:
+            self._fees = {"maxFeePerGas": max_fee, "maxPriorityFeePerGas": priority}
+            self._base_fee = base_fee
+            self._updated_at = time.monotonic()
+        logger.info(f"Fee estimate: base {base_fee / GWEI:.2f} gwei, max {max_fee / GWEI:.2f} gwei, priority {priority / GWEI:.2f} gwei")
+
+    def _fallback(self):
+        return {"maxFeePerGas": self.max_fee_cap, "maxPriorityFeePerGas": min(self.default_priority, self.max_priority_cap)}
+
+    def current(self):
+        """Cached fee fields for a type-2 transaction, never blocks on the node"""
+        self.start()
+        with self._lock:
+            if self._fees is not None and time.monotonic() - self._updated_at <= self.ttl:
+                return self._fees
+        return self._fallback()
+
+    def status(self):
+        """Current estimate, its age and the configured ceilings, in gwei"""
+        fees = self.current()
+        with self._lock:
+            age = None if self._updated_at is None else round(time.monotonic() - self._updated_at, 1)
+            base_fee = self._base_fee
+        return {
+            "max_fee_gwei": fees["maxFeePerGas"] / GWEI,
+            "max_priority_fee_gwei": fees["maxPriorityFeePerGas"] / GWEI,
+            "base_fee_gwei": None if base_fee is None else base_fee / GWEI,
+            "age_seconds": age,
+            "stale": age is None or age > self.ttl,
+            "max_fee_cap_gwei": self.max_fee_cap / GWEI,
+            "max_priority_cap_gwei": self.max_priority_cap / GWEI,
+        }
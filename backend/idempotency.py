@@ -0,0 +1,146 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from rate_limit import USE_REDIS
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Returned to a duplicate that gave up waiting for the original request
+IN_PROGRESS = (
+    {"error": "A request with this idempotency key is still in progress"},
+    409,
+    {"Retry-After": "1"},
+)
+
+
+def idempotency_key(header, wallet, token):
+    """Client key scoped to wallet+token, or wallet+token alone when the client sent none"""
+    scope = f"{wallet.lower()}:{token}"
+    return f"{header}:{scope}" if header else scope
+
+
+def cacheable(response):
+    # Only accepted claims are replayed; refusals and errors are re-checked on retry
+    return 200 <= response[1] < 300
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class MemoryIdempotencyStore:
+    """Single-flight plus a TTL response cache, per process.
+
+    The first request for a key runs; concurrent duplicates wait for it and
+    get the same response. Completed responses are replayed for `ttl`
+    seconds without running the handler again.
+    """
+
+    def __init__(self, ttl=600, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._done = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, key, now):
+        entry = self._done.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at <= now:
+            del self._done[key]
+            return None
+        return response
+
+    def run(self, key, handler, wait_timeout=30):
+        """(response, replayed) for `key`, running `handler()` at most once at a time"""
+        now = time.monotonic()
+        with self._lock:
+            response = self._cached(key, now)
+            if response is not None:
+                return response, True
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            if not flight.event.wait(wait_timeout):
+                return IN_PROGRESS, True
+            if flight.error is not None:
+                raise flight.error
+            return flight.response, True
+
+        try:
+            flight.response = handler()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if flight.error is None and cacheable(flight.response):
+                    self._done[key] = (time.monotonic() + self.ttl, flight.response)
+                    self._done.move_to_end(key)
+                    while len(self._done) > self.max_entries:
+                        self._done.popitem(last=False)
+            flight.event.set()
+        return flight.response, False
+
+
+class RedisIdempotencyStore:
+    """Single-flight and response cache shared by every web process.
+
+    The first request claims the key with SET NX as a pending marker; the
+    others poll until the response replaces it. A crashed leader's marker
+    expires after `wait_timeout`, and the next duplicate takes over.
+    """
+
+    PENDING = b"__pending__"
+
+    def __init__(self, client, ttl=600, poll_interval=0.05):
+        self.client = client
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+
+    def run(self, key, handler, wait_timeout=30):
+        redis_key = f"faucet:idem:{key}"
+        deadline = time.monotonic() + wait_timeout
+        while True:
+            if self.client.set(redis_key, self.PENDING, nx=True, px=int(wait_timeout * 1000)):
+                return self._lead(redis_key, handler), False
+            value = self.client.get(redis_key)
+            if value is not None and value != self.PENDING:
+                body, status, headers = json.loads(value)
+                return (body, status, headers), True
+            if time.monotonic() >= deadline:
+                return IN_PROGRESS, True
+            time.sleep(self.poll_interval)
+
+    def _lead(self, redis_key, handler):
+        try:
+            response = handler()
+        except Exception:
+            self.client.delete(redis_key)
+            raise
+        if cacheable(response):
+            self.client.set(redis_key, json.dumps(response), px=int(self.ttl * 1000))
+        else:
+            self.client.delete(redis_key)
+        return response
+
+
+def create_idempotency_store(ttl):
+    """Redis-backed store when Redis is available, in-process otherwise"""
+    if USE_REDIS:
+        from rate_limit import redis_client
+        return RedisIdempotencyStore(redis_client, ttl=ttl)
+    return MemoryIdempotencyStore(ttl=ttl)
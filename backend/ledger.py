@@ -0,0 +1,245 @@
+"""Append-only ledger of disbursements in SQLite.
+
+Every status change of a claim (sent, failed, confirmed) becomes one row
+with the wallet, token, amount, nonce, sending wallet, tx hash and time
+since the claim was made. Request and worker threads only put rows on a
+bounded queue; one writer thread inserts whatever has accumulated in a
+single transaction. The database runs in WAL mode, so the admin queries
+read while the writer appends, and web and worker processes can share
+one file.
+
+History is paged by row id (keyset, not OFFSET) and the aggregates are
+answered from a covering index, so both stay fast at tens of millions of
+rows.
+"""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from background import BackgroundLoop
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    claim_id TEXT NOT NULL,
+    wallet TEXT NOT NULL,
+    token TEXT NOT NULL,
+    amount REAL NOT NULL,
+    status TEXT NOT NULL,
+    nonce INTEGER,
+    sender TEXT,
+    tx_hash TEXT,
+    error TEXT,
+    elapsed_ms REAL
+);
+-- Every index ends in the rowid, so these also page a wallet's or token's rows by id
+CREATE INDEX IF NOT EXISTS ledger_wallet ON ledger (wallet);
+CREATE INDEX IF NOT EXISTS ledger_token ON ledger (token);
+CREATE INDEX IF NOT EXISTS ledger_ts ON ledger (ts);
+CREATE INDEX IF NOT EXISTS ledger_claim ON ledger (claim_id);
+-- Covering index for totals() and top_wallets(): a time range of one status, read without the table
+CREATE INDEX IF NOT EXISTS ledger_activity ON ledger (status, ts, token, wallet, amount);
+"""
+
+COLUMNS = ("id", "ts", "claim_id", "wallet", "token", "amount", "status", "nonce", "sender", "tx_hash", "error", "elapsed_ms")
+# Claim fields every row needs; an update to an expired claim can leave a record without them
+REQUIRED_FIELDS = ("claim_id", "wallet", "token", "status", "created_at", "updated_at")
+_INSERT = f"INSERT INTO ledger ({', '.join(COLUMNS[1:])}) VALUES ({', '.join('?' * (len(COLUMNS) - 1))})"
+
+
+def connect(path, timeout=5.0):
+    conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    # WAL with synchronous=NORMAL only risks the last commits on power loss, never corruption
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class ClaimLedger:
+    """Batched, off-thread writer and indexed reader for the ledger table.
+
+    `record(claim)` is meant for the claim queue's `on_change` hook and
+    `track(...)` for the transaction tracker's `on_track`, which supplies the
+    nonce and sending wallet of each claim's transaction. `amount_of(token)`
+    gives the whole-token amount paid per claim.
+    """
+
+    def __init__(self, path, amount_of, batch_size=1000, max_pending=100000, max_tracked=100000):
+        self.path = path
+        self.amount_of = amount_of
+        self.batch_size = batch_size
+        self.max_tracked = max_tracked
+        self.dropped = 0
+        self.written = 0
+        # Set when the database cannot be opened; rows are then dropped instead of queued
+        self.error = None
+        self._rows = queue.Queue(maxsize=max_pending)
+        # claim_id -> (sender, nonce) until the claim reaches a final status
+        self._sent = OrderedDict()
+        self._sent_lock = threading.Lock()
+        self._writer = BackgroundLoop("ledger-writer", 0, self._write_batch)
+        self._conn = None
+        self._readers = threading.local()
+
+    def start(self):
+        """Start the writer on the first recorded row"""
+        self._writer.start()
+
+    def track(self, sender, nonce, tx_hash, claim_ids):
+        """Remember which wallet and nonce paid each claim, for its ledger rows"""
+        with self._sent_lock:
+            for claim_id in claim_ids:
+                self._sent[claim_id] = (sender, nonce)
+            while len(self._sent) > self.max_tracked:
+                self._sent.popitem(last=False)
+
+    def record(self, claim):
+        """Queue a row for the claim's current status; never blocks the caller"""
+        if claim["status"] == "sending":
+            # Only outcomes are ledgered; sending is followed by sent, failed or unknown
+            return
+        missing = [field for field in REQUIRED_FIELDS if not claim.get(field)]
+        if missing:
+            logger.warning(f"Not recording claim {claim.get('claim_id')}: missing {', '.join(missing)}")
+            return
+        if self.error is not None:
+            self.dropped += 1
+            return
+        with self._sent_lock:
+            if claim["status"] in ("confirmed", "failed"):
+                sender, nonce = self._sent.pop(claim["claim_id"], (None, None))
+            else:
+                sender, nonce = self._sent.get(claim["claim_id"], (None, None))
+        row = (
+            claim["updated_at"], claim["claim_id"], claim["wallet"].lower(), claim["token"],
+            float(self.amount_of(claim["token"])), claim["status"], nonce, sender,
+            claim.get("tx_hash"), claim.get("error"), round((claim["updated_at"] - claim["created_at"]) * 1000, 3),
+        )
+        try:
+            self._rows.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Ledger queue full, dropped {claim['status']} row for claim {claim['claim_id']}")
+            return
+        self.start()
+
+    def flush(self, timeout=10):
+        """Wait until every row queued so far is committed"""
+        if not self._writer.started:
+            return True
+        if self.error is not None:
+            return False
+        done = threading.Event()
+        self._rows.put(done)
+        return done.wait(timeout)
+
+    def _write_batch(self):
+        if self._conn is None:
+            try:
+                self._conn = connect(self.path)
+                self._conn.executescript(SCHEMA)
+            except sqlite3.Error as e:
+                self._disable(e)
+                return
+        # Whatever piled up during the last commit goes into the next one
+        items = [self._rows.get()]
+        while len(items) < self.batch_size:
+            try:
+                items.append(self._rows.get_nowait())
+            except queue.Empty:
+                break
+        rows = [item for item in items if not isinstance(item, threading.Event)]
+        if rows:
+            try:
+                with self._conn:
+                    self._conn.executemany(_INSERT, rows)
+                self.written += len(rows)
+            except sqlite3.Error as e:
+                self.dropped += len(rows)
+                logger.error(f"Could not write {len(rows)} ledger rows: {e}")
+        for item in items:
+            if isinstance(item, threading.Event):
+                item.set()
+
+    def _disable(self, error):
+        self.error = str(error)
+        logger.error(f"Ledger disabled, could not open {self.path}: {error}")
+        self._writer.stop()
+        # Nothing queued will be written now
+        while True:
+            try:
+                item = self._rows.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+            else:
+                self.dropped += 1
+
+    def _reader(self):
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = self._readers.conn = connect(self.path)
+            conn.executescript(SCHEMA)
+        return conn
+
+    def history(self, wallet=None, token=None, status=None, since=None, until=None, before=None, limit=100):
+        """Newest rows first, `limit` at a time; pass the last row's id as `before` for the next page"""
+        clauses, params = [], []
+        for column, value in (("wallet", wallet.lower() if wallet else None), ("token", token), ("status", status)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        if before is not None:
+            clauses.append("id < ?")
+            params.append(before)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._reader().execute(
+            f"SELECT {', '.join(COLUMNS)} FROM ledger {where} ORDER BY id DESC LIMIT ?", params + [limit],
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def totals(self, status="sent", token=None, since=0, until=float("inf")):
+        """Claims and amount per token with `status` in [since, until)"""
+        sql = "SELECT token, COUNT(*) AS claims, SUM(amount) AS amount FROM ledger WHERE status = ?"
+        params = [status]
+        if token is not None:
+            sql += " AND token = ?"
+            params.append(token)
+        sql += " AND ts >= ? AND ts < ? GROUP BY token ORDER BY token"
+        return [dict(row) for row in self._reader().execute(sql, params + [since, until])]
+
+    def top_wallets(self, status="sent", token=None, since=0, until=float("inf"), limit=20):
+        """Wallets with the most claims with `status` in [since, until)"""
+        sql = "SELECT wallet, COUNT(*) AS claims FROM ledger WHERE status = ? AND ts >= ? AND ts < ?"
+        params = [status, since, until]
+        if token is not None:
+            sql += " AND token = ?"
+            params.append(token)
+        sql += " GROUP BY wallet ORDER BY claims DESC, wallet LIMIT ?"
+        return [dict(row) for row in self._reader().execute(sql, params + [limit])]
+
+    def status(self):
+        return {"path": self.path, "pending": self._rows.qsize(), "written": self.written, "dropped": self.dropped,
+                "error": self.error}
+
+
+def create_ledger(path, amount_of):
+    """Ledger at `path`, or None when LEDGER_PATH is set empty"""
+    if not path:
+        return None
+    return ClaimLedger(os.path.abspath(path), amount_of)
@@ -0,0 +1,250 @@
+"""Structured, non-blocking logging.
+
+`configure_logging()` puts a queue in front of the real handler: request
+threads only enqueue the LogRecord, and a background listener formats and
+writes it. Each claim produces one JSON event with its stage timings
+instead of a line per step; per-step detail is logged at DEBUG with lazy
+%-style arguments and can be sampled. Signed transactions and keys are
+redacted from every record, whatever the format: importing this module
+wraps the LogRecord factory, so records are cleaned where they are created
+even when `configure_logging()` never runs (as on Vercel).
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from metrics import CLAIM_STAGE_SECONDS
+
+# Set up logger; per-claim events get their own name so they can be routed or filtered separately
+logger = logging.getLogger("faucet.events")
+
+# Hex longer than any hash, address or transfer calldata: a signed transaction or a key dump
+_LONG_HEX = re.compile(r"(0x)?[0-9a-fA-F]{160,}")
+# The same as a bytes repr, as an f-string prints raw bytes; a 32-byte hash repr has at most 96 characters or escapes
+_BYTES_REPR = re.compile(r"b'(?:[^'\\]|\\.){120,}'" + r'|b"(?:[^"\\]|\\.){120,}"')
+# Bytes values (including HexBytes) this long are signed payloads, whatever they are called
+_LONG_BYTES = 80
+# Private keys are exactly 32 bytes
+_PRIVATE_KEY = re.compile(r"(?i)(private[_ ]?key['\"]?\s*[:=]\s*['\"]?)(0x)?[0-9a-f]{64}")
+# Fields never written out, whatever they hold
+REDACTED_FIELDS = {"raw_tx", "raw_transaction", "rawTransaction", "signed_tx", "signed_transaction", "private_key"}
+REDACTED = "[redacted]"
+
+_current = threading.local()
+
+
+def redact(text):
+    """Strip signed payloads and private keys from a formatted log line"""
+    text = _LONG_HEX.sub(lambda m: f"{REDACTED} ({len(m.group(0).removeprefix('0x')) // 2} bytes)", text)
+    text = _BYTES_REPR.sub(REDACTED, text)
+    return _PRIVATE_KEY.sub(lambda m: m.group(1) + REDACTED, text)
+
+
+def _redact_value(value):
+    """`value` with signed payloads removed, judged by type and field name before it is formatted"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"{REDACTED} ({len(value)} bytes)" if len(value) >= _LONG_BYTES else value
+    if isinstance(value, str):
+        return redact(value)
+    if isinstance(value, dict):
+        return _redact_fields(value)
+    return value
+
+
+def _redact_fields(fields):
+    return {key: REDACTED if key in REDACTED_FIELDS else _redact_value(value) for key, value in fields.items()}
+
+
+_record_factory = logging.getLogRecordFactory()
+
+
+def _redacting_record_factory(*args, **kwargs):
+    """LogRecord with its message and arguments redacted; formatting itself stays lazy"""
+    record = _record_factory(*args, **kwargs)
+    if isinstance(record.args, dict):
+        record.args = _redact_fields(record.args)
+    elif record.args:
+        record.args = tuple(_redact_value(arg) for arg in record.args)
+    record.msg = _redact_value(record.msg)
+    return record
+
+
+def install_redaction():
+    """Redact every LogRecord as it is created, whichever handlers end up writing it"""
+    if logging.getLogRecordFactory() is not _redacting_record_factory:
+        logging.setLogRecordFactory(_redacting_record_factory)
+
+
+class RedactingFormatter(logging.Formatter):
+    """Plain text formatter that redacts the finished line"""
+
+    def format(self, record):
+        return redact(super().format(record))
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record; fields passed as extra={"fields": {...}} become top-level keys"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(_redact_fields(fields))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return redact(json.dumps(entry, default=str, separators=(",", ":")))
+
+
+class DebugSampler(logging.Filter):
+    """Keeps every record at INFO and above, and `rate` of DEBUG records"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats the message on the calling thread; records
+    here are only used in-process, so they are enqueued as they are.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def configure_logging(level=None, fmt=None, debug_sample_rate=None, stream=None):
+    """Route the root logger through a queue to one JSON (or text) handler.
+
+    Defaults come from LOG_LEVEL, LOG_FORMAT ("json" or "text") and
+    LOG_DEBUG_SAMPLE_RATE. Returns the started QueueListener.
+    """
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    fmt = fmt or os.getenv("LOG_FORMAT", "json")
+    if debug_sample_rate is None:
+        debug_sample_rate = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1"))
+
+    handler = logging.StreamHandler(stream)
+    if fmt == "json":
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(RedactingFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    records = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(records)
+    queue_handler.addFilter(DebugSampler(debug_sample_rate))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    listener.start()
+    # Flush what is still queued on a clean exit
+    atexit.register(_stop_listener, listener)
+    return listener
+
+
+def _stop_listener(listener):
+    # Already stopped if the caller shut it down itself
+    if listener._thread is not None:
+        listener.stop()
+
+
+class ClaimLog:
+    """Fields and stage timings of one claim, logged as a single event"""
+
+    def __init__(self, event, **fields):
+        self.fields = dict(fields, event=event)
+        self.timings = {}
+        self.started = time.perf_counter()
+
+    def update(self, **fields):
+        self.fields.update(fields)
+
+    def timing(self, stage, seconds):
+        self.timings[stage] = self.timings.get(stage, 0) + seconds
+
+    def emit(self, level=logging.INFO):
+        if not logger.isEnabledFor(level):
+            return
+        fields = {key: value for key, value in self.fields.items() if value is not None}
+        fields["duration_ms"] = round((time.perf_counter() - self.started) * 1000, 3)
+        fields["timings_ms"] = {stage: round(seconds * 1000, 3) for stage, seconds in self.timings.items()}
+        logger.log(level, "%s", fields["event"], extra={"fields": fields})
+
+
+@contextmanager
+def claim_log(event, **fields):
+    """Collect one event for the `with` block and log it on exit.
+
+    Nested blocks on the same thread (a sync claim calling into the worker
+    code) add to the outer event instead of logging their own.
+    """
+    current = getattr(_current, "log", None)
+    if current is not None:
+        current.update(**fields)
+        yield current
+        return
+    log = _current.log = ClaimLog(event, **fields)
+    try:
+        yield log
+    except Exception as e:
+        log.update(error=str(e))
+        raise
+    finally:
+        _current.log = None
+        log.emit(logging.WARNING if "error" in log.fields else logging.INFO)
+
+
+def logged_claim(event):
+    """Decorator for a claim endpoint: one event per request, with its HTTP status"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with claim_log(event) as log:
+                response = view(*args, **kwargs)
+                log.update(status_code=response[1] if isinstance(response, tuple) else response.status_code)
+                return response
+        return wrapper
+    return decorator
+
+
+def log_fields(**fields):
+    """Add fields to the claim event in progress on this thread, if any"""
+    current = getattr(_current, "log", None)
+    if current is not None:
+        current.update(**fields)
+
+
+def _record_stage(seconds, labels):
+    current = getattr(_current, "log", None)
+    if current is not None:
+        current.timing(labels.get("stage"), seconds)
+
+
+# Stage timings recorded for /metrics also land in the claim's event
+CLAIM_STAGE_SECONDS.listeners.append(_record_stage)
+
+# Serverless entry points import the app without calling configure_logging()
+install_redaction()
@@ -0,0 +1,201 @@
+"""In-process metrics exported in the Prometheus text format on /metrics.
+
+Kept dependency-free and cheap enough to leave on: an observation is one
+lock, one bisect and a few additions. Counters and histograms are per
+process, like prometheus_client without multiprocess mode.
+"""
+import bisect
+import logging
+import threading
+import time
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; claims stages range from microseconds (local signing) to seconds (RPC)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in values]
+
+
+class Gauge(_Metric):
+    """Gauge read at scrape time from `collect()`, which yields (label values, value) pairs"""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labels=(), collect=None):
+        super().__init__(name, documentation, labels)
+        self.collect = collect
+
+    def samples(self):
+        if self.collect is None:
+            return []
+        try:
+            values = list(self.collect())
+        except Exception as e:
+            logger.warning(f"Could not collect {self.name}: {e}")
+            return []
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in values if value is not None]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._values = {}
+        # Called as listener(value, labels) on every observation
+        self.listeners = []
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+        for listener in self.listeners:
+            listener(value, labels)
+
+    def time(self, **labels):
+        """Observe the duration of the `with` block, including when it raises"""
+        return _Timer(self, labels)
+
+    def count(self, **labels):
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        lines = []
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, key, [("le", _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class _Timer:
+    # A plain class is cheaper to enter than a @contextmanager generator
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Add a metric, or return the one already registered under its name"""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines += metric.header()
+            lines += metric.samples()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Faucet metrics shared by the request path, the send path and the RPC pool
+CLAIM_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "faucet_claim_stage_seconds", "Time spent in each stage of a claim", ("stage",),
+))
+CLAIMS_TOTAL = REGISTRY.register(Counter(
+    "faucet_claims_total", "Claims by token and outcome", ("token", "outcome"),
+))
+CLAIM_ERRORS_TOTAL = REGISTRY.register(Counter(
+    "faucet_claim_errors_total", "Claim errors by class", ("error",),
+))
+CLAIMS_SHED_TOTAL = REGISTRY.register(Counter(
+    "faucet_claims_shed_total", "Claim requests refused with 503 by admission control", ("reason",),
+))
+RPC_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "faucet_rpc_request_seconds", "JSON-RPC request latency by method", ("method",),
+))
+
+# Error classes for CLAIM_ERRORS_TOTAL
+NONCE_COLLISION = "nonce_collision"
+INSUFFICIENT_BALANCE = "insufficient_balance"
+RPC_ERROR = "rpc_error"
@@ -0,0 +1,249 @@
+import heapq
+import logging
+import threading
+
+from web3.exceptions import Web3RPCError
+
+from rate_limit import USE_REDIS
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Substrings the node uses when it rejects a transaction because of its nonce
+NONCE_ERRORS = (
+    "nonce too low",
+    "already known",
+    "could not replace",
+    "replacement transaction underpriced",
+    "nonce too high",
+)
+
+
+_account_locks = {}
+_account_locks_guard = threading.Lock()
+
+
+def account_lock(address):
+    """Per-account lock that serializes nonce assignment, signing and broadcast.
+
+    Only the send path takes it; validation, rate limiting and balance checks
+    run concurrently. Across workers the shared nonce sequence keeps nonces unique.
+    """
+    lock = _account_locks.get(address)
+    if lock is None:
+        with _account_locks_guard:
+            lock = _account_locks.setdefault(address, threading.Lock())
+    return lock
+
+
+def is_nonce_error(error):
+    """Return True if a send error means our local nonce view is stale"""
+    error_msg = str(error).lower()
+    return any(marker in error_msg for marker in NONCE_ERRORS)
+
+
+def is_rejection(error):
+    """Return True if the node answered a send with a JSON-RPC error, so it never took the transaction.
+
+    Timeouts and dropped connections are not rejections: the node may have
+    the transaction even though the answer never arrived.
+    """
+    return isinstance(error, Web3RPCError)
+
+
+class LocalNonceManager:
+    """Thread-safe nonce sequence for one account, shared by threads in one process.
+
+    The sequence is synced from the chain's 'pending' count on first use and
+    after the node rejects a nonce. Nonces handed out for transactions that
+    never reached the node are released and reused before new ones.
+    """
+
+    def __init__(self, w3, address):
+        self.w3 = w3
+        self.address = address
+        self._lock = threading.Lock()
+        self._next = None
+        self._released = []
+
+    def _fetch_chain_nonce(self):
+        return self.w3.eth.get_transaction_count(self.address, 'pending')
+
+    def sync(self):
+        """Reset the local sequence to the chain's pending nonce"""
+        chain_nonce = self._fetch_chain_nonce()
+        with self._lock:
+            self._next = chain_nonce
+            self._released = []
+        logger.info(f"Nonce sequence for {self.address} synced at {chain_nonce}")
+        return chain_nonce
+
+    def acquire(self):
+        """Hand out the lowest free nonce"""
+        with self._lock:
+            if self._next is not None:
+                return self._take()
+        # First use: fetch outside the lock, then let the first syncer win
+        chain_nonce = self._fetch_chain_nonce()
+        with self._lock:
+            if self._next is None:
+                self._next = chain_nonce
+                logger.info(f"Nonce sequence for {self.address} synced at {chain_nonce}")
+            return self._take()
+
+    def acquire_many(self, count):
+        """Hand out `count` nonces at once: released ones first, then consecutive new ones"""
+        with self._lock:
+            if self._next is not None:
+                return [self._take() for _ in range(count)]
+        chain_nonce = self._fetch_chain_nonce()
+        with self._lock:
+            if self._next is None:
+                self._next = chain_nonce
+                logger.info(f"Nonce sequence for {self.address} synced at {chain_nonce}")
+            return [self._take() for _ in range(count)]
+
+    def _take(self):
+        if self._released:
+            return heapq.heappop(self._released)
+        nonce = self._next
+        self._next += 1
+        return nonce
+
+    def release(self, nonce):
+        """Return a nonce whose transaction was never accepted by the node"""
+        with self._lock:
+            if self._next is None or nonce >= self._next or nonce in self._released:
+                return
+            if nonce == self._next - 1:
+                self._next -= 1
+            else:
+                heapq.heappush(self._released, nonce)
+        logger.info(f"Released nonce {nonce} for {self.address}")
+
+    def resync(self):
+        """Called when the node rejected a nonce or a send may have landed; the chain view wins"""
+        logger.warning(f"Resyncing nonce sequence for {self.address}")
+        return self.sync()
+
+
+# Pops the lowest released nonce, or increments the shared counter.
+# Returns -1 when the counter has not been synced yet.
+_ACQUIRE_SCRIPT = """
+local gap = redis.call('ZPOPMIN', KEYS[2])
+if gap[1] then
+    return tonumber(gap[1])
+end
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+return redis.call('INCR', KEYS[1]) - 1
+"""
+
+# Same as above for ARGV[1] nonces: released gaps first, then one INCRBY
+# for the rest. Returns {-1} when the counter has not been synced yet.
+_ACQUIRE_MANY_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {-1}
+end
+local count = tonumber(ARGV[1])
+local nonces = {}
+local gaps = redis.call('ZPOPMIN', KEYS[2], count)
+for i = 1, #gaps, 2 do
+    nonces[#nonces + 1] = tonumber(gaps[i])
+end
+local rest = count - #nonces
+if rest > 0 then
+    local last = redis.call('INCRBY', KEYS[1], rest)
+    for nonce = last - rest, last - 1 do
+        nonces[#nonces + 1] = nonce
+    end
+end
+return nonces
+"""
+
+# Rewinds the counter if the released nonce was the last one handed out,
+# otherwise records it as a gap to be filled by the next acquire.
+_RELEASE_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]))
+local nonce = tonumber(ARGV[1])
+if not current or nonce >= current then
+    return 0
+end
+if nonce == current - 1 then
+    redis.call('SET', KEYS[1], nonce)
+else
+    redis.call('ZADD', KEYS[2], nonce, nonce)
+end
+return 1
+"""
+
+
+class RedisNonceManager:
+    """Nonce sequence stored in Redis so several gunicorn workers share one account.
+
+    Same semantics as LocalNonceManager; acquire and release are single Lua
+    scripts so they are atomic across processes.
+    """
+
+    def __init__(self, w3, address, client):
+        self.w3 = w3
+        self.address = address
+        self.client = client
+        self.key = f"faucet:nonce:{address.lower()}"
+        self.gaps_key = f"faucet:nonce:{address.lower()}:gaps"
+        self._acquire_script = client.register_script(_ACQUIRE_SCRIPT)
+        self._release_script = client.register_script(_RELEASE_SCRIPT)
+        self._acquire_many_script = client.register_script(_ACQUIRE_MANY_SCRIPT)
+
+    def _fetch_chain_nonce(self):
+        return self.w3.eth.get_transaction_count(self.address, 'pending')
+
+    def sync(self):
+        """Reset the shared sequence to the chain's pending nonce"""
+        chain_nonce = self._fetch_chain_nonce()
+        pipe = self.client.pipeline()
+        pipe.set(self.key, chain_nonce)
+        pipe.delete(self.gaps_key)
+        pipe.execute()
+        logger.info(f"Nonce sequence for {self.address} synced at {chain_nonce}")
+        return chain_nonce
+
+    def acquire(self):
+        """Hand out the lowest free nonce"""
+        nonce = self._acquire_script(keys=[self.key, self.gaps_key])
+        if nonce >= 0:
+            return nonce
+        # First use: only the first worker to sync sets the counter
+        chain_nonce = self._fetch_chain_nonce()
+        if self.client.set(self.key, chain_nonce, nx=True):
+            logger.info(f"Nonce sequence for {self.address} synced at {chain_nonce}")
+        return self._acquire_script(keys=[self.key, self.gaps_key])
+
+    def acquire_many(self, count):
+        """Hand out `count` nonces at once: released ones first, then consecutive new ones"""
+        nonces = self._acquire_many_script(keys=[self.key, self.gaps_key], args=[count])
+        if nonces[0] >= 0:
+            return nonces
+        chain_nonce = self._fetch_chain_nonce()
+        if self.client.set(self.key, chain_nonce, nx=True):
+            logger.info(f"Nonce sequence for {self.address} synced at {chain_nonce}")
+        return self._acquire_many_script(keys=[self.key, self.gaps_key], args=[count])
+
+    def release(self, nonce):
+        """Return a nonce whose transaction was never accepted by the node"""
+        if self._release_script(keys=[self.key, self.gaps_key], args=[nonce]):
+            logger.info(f"Released nonce {nonce} for {self.address}")
+
+    def resync(self):
+        """Called when the node rejected a nonce or a send may have landed; the chain view wins"""
+        logger.warning(f"Resyncing nonce sequence for {self.address}")
+        return self.sync()
+
+
+def create_nonce_manager(w3, address):
+    """Use the shared Redis sequence when Redis is available"""
+    if USE_REDIS:
+        from rate_limit import redis_client
+        return RedisNonceManager(w3, address, redis_client)
+    return LocalNonceManager(w3, address)
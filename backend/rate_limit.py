@@ -1,82 +1,495 @@
 import redis
 import os
+import heapq
 import logging
-from datetime import datetime, timedelta
+import math
+import threading
+import time
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
-# Try to connect to Redis, fall back to in-memory storage for development
-try:
-    redis_url = os.getenv("REDIS_URL")
-    if redis_url:
-        redis_client = redis.Redis.from_url(redis_url)
-        # Test the connection
+# Redis when REDIS_URL is set, in-memory storage for development otherwise.
+# from_url does not connect, so importing makes no network call; the first
+# command opens the connection and check_redis() reports on it at startup.
+# Without a fallback, a Redis that stops answering must fail requests quickly
+# rather than hold them, hence the socket timeouts (above BLMOVE's 1s wait).
+redis_url = os.getenv("REDIS_URL")
+USE_REDIS = bool(redis_url)
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "2"))
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", "3"))
+if USE_REDIS:
+    redis_client = redis.Redis.from_url(
+        redis_url, socket_connect_timeout=REDIS_CONNECT_TIMEOUT, socket_timeout=REDIS_TIMEOUT,
+    )
+else:
+    logger.warning("No REDIS_URL provided, using in-memory rate limiting")
+
+
+def check_redis():
+    """Ping Redis and log the outcome; long-running entry points call this at startup"""
+    if not USE_REDIS:
+        return False
+    try:
         redis_client.ping()
-        USE_REDIS = True
-        logger.info("Connected to Redis")
-    else:
-        raise Exception("No REDIS_URL provided")
-except Exception as e:
-    logger.warning(f"Redis not available ({e}), using in-memory rate limiting")
-    USE_REDIS = False
+    except redis.RedisError as e:
+        logger.error(f"Redis at REDIS_URL is not reachable: {e}")
+        return False
+    logger.info("Connected to Redis")
+    return True
+
+DEFAULT_COOLDOWN = 60 * 60 * 24  # 24 hours
+# Upper bound on keys held by the in-memory limiter
+MEMORY_LIMITER_MAX_KEYS = int(os.getenv("MEMORY_LIMITER_MAX_KEYS", "100000"))
+
+# Limits checked alongside the per wallet+token cooldown. A limit of 0 disables it.
+WALLET_CLAIM_LIMIT = int(os.getenv("WALLET_CLAIM_LIMIT", "10"))  # claims per wallet across all tokens
+WALLET_WINDOW = int(os.getenv("WALLET_WINDOW", str(DEFAULT_COOLDOWN)))
+IP_CLAIM_LIMIT = int(os.getenv("IP_CLAIM_LIMIT", "20"))  # claims per client IP
+IP_WINDOW = int(os.getenv("IP_WINDOW", str(DEFAULT_COOLDOWN)))
+GLOBAL_CLAIMS_PER_MINUTE = int(os.getenv("GLOBAL_CLAIMS_PER_MINUTE", "120"))  # disbursement budget
+GLOBAL_WINDOW = 60
+
+LIMIT_COOLDOWN = "cooldown"
+LIMIT_WALLET = "wallet"
+LIMIT_IP = "ip"
+LIMIT_GLOBAL = "global"
+
+
+class RateLimitResult:
+    """Outcome of a rate limit check; truthy when the claim is allowed"""
+
+    def __init__(self, allowed, limit=None, reset_in=0):
+        self.allowed = allowed
+        self.limit = limit  # which limit tripped, None when allowed
+        self.reset_in = reset_in  # seconds until that limit resets
+
+    def __bool__(self):
+        return self.allowed
+
+    def __repr__(self):
+        return f"RateLimitResult(allowed={self.allowed}, limit={self.limit}, reset_in={self.reset_in})"
+
+
+class MemoryLimiter:
+    """Bounded in-process counter store with the same semantics as the Redis script.
+
+    Expiries use the monotonic clock and are kept in a min-heap, so expired
+    keys are swept in O(log n) each as part of normal calls. When the store
+    is full, the key closest to expiring is evicted. All operations take one
+    lock and are safe under a threaded WSGI server.
+    """
+
+    def __init__(self, max_keys=MEMORY_LIMITER_MAX_KEYS, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._counters = {}  # key -> [count, expiry]
+        self._expiries = []  # heap of (expiry, key); stale entries are skipped
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._counters)
+
+    def _sweep(self, now):
+        heap = self._expiries
+        while heap and heap[0][0] <= now:
+            expiry, key = heapq.heappop(heap)
+            entry = self._counters.get(key)
+            if entry is not None and entry[1] == expiry:
+                del self._counters[key]
+
+    def _evict(self):
+        heap = self._expiries
+        while heap:
+            expiry, key = heapq.heappop(heap)
+            entry = self._counters.get(key)
+            if entry is not None and entry[1] == expiry:
+                del self._counters[key]
+                self.evictions += 1
+                return
+
+    def _compact(self):
+        # Deleted or reset keys leave stale heap entries behind; rebuild once
+        # they outnumber live keys so the heap stays O(live keys)
+        if len(self._expiries) > 2 * len(self._counters) + 1024:
+            self._expiries = [(entry[1], key) for key, entry in self._counters.items()]
+            heapq.heapify(self._expiries)
+
+    def hit(self, limits):
+        """Check (key, limit, window) triples and count a hit on all of them if none is exhausted.
+
+        Returns None when allowed, or (index, seconds_left) for the first exhausted limit.
+        """
+        now = self.clock()
+        with self._lock:
+            self._sweep(now)
+            for index, (key, limit, _) in enumerate(limits):
+                if limit <= 0:
+                    continue
+                entry = self._counters.get(key)
+                if entry is not None and entry[0] >= limit:
+                    return index, entry[1] - now
+            for key, limit, window in limits:
+                if limit <= 0:
+                    continue
+                entry = self._counters.get(key)
+                if entry is None:
+                    if len(self._counters) >= self.max_keys:
+                        self._evict()
+                    expiry = now + window
+                    self._counters[key] = [1, expiry]
+                    heapq.heappush(self._expiries, (expiry, key))
+                else:
+                    entry[0] += 1
+            self._compact()
+            return None
+
+    def get(self, key):
+        """(count, seconds_left) for a live key, or (0, 0)"""
+        now = self.clock()
+        with self._lock:
+            entry = self._counters.get(key)
+            if entry is None or entry[1] <= now:
+                return 0, 0
+            return entry[0], entry[1] - now
+
+    def delete(self, keys):
+        with self._lock:
+            return sum(1 for key in keys if self._counters.pop(key, None) is not None)
+
+    def keys_with_prefix(self, prefix):
+        """Linear scan, only used by admin endpoints"""
+        with self._lock:
+            return [key for key in self._counters if key.startswith(prefix)]
+
+
+if not USE_REDIS:
     # In-memory fallback for development
-    memory_store = {}
+    memory_limiter = MemoryLimiter()
+
+
+def format_duration(seconds):
+    """Human readable duration like '24h 0m'"""
+    hours = seconds // 3600
+    minutes = (seconds % 3600) // 60
+    return f"{hours}h {minutes}m"
+
+
+def cooldown_key(wallet, token):
+    return f"faucet:{wallet.lower()}:{token.lower()}"
+
+
+def wallet_key(wallet):
+    return f"faucet:wallet:{wallet.lower()}"
+
+
+def ip_key(client_ip):
+    return f"faucet:ip:{client_ip}"
+
+
+def global_key(now):
+    return f"faucet:global:{int(now // GLOBAL_WINDOW)}"
+
+
+def _limits(wallet, token, client_ip, cooldown):
+    """(name, key, limit, window) for every dimension, cooldown first"""
+    now = time.time()
+    # The global budget is a fixed window, so it resets at the window boundary
+    global_window = GLOBAL_WINDOW - now % GLOBAL_WINDOW
+    return [
+        (LIMIT_COOLDOWN, cooldown_key(wallet, token), 1, cooldown),
+        (LIMIT_WALLET, wallet_key(wallet), WALLET_CLAIM_LIMIT, WALLET_WINDOW),
+        (LIMIT_IP, ip_key(client_ip or "unknown"), IP_CLAIM_LIMIT if client_ip else 0, IP_WINDOW),
+        (LIMIT_GLOBAL, global_key(now), GLOBAL_CLAIMS_PER_MINUTE, global_window),
+    ]
+
+
+# Checks every limit and, only if none has tripped, counts the claim against
+# all of them. One round-trip and atomic, so concurrent duplicates cannot both pass.
+# KEYS: one counter per limit. ARGV: limit, window_ms pairs in the same order.
+# Returns {0, index, pttl} for the first exhausted limit or {1} when allowed.
+_CHECK_SCRIPT = """
+for i = 1, #KEYS do
+    local limit = tonumber(ARGV[i * 2 - 1])
+    if limit > 0 then
+        local count = tonumber(redis.call('GET', KEYS[i]) or '0')
+        if count >= limit then
+            return {0, i, redis.call('PTTL', KEYS[i])}
+        end
+    end
+end
+for i = 1, #KEYS do
+    if tonumber(ARGV[i * 2 - 1]) > 0 then
+        if redis.call('INCR', KEYS[i]) == 1 then
+            redis.call('PEXPIRE', KEYS[i], ARGV[i * 2])
+        end
+    end
+end
+return {1}
+"""
+
+if USE_REDIS:
+    _check_script = redis_client.register_script(_CHECK_SCRIPT)
+
+
+def _script_args(limits):
+    args = []
+    for _, _, limit, window in limits:
+        args += [limit, int(window * 1000)]
+    return [key for _, key, _, _ in limits], args
+
+
+def _check_result(wallet, token, cooldown, limits, tripped):
+    """RateLimitResult from the (index, seconds left) of the limit that tripped, or None"""
+    if tripped is None:
+        logger.debug("Rate limit set for %s:%s - expires in %ss", wallet, token, cooldown)
+        return RateLimitResult(True)
+    name = limits[tripped[0]][0]
+    reset_in = max(0, math.ceil(tripped[1]))
+    logger.debug("Rate limit '%s' active for %s:%s, resets in %ss", name, wallet, token, reset_in)
+    return RateLimitResult(False, name, reset_in)
+
 
-def check_rate_limit(wallet):
+def _script_tripped(result):
+    # {1} when allowed, {0, 1-based index, pttl} when a limit tripped
+    return None if result[0] == 1 else (result[1] - 1, result[2] / 1000)
+
+
+def check_rate_limit(wallet, token, client_ip=None, cooldown=DEFAULT_COOLDOWN):
+    """Check and consume every limit for one claim in a single atomic step"""
+    limits = _limits(wallet, token, client_ip, cooldown)
     if USE_REDIS:
-        key = f"faucet:{wallet.lower()}"
-        if redis_client.exists(key):
-            logger.info(f"Rate limit active for {wallet}")
-            return False
-        redis_client.set(key, "1", ex=60*60*24)  # 24 hours expiration
-        logger.info(f"Rate limit set for {wallet} - expires in 24h")
-        return True
+        keys, args = _script_args(limits)
+        tripped = _script_tripped(_check_script(keys=keys, args=args))
     else:
         # In-memory fallback for development
-        key = wallet.lower()
-        now = datetime.now()
-        
-        if key in memory_store:
-            if now < memory_store[key]:
-                logger.info(f"Rate limit active for {wallet} until {memory_store[key]}")
-                return False
-        
-        # Set expiration 24 hours from now
-        expiry_time = now + timedelta(hours=24)
-        memory_store[key] = expiry_time
-        logger.info(f"Rate limit set for {wallet} until {expiry_time}")
-        return True
-
-def get_rate_limit_status(wallet):
+        tripped = memory_limiter.hit([(key, limit, window) for _, key, limit, window in limits])
+    return _check_result(wallet, token, cooldown, limits, tripped)
+
+
+def check_rate_limits(wallet, tokens, client_ip=None):
+    """check_rate_limit for several (token, cooldown) pairs, in one Redis round-trip.
+
+    Tokens are checked in order, so each claim counts against the wallet,
+    IP and global limits seen by the ones after it.
+    """
+    checks = [(token, cooldown, _limits(wallet, token, client_ip, cooldown)) for token, cooldown in tokens]
+    if USE_REDIS:
+        pipe = redis_client.pipeline(transaction=False)
+        for _, _, limits in checks:
+            keys, args = _script_args(limits)
+            _check_script(keys=keys, args=args, client=pipe)
+        tripped = [_script_tripped(result) for result in pipe.execute()]
+    else:
+        tripped = [memory_limiter.hit([(key, limit, window) for _, key, limit, window in limits])
+                   for _, _, limits in checks]
+    return [_check_result(wallet, token, cooldown, limits, hit)
+            for (token, cooldown, limits), hit in zip(checks, tripped)]
+
+
+def _status_key(wallet, token):
+    """Cooldown key for one token, or the wallet-wide counter without a token"""
+    if token:
+        return cooldown_key(wallet, token), 1
+    return wallet_key(wallet), WALLET_CLAIM_LIMIT
+
+
+def get_rate_limit_status(wallet, token=None):
     """Check if a wallet is rate limited and when it expires"""
+    key, limit = _status_key(wallet, token)
     if USE_REDIS:
-        key = f"faucet:{wallet.lower()}"
-        if redis_client.exists(key):
-            ttl = redis_client.ttl(key)
-            return True, ttl
+        pipe = redis_client.pipeline()
+        pipe.get(key)
+        pipe.pttl(key)
+        count, pttl = pipe.execute()
+        if count is not None and limit > 0 and int(count) >= limit:
+            return True, max(0, math.ceil(pttl / 1000))
         return False, 0
     else:
-        key = wallet.lower()
-        now = datetime.now()
-        
-        if key in memory_store:
-            if now < memory_store[key]:
-                remaining_seconds = int((memory_store[key] - now).total_seconds())
-                return True, remaining_seconds
+        count, remaining = memory_limiter.get(key)
+        if limit > 0 and count >= limit:
+            return True, math.ceil(remaining)
         return False, 0
 
-def clear_rate_limit(wallet):
-    """Clear rate limit for a wallet (admin function)"""
+
+def clear_rate_limit(wallet, token=None):
+    """Clear rate limit for a wallet (admin function).
+
+    With a token only that cooldown is cleared; without one, every cooldown
+    and the wallet-wide counter are cleared.
+    """
+    if token:
+        keys = [cooldown_key(wallet, token)]
+    else:
+        keys = [wallet_key(wallet)]
     if USE_REDIS:
-        key = f"faucet:{wallet.lower()}"
-        deleted = redis_client.delete(key)
+        if not token:
+            keys += list(redis_client.scan_iter(match=f"faucet:{wallet.lower()}:*"))
+        deleted = redis_client.delete(*keys)
         logger.info(f"Cleared rate limit for {wallet}: {'success' if deleted else 'not found'}")
         return deleted > 0
     else:
-        key = wallet.lower()
-        if key in memory_store:
-            del memory_store[key]
+        if not token:
+            keys += memory_limiter.keys_with_prefix(f"faucet:{wallet.lower()}:")
+        deleted = memory_limiter.delete(keys)
+        if deleted:
             logger.info(f"Cleared rate limit for {wallet}")
-            return True
-        return False
+        return deleted > 0
+
+
+# Wallets per pipelined round-trip in the bulk admin functions
+BULK_CHUNK = 500
+
+
+def _bulk_keys(wallets, tokens, wallet_wide=True):
+    """(wallet, token, key, limit) for each wallet's token cooldowns and, with wallet_wide, its wallet-wide counter"""
+    for wallet in wallets:
+        for token in tokens:
+            yield (wallet, token) + _status_key(wallet, token)
+        if wallet_wide:
+            yield (wallet, None) + _status_key(wallet, None)
+
+
+def _chunks(items, size=BULK_CHUNK):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _parse_limit_key(key):
+    """(wallet, token) for a cooldown or wallet-wide key, None for any other faucet key"""
+    parts = key.split(":")
+    if len(parts) != 3 or parts[0] != "faucet":
+        return None
+    if parts[1] == "wallet":
+        return parts[2], None
+    if parts[1].startswith("0x"):
+        # Cooldown keys hold the symbol lowercased; symbols are upper case
+        return parts[1], parts[2].upper()
+    return None
+
+
+def _status_entry(wallet, token, limit, count, seconds_left):
+    count = int(count or 0)
+    limited = limit > 0 and count >= limit
+    return {
+        "wallet": wallet,
+        "token": token,
+        "count": count,
+        "limit": limit,
+        "rate_limited": limited,
+        "remaining_seconds": max(0, math.ceil(seconds_left)) if limited else 0,
+    }
+
+
+def _fetch_statuses(entries):
+    """Status of each (wallet, token, key, limit); with Redis one MGET and the PTTLs in one round-trip"""
+    keys = [key for _, _, key, _ in entries]
+    if USE_REDIS:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.mget(keys)
+        for key in keys:
+            pipe.pttl(key)
+        counts, *pttls = pipe.execute()
+        values = [(count, max(0, pttl) / 1000) for count, pttl in zip(counts, pttls)]
+    else:
+        values = [memory_limiter.get(key) for key in keys]
+    return [_status_entry(wallet, token, limit, count, seconds_left)
+            for (wallet, token, _, limit), (count, seconds_left) in zip(entries, values)]
+
+
+def get_rate_limit_statuses(wallets, tokens):
+    """Yield the status of every wallet/token pair, then each wallet-wide counter (token None).
+
+    Fetched BULK_CHUNK wallets' keys per round-trip, so a long list streams
+    out without being held in memory.
+    """
+    for chunk in _chunks(_bulk_keys(wallets, tokens), BULK_CHUNK * (len(tokens) + 1)):
+        yield from _fetch_statuses(chunk)
+
+
+def _scan_limit_keys(prefix, cursor=0, page_size=1000):
+    """Yield (cursor after the page, [(wallet, token, key, limit)]) for stored limits of wallets starting with prefix"""
+    prefix = prefix.lower()
+    if not USE_REDIS:
+        # The in-memory store is walked in one go; there is no cursor to resume from
+        page = []
+        for key in memory_limiter.keys_with_prefix("faucet:"):
+            parsed = _parse_limit_key(key)
+            if parsed and parsed[0].startswith(prefix):
+                page.append(parsed + (key, 1 if parsed[1] else WALLET_CLAIM_LIMIT))
+        yield 0, page
+        return
+    while True:
+        # Both key shapes contain the wallet, and "0x" appears nowhere else in them
+        cursor, keys = redis_client.scan(cursor=cursor, match=f"faucet:*{prefix}*", count=page_size)
+        page = []
+        for key in keys:
+            key = key.decode()
+            parsed = _parse_limit_key(key)
+            if parsed and parsed[0].startswith(prefix):
+                page.append(parsed + (key, 1 if parsed[1] else WALLET_CLAIM_LIMIT))
+        yield cursor, page
+        if cursor == 0:
+            return
+
+
+def scan_rate_limits(prefix, cursor=0, max_keys=None, page_size=1000):
+    """Yield the status of every stored limit of wallets starting with `prefix`, then {"cursor": n}.
+
+    Each SCAN page is looked up with one pipelined MGET/PTTL as it arrives.
+    The final cursor is 0 when the scan is complete; otherwise pass it back
+    to resume after `max_keys` limits.
+    """
+    seen = 0
+    for cursor, page in _scan_limit_keys(prefix, cursor, page_size):
+        if page:
+            yield from _fetch_statuses(page)
+        seen += len(page)
+        if max_keys and seen >= max_keys:
+            break
+    yield {"cursor": int(cursor)}
+
+
+def _delete(keys):
+    if not keys:
+        return 0
+    if USE_REDIS:
+        pipe = redis_client.pipeline(transaction=False)
+        for chunk in _chunks(keys, 1000):
+            pipe.delete(*chunk)
+        return sum(pipe.execute())
+    return memory_limiter.delete(keys)
+
+
+def clear_rate_limits(wallets, tokens, wallet_wide=True):
+    """Clear the cooldowns of `tokens` and, with wallet_wide, the wallet-wide counter for every wallet.
+
+    Returns the number of keys that existed and were deleted.
+    """
+    deleted = 0
+    for chunk in _chunks(_bulk_keys(wallets, tokens, wallet_wide), BULK_CHUNK * (len(tokens) + 1)):
+        deleted += _delete([key for _, _, key, _ in chunk])
+    logger.info(f"Cleared {deleted} rate limits for {len(wallets)} wallets")
+    return deleted
+
+
+def clear_rate_limits_with_prefix(prefix, tokens=None, wallet_wide=True):
+    """Clear the stored limits of every wallet starting with `prefix`, one SCAN page at a time.
+
+    With `tokens` only those cooldowns (and the wallet-wide counter if
+    wallet_wide) are cleared. Returns the number of keys deleted.
+    """
+    wanted = {token.upper() for token in tokens} if tokens else None
+    deleted = 0
+    for _, page in _scan_limit_keys(prefix):
+        deleted += _delete([key for _, token, key, _ in page
+                            if (wallet_wide if token is None else wanted is None or token in wanted)])
+    logger.info(f"Cleared {deleted} rate limits for wallets starting with {prefix}")
+    return deleted
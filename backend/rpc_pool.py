@@ -0,0 +1,269 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3.providers.base import JSONBaseProvider
+
+from background import BackgroundLoop
+from metrics import RPC_REQUEST_SECONDS
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Methods sent to every healthy endpoint at once instead of the fastest one
+BROADCAST_METHODS = {"eth_sendRawTransaction"}
+
+
+class RPCEndpoint:
+    """One node URL with a pooled HTTP session and rolling health stats"""
+
+    def __init__(self, url, timeout=10, pool_size=20, alpha=0.2):
+        self.url = url
+        self.timeout = timeout
+        self.alpha = alpha
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.latency = None  # EWMA of successful call latency, seconds
+        self.error_rate = 0.0  # EWMA of failed calls, 0..1
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.block_number = None
+        self.calls = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def post(self, payload):
+        """POST a raw JSON-RPC payload and return the response body"""
+        start = time.monotonic()
+        try:
+            response = self.session.post(
+                self.url, data=payload, timeout=self.timeout,
+                headers={"Content-Type": "application/json"},
+            )
+            response.raise_for_status()
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success(time.monotonic() - start)
+        return response.content
+
+    def record_success(self, elapsed):
+        with self._lock:
+            self.calls += 1
+            self.consecutive_failures = 0
+            self.down_until = 0.0
+            self.latency = elapsed if self.latency is None else self.alpha * elapsed + (1 - self.alpha) * self.latency
+            self.error_rate *= 1 - self.alpha
+
+    def record_failure(self, max_failures=3, backoff=10):
+        with self._lock:
+            self.calls += 1
+            self.errors += 1
+            self.consecutive_failures += 1
+            self.error_rate = self.alpha + (1 - self.alpha) * self.error_rate
+            if self.consecutive_failures >= max_failures:
+                # Back off exponentially, capped at 5 minutes
+                delay = min(300, backoff * 2 ** (self.consecutive_failures - max_failures))
+                self.down_until = time.monotonic() + delay
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self.down_until
+
+    def score(self):
+        """Lower is better: latency inflated by the recent error rate"""
+        latency = self.latency if self.latency is not None else 0.0
+        return latency * (1 + 4 * self.error_rate)
+
+    def status(self):
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "latency_ms": None if self.latency is None else round(self.latency * 1000, 1),
+            "error_rate": round(self.error_rate, 3),
+            "block_number": self.block_number,
+            "calls": self.calls,
+            "errors": self.errors,
+        }
+
+
+class RPCPool(JSONBaseProvider):
+    """web3 provider over several RPC URLs.
+
+    Reads go to the fastest healthy endpoint and fail over to the next one
+    on connection errors. Raw transactions go to the fastest endpoint on the
+    calling thread and, from `broadcast_workers` shared threads, to every
+    other healthy endpoint at the same time. A background thread probes each endpoint with
+    eth_blockNumber so recovered or lagging nodes are noticed without a restart.
+    """
+
+    def __init__(self, urls, timeout=10, health_interval=15, max_block_lag=3, broadcast_workers=32):
+        super().__init__()
+        if not urls:
+            raise ValueError("RPCPool needs at least one RPC URL")
+        self.endpoints = [RPCEndpoint(url, timeout=timeout) for url in urls]
+        self.health_interval = health_interval
+        self.max_block_lag = max_block_lag
+        # Only the copies for the other endpoints use these, so one wallet's broadcast never waits for another's
+        self._executor = ThreadPoolExecutor(max_workers=broadcast_workers, thread_name_prefix="rpc-pool")
+        self._health = BackgroundLoop("rpc-health", health_interval, self.check_health)
+
+    def __str__(self):
+        return f"RPCPool({len(self.endpoints)} endpoints)"
+
+    def start(self):
+        self._health.start()
+
+    def check_health(self):
+        """Probe every endpoint and mark the ones lagging behind the best head"""
+        payload = self.encode_rpc_request("eth_blockNumber", [])
+        for endpoint in self.endpoints:
+            try:
+                response = self.decode_rpc_response(endpoint.post(payload))
+                endpoint.block_number = int(response["result"], 16)
+            except Exception as e:
+                logger.warning(f"Health check failed for {endpoint.url}: {e}")
+        heads = [e.block_number for e in self.endpoints if e.block_number is not None]
+        if not heads:
+            return
+        best = max(heads)
+        for endpoint in self.endpoints:
+            if endpoint.block_number is not None and best - endpoint.block_number > self.max_block_lag:
+                logger.warning(f"{endpoint.url} is {best - endpoint.block_number} blocks behind, skipping it")
+                endpoint.down_until = time.monotonic() + self.health_interval
+
+    def ranked(self):
+        """Healthy endpoints fastest first; all of them if none is healthy"""
+        healthy = [e for e in self.endpoints if e.healthy]
+        return sorted(healthy or self.endpoints, key=RPCEndpoint.score)
+
+    def _send(self, payload):
+        last_error = None
+        for endpoint in self.ranked():
+            try:
+                return endpoint.post(payload)
+            except Exception as e:
+                logger.warning(f"RPC call to {endpoint.url} failed, trying next endpoint: {e}")
+                last_error = e
+        raise last_error
+
+    def make_request(self, method, params):
+        self.start()
+        payload = self.encode_rpc_request(method, params)
+        with RPC_REQUEST_SECONDS.time(method=method):
+            if method in BROADCAST_METHODS:
+                return self._broadcast(payload)
+            return self.decode_rpc_response(self._send(payload))
+
+    def _fan_out(self, payload):
+        """Post to the other endpoints in the background, then yield each response body (or exception) as it lands.
+
+        The fastest endpoint is posted to on the calling thread and yielded
+        first, so a broadcast it accepts never waits on a pool thread.
+        """
+        first, *rest = self.ranked()
+        futures = [self._executor.submit(endpoint.post, payload) for endpoint in rest]
+        try:
+            yield first.post(payload)
+        except Exception as e:
+            yield e
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                yield e
+
+    def _broadcast(self, payload):
+        """Send to every healthy endpoint; the first accepted response wins.
+
+        Nodes that already got the transaction from a peer answer "already
+        known", so an error is only returned if no endpoint accepted it.
+        """
+        first_error = None
+        last_exception = None
+        for body in self._fan_out(payload):
+            try:
+                if isinstance(body, Exception):
+                    raise body
+                response = self.decode_rpc_response(body)
+            except Exception as e:
+                last_exception = e
+                continue
+            if "error" not in response:
+                return response
+            first_error = first_error or response
+        if first_error is not None:
+            return first_error
+        raise last_exception
+
+    def make_batch_request(self, requests_info):
+        """One response per request, matched by JSON-RPC id and in request order.
+
+        A request the node left unanswered gets None. A single error object
+        is returned as is when the node refused the whole batch.
+        """
+        self.start()
+        payload = self.encode_batch_rpc_request(requests_info)
+        ids = [request["id"] for request in json.loads(payload)]
+        if any(method in BROADCAST_METHODS for method, _ in requests_info):
+            with RPC_REQUEST_SECONDS.time(method="batch"):
+                response = self._broadcast_batch(payload, len(requests_info))
+        else:
+            with RPC_REQUEST_SECONDS.time(method="batch"):
+                response = self.decode_rpc_response(self._send(payload))
+        if not isinstance(response, list):
+            return response
+        by_id = {item.get("id"): item for item in response}
+        return [by_id.get(request_id) for request_id in ids]
+
+    def _broadcast_batch(self, payload, count):
+        """Batch version of _broadcast: for each of the `count` requests, any endpoint that accepted it wins"""
+        merged = {}
+        first_error = None
+        last_exception = None
+        for body in self._fan_out(payload):
+            try:
+                if isinstance(body, Exception):
+                    raise body
+                response = self.decode_rpc_response(body)
+            except Exception as e:
+                last_exception = e
+                continue
+            if not isinstance(response, list):
+                # The endpoint rejected the whole batch
+                first_error = first_error or response
+                continue
+            for item in response:
+                if item.get("id") not in merged or "error" in merged[item.get("id")]:
+                    merged[item.get("id")] = item
+            if len(merged) >= count and not any("error" in item for item in merged.values()):
+                break
+        if merged:
+            return list(merged.values())
+        if first_error is not None:
+            return first_error
+        raise last_exception
+
+    def is_connected(self, show_traceback=False):
+        return any(e.healthy for e in self.endpoints) and super().is_connected(show_traceback)
+
+    def status(self):
+        return [endpoint.status() for endpoint in self.endpoints]
+
+
+def supports_batches(provider):
+    """Whether `provider` implements JSON-RPC batches; JSONBaseProvider only declares the method"""
+    method = getattr(type(provider), "make_batch_request", None)
+    return method is not None and method is not JSONBaseProvider.make_batch_request
+
+
+def rpc_urls_from_env(environ):
+    """RPC_URLS (comma separated) or the single RPC_URL"""
+    urls = environ.get("RPC_URLS") or environ.get("RPC_URL") or "http://127.0.0.1:8545"
+    return [url.strip() for url in urls.split(",") if url.strip()]
@@ -0,0 +1,154 @@
+"""Static file manifest with precompressed variants, ETags and cache headers.
+
+Run after `npm run build` to write .gz (and .br, if the brotli package is
+installed) files next to the built assets:
+
+    cd backend && python static_assets.py static
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import sys
+import threading
+
+from flask import Response, request, send_file
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE = {".html", ".js", ".mjs", ".css", ".svg", ".json", ".map", ".txt", ".xml", ".ico", ".wasm"}
+# Files smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+# Preferred first when the client accepts both
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# Vite puts content-hashed bundles under /assets/, so they never change in place
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# Everything else (index.html above all) is revalidated with its ETag
+REVALIDATE_CACHE = "no-cache"
+
+
+def _compressible(path):
+    return os.path.splitext(path)[1].lower() in COMPRESSIBLE and os.path.getsize(path) >= MIN_COMPRESS_SIZE
+
+
+def precompress(root):
+    """Write .gz/.br siblings for every compressible file under `root`; returns how many were written"""
+    written = 0
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            if not _compressible(path):
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            with open(path + ".gz", "wb") as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            written += 1
+            if brotli is not None:
+                with open(path + ".br", "wb") as f:
+                    f.write(brotli.compress(data))
+                written += 1
+    return written
+
+
+class StaticAsset:
+    """One servable file: its resolved path, type, ETag and compressed variants"""
+
+    def __init__(self, url_path, path, immutable):
+        self.url_path = url_path
+        self.path = path
+        self.mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.cache_control = IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        self.etag = digest
+        # encoding -> (file path or in-memory bytes, etag)
+        self.variants = {}
+        for encoding, suffix in ENCODINGS:
+            if os.path.exists(path + suffix):
+                self.variants[encoding] = (path + suffix, f"{digest}-{suffix[1:]}")
+        if "gzip" not in self.variants and _compressible(path):
+            # Not precompressed at build time (e.g. on Vercel): compress once here
+            self.variants["gzip"] = (gzip.compress(data, compresslevel=6, mtime=0), f"{digest}-gz")
+
+    def choose(self, accept_encoding):
+        """(encoding or None, body, etag) for the client's Accept-Encoding"""
+        for encoding, _ in ENCODINGS:
+            if encoding in self.variants and accept_encoding[encoding]:
+                body, etag = self.variants[encoding]
+                return encoding, body, etag
+        return None, self.path, self.etag
+
+
+class StaticManifest:
+    """Maps URL paths to files under one or more static roots.
+
+    The roots are walked once, on first use, in priority order; the first
+    root that has a path wins. Afterwards every lookup is one dict hit.
+    """
+
+    def __init__(self, roots, immutable_prefix="/assets/"):
+        self.roots = roots
+        self.immutable_prefix = immutable_prefix
+        self._assets = None
+        self._lock = threading.Lock()
+
+    def build(self):
+        assets = {}
+        for root in self.roots:
+            if not os.path.isdir(root):
+                continue
+            for dirpath, _, filenames in os.walk(root):
+                for filename in filenames:
+                    if filename.endswith((".gz", ".br")):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    url_path = "/" + os.path.relpath(path, root).replace(os.sep, "/")
+                    if url_path not in assets:
+                        assets[url_path] = StaticAsset(url_path, path, url_path.startswith(self.immutable_prefix))
+        logger.info(f"Static manifest built: {len(assets)} files from {len(self.roots)} roots")
+        return assets
+
+    @property
+    def assets(self):
+        if self._assets is None:
+            with self._lock:
+                if self._assets is None:
+                    self._assets = self.build()
+        return self._assets
+
+    def get(self, url_path):
+        return self.assets.get(url_path)
+
+    def serve(self, url_path):
+        """Response for `url_path`, or None if it is not in the manifest"""
+        asset = self.get(url_path)
+        if asset is None:
+            return None
+        encoding, body, etag = asset.choose(request.accept_encodings)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        elif isinstance(body, bytes):
+            response = Response(body, mimetype=asset.mimetype)
+        else:
+            response = send_file(body, mimetype=asset.mimetype, etag=False, conditional=False, max_age=None)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = asset.cache_control
+        response.vary.add("Accept-Encoding")
+        if encoding and response.status_code == 200:
+            response.headers["Content-Encoding"] = encoding
+        return response
+
+
+if __name__ == "__main__":
+    root = sys.argv[1] if len(sys.argv) > 1 else "static"
+    print(f"Wrote {precompress(root)} compressed files under {root}")
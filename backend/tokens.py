@@ -1,3 +1,17 @@
+import json
+import logging
+import os
+import threading
+from decimal import Decimal
+
+from web3 import Web3
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Defaults used when neither TOKENS_FILE nor FAUCET_TOKENS is set.
+# Optional per-token keys: "amount" (whole tokens per claim), "gas" (fixed
+# gas limit, skips estimation) and "cooldown" (seconds between claims).
 TOKENS = {
     "DAI":  {
         "address": "0xAd22b4EC8cdd8A803d0052632566F6334A04F1F3",
@@ -16,3 +30,89 @@ TOKENS = {
         "decimals": 8
     }
 }
+
+DEFAULT_AMOUNT = 10
+DEFAULT_GAS = 120000
+DEFAULT_COOLDOWN = 60 * 60 * 24  # 24 hours
+# Headroom added on top of the one-off gas estimate
+GAS_ESTIMATE_MARGIN = 1.2
+
+
+def load_token_config():
+    """Token config from TOKENS_FILE (path to JSON), FAUCET_TOKENS (inline JSON) or the defaults"""
+    tokens_file = os.getenv("TOKENS_FILE")
+    if tokens_file:
+        with open(tokens_file) as f:
+            logger.info(f"Loading token config from {tokens_file}")
+            return json.load(f)
+    tokens_json = os.getenv("FAUCET_TOKENS")
+    if tokens_json:
+        logger.info("Loading token config from FAUCET_TOKENS")
+        return json.loads(tokens_json)
+    return TOKENS
+
+
+class Token:
+    """One faucet token with everything the claim path needs precomputed"""
+
+    def __init__(self, w3, symbol, config, abi, sender):
+        self.symbol = symbol
+        self.address = Web3.to_checksum_address(config["address"])
+        self.decimals = int(config["decimals"])
+        self.amount = config.get("amount", DEFAULT_AMOUNT)
+        self.raw_amount = int(Decimal(str(self.amount)) * 10 ** self.decimals)
+        self.cooldown = int(config.get("cooldown", DEFAULT_COOLDOWN))
+        self.contract = w3.eth.contract(address=self.address, abi=abi)
+        self.sender = sender
+        self._gas = config.get("gas")
+        self._gas_lock = threading.Lock()
+
+    @property
+    def gas(self):
+        """Gas limit for one transfer, estimated on first use and then cached"""
+        if self._gas is None:
+            with self._gas_lock:
+                if self._gas is None:
+                    self._gas = self._estimate_gas()
+        return self._gas
+
+    def _estimate_gas(self):
+        try:
+            estimate = self.contract.functions.transfer(self.sender, self.raw_amount).estimate_gas({"from": self.sender})
+            gas = int(estimate * GAS_ESTIMATE_MARGIN)
+            logger.info(f"Estimated {self.symbol} transfer gas: {estimate}, using {gas}")
+            return gas
+        except Exception as e:
+            logger.warning(f"Could not estimate {self.symbol} transfer gas, using {DEFAULT_GAS}: {e}")
+            return DEFAULT_GAS
+
+    def to_units(self, raw_amount):
+        """Convert a raw on-chain amount to whole tokens (for logging)"""
+        return raw_amount / 10 ** self.decimals
+
+
+class TokenRegistry:
+    """Tokens by symbol, built once at startup"""
+
+    def __init__(self, w3, abi, sender, config=None):
+        config = load_token_config() if config is None else config
+        self._tokens = {
+            symbol: Token(w3, symbol, token_config, abi, sender)
+            for symbol, token_config in config.items()
+        }
+        logger.info(f"Loaded {len(self._tokens)} tokens: {', '.join(self._tokens)}")
+
+    def __contains__(self, symbol):
+        return symbol in self._tokens
+
+    def __getitem__(self, symbol):
+        return self._tokens[symbol]
+
+    def __iter__(self):
+        return iter(self._tokens.values())
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def symbols(self):
+        return list(self._tokens)
@@ -0,0 +1,216 @@
+import logging
+import math
+import threading
+import time
+
+from background import BackgroundLoop
+from claims import CONFIRMED, FAILED
+from nonce import account_lock, is_nonce_error
+from txbuilder import format_tx_hash
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Nodes only accept a same-nonce replacement that raises both fees by 10%
+REPLACEMENT_BUMP = 1.125
+
+
+class TrackedTx:
+    """One nonce of one hot wallet and every transaction hash sent for it"""
+
+    def __init__(self, sender, tx, tx_hash, claim_ids):
+        self.sender = sender
+        self.tx = tx
+        self.hashes = [tx_hash]
+        self.claim_ids = list(claim_ids)
+        self.sent_at = time.monotonic()
+        self.last_sent_at = self.sent_at
+        self.replacements = 0
+
+    @property
+    def tx_hash(self):
+        return self.hashes[-1]
+
+
+class TxTracker:
+    """Follows sent transactions until they are mined.
+
+    Once per new block, the receipts of every pending hash are fetched in
+    one JSON-RPC batch. Mined transactions mark their claims confirmed (or
+    failed if they reverted) through `on_update(claim_id, **fields)`. A
+    transaction still pending `stuck_after` seconds after its last send is
+    re-signed with the same nonce and fees raised by REPLACEMENT_BUMP, up to
+    `max_fee` per gas and `max_replacements` times. One never mined after
+    `drop_after` seconds is given up on and its sender's nonce sequence is
+    resynced from the node. `on_track(sender address,
+    nonce, tx_hash, claim_ids)` is told about every newly sent transaction.
+    """
+
+    def __init__(self, w3, fee_oracle, on_update=None, on_track=None, poll_interval=4, stuck_after=180,
+                 max_fee=None, max_replacements=3, drop_after=3600):
+        self.w3 = w3
+        self.fee_oracle = fee_oracle
+        self.on_update = on_update
+        self.on_track = on_track
+        self.poll_interval = poll_interval
+        self.stuck_after = stuck_after
+        self.max_fee = max_fee or 2 * fee_oracle.max_fee_cap
+        self.max_replacements = max_replacements
+        self.drop_after = drop_after
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._loop = BackgroundLoop("tx-tracker", poll_interval, self.poll)
+        self._last_block = None
+        self.confirmed = 0
+        self.failed = 0
+        self.replaced = 0
+
+    def start(self):
+        """Start polling on the first tracked transaction"""
+        self._loop.start()
+
+    def track(self, sender, tx, tx_hash, claim_ids=()):
+        """Remember a sent transaction (the unsigned dict, for re-signing)"""
+        self.start()
+        with self._lock:
+            self._pending[(sender.address, tx["nonce"])] = TrackedTx(sender, tx, tx_hash, claim_ids)
+        if self.on_track is not None:
+            self.on_track(sender.address, tx["nonce"], tx_hash, claim_ids)
+
+    def _notify(self, entry, **fields):
+        if self.on_update is None:
+            return
+        for claim_id in entry.claim_ids:
+            try:
+                self.on_update(claim_id, **fields)
+            except Exception as e:
+                logger.warning(f"Could not update claim {claim_id}: {e}")
+
+    def poll(self):
+        """Check receipts once per new block, then replace anything stuck"""
+        if not self._pending:
+            return
+        block = self.w3.eth.block_number
+        if block != self._last_block:
+            self.check_receipts()
+            self._last_block = block
+        self.replace_stuck()
+
+    def fetch_receipts(self, hashes):
+        """Receipts by hash (None while pending), in one batch where the provider supports it"""
+        try:
+            responses = self.w3.provider.make_batch_request(
+                [("eth_getTransactionReceipt", [tx_hash]) for tx_hash in hashes]
+            )
+            # An unanswered lookup counts as pending and is retried on the next block
+            return {tx_hash: response and response.get("result") for tx_hash, response in zip(hashes, responses)}
+        except Exception as e:
+            # Not every provider supports JSON-RPC batches
+            logger.info(f"Batched receipt lookup unavailable ({e}), falling back to single calls")
+        receipts = {}
+        for tx_hash in hashes:
+            try:
+                receipts[tx_hash] = self.w3.eth.get_transaction_receipt(tx_hash)
+            except Exception:
+                receipts[tx_hash] = None
+        return receipts
+
+    def check_receipts(self):
+        with self._lock:
+            entries = list(self._pending.items())
+        if not entries:
+            return
+        receipts = self.fetch_receipts([tx_hash for _, entry in entries for tx_hash in entry.hashes])
+        now = time.monotonic()
+        for key, entry in entries:
+            mined = next(((h, receipts[h]) for h in entry.hashes if receipts.get(h)), None)
+            if mined is None:
+                if now - entry.sent_at > self.drop_after:
+                    logger.error(f"Giving up on nonce {entry.tx['nonce']} of {entry.sender.address} after {self.drop_after}s")
+                    self._finish(key, failed=True)
+                    self.resync_dropped(entry)
+                    self._notify(entry, status=FAILED, error="Transaction dropped")
+                continue
+            tx_hash, receipt = mined
+            status = receipt["status"]
+            failed = (int(status, 16) if isinstance(status, str) else status) != 1
+            self._finish(key, failed)
+            fields = {"status": FAILED, "error": "Transaction reverted"} if failed else {"status": CONFIRMED}
+            if tx_hash != entry.tx_hash:
+                # An earlier hash was mined before its replacement
+                fields["tx_hash"] = tx_hash
+            self._notify(entry, **fields)
+
+    def resync_dropped(self, entry):
+        """A dropped nonce leaves a gap that holds back every later one; let the node's pending count decide"""
+        with account_lock(entry.sender.address):
+            try:
+                entry.sender.nonce_manager.resync()
+            except Exception as e:
+                logger.error(f"Nonce resync for {entry.sender.address} after dropping nonce {entry.tx['nonce']} failed: {e}")
+
+    def _finish(self, key, failed):
+        with self._lock:
+            self._pending.pop(key, None)
+            if failed:
+                self.failed += 1
+            else:
+                self.confirmed += 1
+
+    def bumped_fees(self, tx):
+        """Fees for a replacement: the current estimate or the old fees raised by the bump, whichever is higher"""
+        current = self.fee_oracle.current()
+        priority = max(current["maxPriorityFeePerGas"], math.ceil(tx["maxPriorityFeePerGas"] * REPLACEMENT_BUMP))
+        max_fee = max(current["maxFeePerGas"], math.ceil(tx["maxFeePerGas"] * REPLACEMENT_BUMP), priority)
+        return {"maxFeePerGas": max_fee, "maxPriorityFeePerGas": priority}
+
+    def replace_stuck(self):
+        now = time.monotonic()
+        with self._lock:
+            stuck = [entry for entry in self._pending.values()
+                     if now - entry.last_sent_at > self.stuck_after and entry.replacements < self.max_replacements]
+        for entry in stuck:
+            self.replace(entry)
+
+    def replace(self, entry):
+        """Re-sign the same nonce with higher fees and send it"""
+        fees = self.bumped_fees(entry.tx)
+        if fees["maxFeePerGas"] > self.max_fee:
+            logger.warning(f"Not replacing nonce {entry.tx['nonce']} of {entry.sender.address}: fee would pass the {self.max_fee} cap")
+            entry.replacements = self.max_replacements
+            return None
+        tx = dict(entry.tx, **fees)
+        with account_lock(entry.sender.address):
+            try:
+                tx_hash = self.w3.eth.send_raw_transaction(entry.sender.tx_builder.sign(tx))
+            except Exception as e:
+                if is_nonce_error(e):
+                    # Already mined, or a replacement is already in the pool
+                    logger.info(f"Replacement for nonce {tx['nonce']} of {entry.sender.address} not needed: {e}")
+                else:
+                    logger.warning(f"Replacement for nonce {tx['nonce']} of {entry.sender.address} failed: {e}")
+                entry.last_sent_at = time.monotonic()
+                return None
+        tx_hash = format_tx_hash(tx_hash)
+        with self._lock:
+            entry.tx = tx
+            entry.hashes.append(tx_hash)
+            entry.replacements += 1
+            entry.last_sent_at = time.monotonic()
+            self.replaced += 1
+        logger.warning(f"Replaced stuck nonce {tx['nonce']} of {entry.sender.address} with {tx_hash} at {fees['maxFeePerGas']} wei max fee")
+        self._notify(entry, tx_hash=tx_hash)
+        return tx_hash
+
+    def status(self):
+        """Pending count, the oldest pending age and lifetime counters"""
+        now = time.monotonic()
+        with self._lock:
+            ages = [now - entry.sent_at for entry in self._pending.values()]
+            return {
+                "pending": len(ages),
+                "oldest_pending_seconds": round(max(ages), 1) if ages else None,
+                "confirmed": self.confirmed,
+                "failed": self.failed,
+                "replaced": self.replaced,
+            }
@@ -0,0 +1,129 @@
+import logging
+
+from eth_abi import encode as abi_encode
+from eth_account import Account
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# keccak("transfer(address,uint256)")[:4]
+TRANSFER_SELECTOR = bytes.fromhex("a9059cbb")
+_ADDRESS_PADDING = bytes(12)
+# keccak("disperseToken(address,address[],uint256[])")[:4], as deployed by disperse.app
+DISPERSE_TOKEN_SELECTOR = bytes.fromhex("c73a2d60")
+
+
+def encode_transfer(to, amount):
+    """ABI-encode transfer(address,uint256) calldata without web3's contract machinery"""
+    return TRANSFER_SELECTOR + _ADDRESS_PADDING + bytes.fromhex(to[2:]) + amount.to_bytes(32, "big")
+
+
+def encode_disperse(token_address, recipients, amounts):
+    """Calldata paying every recipient its amount of `token_address` in one call"""
+    return DISPERSE_TOKEN_SELECTOR + abi_encode(
+        ["address", "address[]", "uint256[]"], [token_address, list(recipients), list(amounts)]
+    )
+
+
+def format_tx_hash(tx_hash):
+    """0x-prefixed hex string for any tx hash type web3 returns"""
+    if hasattr(tx_hash, 'hex'):
+        tx_hash_str = tx_hash.hex()
+    elif isinstance(tx_hash, bytes):
+        tx_hash_str = tx_hash.hex()
+    else:
+        tx_hash_str = str(tx_hash)
+
+    # Ensure it starts with 0x
+    if not tx_hash_str.startswith('0x'):
+        tx_hash_str = '0x' + tx_hash_str
+
+    # Validate hash format (should be 66 characters: 0x + 64 hex chars)
+    if len(tx_hash_str) != 66 or not all(c in '0123456789abcdefABCDEF' for c in tx_hash_str[2:]):
+        logger.warning(f"Invalid transaction hash format: {tx_hash_str}")
+    return tx_hash_str
+
+
+class TransferBuilder:
+    """Builds and signs EIP-1559 ERC20 transfers with no network calls.
+
+    Gas is fixed at construction, fee fields come from the fee oracle's
+    cache, and the signing key is parsed once into a LocalAccount instead of
+    on every request. `chain_id` may be a callable, called on every build
+    (ChainInfo caches it), so construction never touches the node and a
+    failed lookup is retried by the next build.
+    """
+
+    def __init__(self, private_key, chain_id, fee_oracle, gas=120000):
+        self.account = Account.from_key(private_key)
+        self.address = self.account.address
+        self._chain_id = chain_id
+        self.fee_oracle = fee_oracle
+        self.gas = gas
+
+    @property
+    def chain_id(self):
+        if callable(self._chain_id):
+            return self._chain_id()
+        return self._chain_id
+
+    def fees(self):
+        return self.fee_oracle.current()
+
+    def max_cost(self, gas, fees=None):
+        """Most ETH a transaction with this gas limit can spend"""
+        fees = fees or self.fees()
+        return gas * fees["maxFeePerGas"]
+
+    def build(self, token_address, to, amount, nonce, gas=None, fees=None):
+        """Type-2 transaction dict for token.transfer(to, amount)"""
+        fees = fees or self.fees()
+        return {
+            "type": 2,
+            "to": token_address,
+            "value": 0,
+            "data": encode_transfer(to, amount),
+            "nonce": nonce,
+            "gas": gas or self.gas,
+            "maxFeePerGas": fees["maxFeePerGas"],
+            "maxPriorityFeePerGas": fees["maxPriorityFeePerGas"],
+            "chainId": self.chain_id,
+        }
+
+    def build_value(self, to, value, nonce, fees=None):
+        """Type-2 transaction dict for a plain ETH transfer"""
+        fees = fees or self.fees()
+        return {
+            "type": 2,
+            "to": to,
+            "value": value,
+            "nonce": nonce,
+            "gas": 21000,
+            "maxFeePerGas": fees["maxFeePerGas"],
+            "maxPriorityFeePerGas": fees["maxPriorityFeePerGas"],
+            "chainId": self.chain_id,
+        }
+
+    def build_batch(self, contract, token_address, recipients, amounts, nonce, gas, fees=None):
+        """Type-2 transaction dict for contract.disperseToken(token, recipients, amounts)"""
+        fees = fees or self.fees()
+        return {
+            "type": 2,
+            "to": contract,
+            "value": 0,
+            "data": encode_disperse(token_address, recipients, amounts),
+            "nonce": nonce,
+            "gas": gas,
+            "maxFeePerGas": fees["maxFeePerGas"],
+            "maxPriorityFeePerGas": fees["maxPriorityFeePerGas"],
+            "chainId": self.chain_id,
+        }
+
+    def sign(self, tx):
+        """Return the raw signed transaction bytes"""
+        signed_tx = self.account.sign_transaction(tx)
+        # Handle both old and new eth-account versions
+        return getattr(signed_tx, 'raw_transaction', getattr(signed_tx, 'rawTransaction', None))
+
+    def build_and_sign(self, token_address, to, amount, nonce, gas=None, fees=None):
+        return self.sign(self.build(token_address, to, amount, nonce, gas, fees))
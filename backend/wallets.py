@@ -0,0 +1,227 @@
+import logging
+import threading
+import time
+
+from background import BackgroundLoop
+from balances import BalanceCache, ETH
+from nonce import create_nonce_manager
+from txbuilder import TransferBuilder
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+
+class HotWallet:
+    """One sending account: its own signer, nonce sequence and balance view"""
+
+    def __init__(self, w3, private_key, chain_id, fee_oracle, registry, poll_interval=12, refresh_blocks=1):
+        self.tx_builder = TransferBuilder(private_key, chain_id, fee_oracle)
+        self.address = self.tx_builder.address
+        self.nonce_manager = create_nonce_manager(w3, self.address)
+        self.balance_cache = BalanceCache(
+            w3, registry, self.address,
+            poll_interval=poll_interval, refresh_blocks=refresh_blocks,
+        )
+        self.in_flight = 0
+        self.sent = 0
+
+    def status(self):
+        return {
+            "address": self.address,
+            "in_flight": self.in_flight,
+            "sent": self.sent,
+            "balances": self.balance_cache.snapshot(),
+        }
+
+
+class WalletPool:
+    """Spreads claims over several hot wallets so each keeps its own nonce stream.
+
+    `acquire()` tries the wallets with the fewest transactions in flight
+    first, preferring the larger cached balance on ties, and reserves the
+    payout and gas on the first one that can cover them.
+    """
+
+    def __init__(self, wallets):
+        if not wallets:
+            raise ValueError("WalletPool needs at least one wallet")
+        self.wallets = wallets
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        return iter(self.wallets)
+
+    def __len__(self):
+        return len(self.wallets)
+
+    @property
+    def primary(self):
+        return self.wallets[0]
+
+    def _ranked(self, symbol):
+        def key(wallet):
+            balance = wallet.balance_cache.get(symbol)
+            return wallet.in_flight, -(balance or 0)
+        with self._lock:
+            return sorted(self.wallets, key=key)
+
+    def acquire(self, symbol, amount, gas_cost):
+        """Reserve `amount` of `symbol` plus gas on the least loaded wallet that has it, or None"""
+        for wallet in self._ranked(symbol):
+            if not wallet.balance_cache.reserve(symbol, amount):
+                continue
+            if not wallet.balance_cache.reserve(ETH, gas_cost):
+                wallet.balance_cache.release(symbol, amount)
+                continue
+            with self._lock:
+                wallet.in_flight += 1
+            return wallet
+        return None
+
+    def _reserve_each(self, wallet, amounts, gas_costs):
+        """Reserve every payout the wallet can cover, each with its gas; returns those symbols"""
+        reserved = []
+        for symbol, amount in amounts.items():
+            if not wallet.balance_cache.reserve(symbol, amount):
+                continue
+            if not wallet.balance_cache.reserve(ETH, gas_costs[symbol]):
+                wallet.balance_cache.release(symbol, amount)
+                continue
+            reserved.append(symbol)
+        return reserved
+
+    def _release_each(self, wallet, symbols, amounts, gas_costs):
+        for symbol in symbols:
+            wallet.balance_cache.release(symbol, amounts[symbol])
+            wallet.balance_cache.release(ETH, gas_costs[symbol])
+
+    def acquire_many(self, amounts, gas_costs):
+        """Reserve several payouts ({symbol: amount}) and their gas on one wallet.
+
+        Returns (wallet, reserved symbols): the least loaded wallet that can
+        pay every symbol, otherwise the one that can pay the most of them,
+        or (None, []) if no wallet can pay any.
+        """
+        best, best_count = None, 0
+        for wallet in self._ranked(next(iter(amounts))):
+            reserved = self._reserve_each(wallet, amounts, gas_costs)
+            if len(reserved) == len(amounts):
+                with self._lock:
+                    wallet.in_flight += 1
+                return wallet, reserved
+            self._release_each(wallet, reserved, amounts, gas_costs)
+            if len(reserved) > best_count:
+                best, best_count = wallet, len(reserved)
+        if best is None:
+            return None, []
+        # Balances may have moved since the first pass
+        reserved = self._reserve_each(best, amounts, gas_costs)
+        if not reserved:
+            return None, []
+        with self._lock:
+            best.in_flight += 1
+        return best, reserved
+
+    def finish(self, wallet, sent):
+        """Mark a wallet's claim done; `sent` is whether (or how many) transactions went out"""
+        with self._lock:
+            wallet.in_flight -= 1
+            wallet.sent += int(sent)
+
+    def has_balance_for(self, symbol, amount):
+        """Cheap pre-check: can any wallet possibly pay this?"""
+        for wallet in self.wallets:
+            balance = wallet.balance_cache.get(symbol)
+            if balance is None or balance >= amount:
+                return True
+        return False
+
+    def snapshot(self):
+        """Balances summed over every wallet, in the BalanceCache.snapshot() shape"""
+        totals = {}
+        for wallet in self.wallets:
+            for symbol, entry in wallet.balance_cache.snapshot().items():
+                total = totals.setdefault(symbol, {"balance": 0, "raw": 0, "age_seconds": 0})
+                total["balance"] += entry["balance"]
+                total["raw"] += int(entry["raw"])
+                total["age_seconds"] = max(total["age_seconds"], entry["age_seconds"])
+        for total in totals.values():
+            total["raw"] = str(total["raw"])
+        return totals
+
+    def status(self):
+        return [wallet.status() for wallet in self.wallets]
+
+
+class Rebalancer:
+    """Tops up hot wallets from a treasury account when they run low.
+
+    Every `interval` seconds each wallet's cached ETH and token balances are
+    compared with the low-water marks; a wallet below one gets a transfer
+    from the treasury bringing it up to the matching target. A wallet is not
+    topped up again for the same asset until `cooldown` seconds have passed,
+    which leaves time for the first top-up to be mined.
+    """
+
+    def __init__(self, w3, treasury_key, chain_id, fee_oracle, registry, pool,
+                 min_eth, target_eth, min_claims=20, target_claims=200, interval=60, cooldown=300):
+        self.w3 = w3
+        self.tx_builder = TransferBuilder(treasury_key, chain_id, fee_oracle)
+        self.address = self.tx_builder.address
+        self.nonce_manager = create_nonce_manager(w3, self.address)
+        self.registry = registry
+        self.pool = pool
+        self.min_eth = min_eth
+        self.target_eth = target_eth
+        self.min_claims = min_claims
+        self.target_claims = target_claims
+        self.interval = interval
+        self.cooldown = cooldown
+        self._last_topup = {}
+        self._loop = BackgroundLoop("rebalancer", interval, self.rebalance)
+
+    def start(self):
+        self._loop.start()
+
+    def thresholds(self):
+        """(symbol, low-water mark, target) for ETH and every token, in raw units"""
+        yield ETH, self.min_eth, self.target_eth
+        for token in self.registry:
+            yield token.symbol, token.raw_amount * self.min_claims, token.raw_amount * self.target_claims
+
+    def rebalance(self):
+        """Send one top-up per wallet and asset that is below its low-water mark"""
+        sent = []
+        now = time.monotonic()
+        for wallet in self.pool:
+            wallet.balance_cache.start()
+            for symbol, minimum, target in self.thresholds():
+                balance = wallet.balance_cache.get(symbol)
+                if balance is None or balance >= minimum:
+                    continue
+                last = self._last_topup.get((wallet.address, symbol))
+                if last is not None and now - last < self.cooldown:
+                    continue
+                try:
+                    tx_hash = self.top_up(wallet, symbol, target - balance)
+                except Exception as e:
+                    logger.error(f"Could not top up {symbol} on {wallet.address}: {e}")
+                    continue
+                self._last_topup[(wallet.address, symbol)] = now
+                sent.append(tx_hash)
+        return sent
+
+    def top_up(self, wallet, symbol, amount):
+        nonce = self.nonce_manager.acquire()
+        try:
+            if symbol == ETH:
+                raw_tx = self.tx_builder.sign(self.tx_builder.build_value(wallet.address, amount, nonce))
+            else:
+                token = self.registry[symbol]
+                raw_tx = self.tx_builder.build_and_sign(token.address, wallet.address, amount, nonce, gas=token.gas)
+            tx_hash = self.w3.eth.send_raw_transaction(raw_tx)
+        except Exception:
+            self.nonce_manager.resync()
+            raise
+        logger.info(f"Topped up {wallet.address} with {amount} raw {symbol} from treasury, tx_hash: {tx_hash.hex()}")
+        return tx_hash
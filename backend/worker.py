@@ -0,0 +1,46 @@
+"""Standalone claim worker.
+
+Runs the disbursement side of the faucet in its own process, reading the
+shared Redis claim queue. Run the web app with CLAIM_WORKERS=0 alongside it:
+
+    cd backend && python worker.py
+"""
+import logging
+import os
+import threading
+
+from disburse import FAUCET_ADDRESS, BATCH_CONTRACT, chain_info, disburse_batch, disburse_claim, disburse_multi, ledger, tx_tracker
+from claims import create_claim_queue, create_claim_workers
+from logs import configure_logging
+from rate_limit import check_redis
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+
+def main():
+    configure_logging()
+    count = int(os.getenv("CLAIM_WORKERS", "2")) or 1
+    claim_queue = create_claim_queue()
+    tx_tracker.on_update = claim_queue.update
+    if ledger is not None:
+        claim_queue.on_change = ledger.record
+    workers = create_claim_workers(
+        claim_queue, disburse_claim,
+        batch_handler=disburse_batch if BATCH_CONTRACT else None,
+        multi_handler=disburse_multi,
+        count=count,
+    )
+    logger.info(f"Starting claim workers for {FAUCET_ADDRESS}")
+    chain_info.log_status(FAUCET_ADDRESS)
+    check_redis()
+    workers.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        logger.info("Stopping claim workers")
+        workers.stop()
+
+
+if __name__ == "__main__":
+    main()
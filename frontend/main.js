@@ -134,6 +134,19 @@ document.getElementById("connect").onclick = async () => {
   }
 };
 
+// Poll a queued claim until it is sent, confirmed or failed
+async function waitForClaim(statusUrl, timeoutMs = 60000, intervalMs = 1000) {
+  const deadline = Date.now() + timeoutMs;
+  while (true) {
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    const resp = await fetch(statusUrl);
+    const data = await resp.json();
+    if (!resp.ok || data.status !== 'queued' || Date.now() > deadline) {
+      return { resp, data };
+    }
+  }
+}
+
 document.getElementById("claim").onclick = async () => {
   const tokenSelect = document.getElementById("token-select");
   const selectedToken = tokenSelect.value;
@@ -154,7 +167,7 @@ document.getElementById("claim").onclick = async () => {
     
     document.getElementById("output").textContent = `Claiming ${selectedToken} tokens...\nPlease wait while we process your request...`;
     
-    const resp = await fetch("/api/faucet", {
+    let resp = await fetch("/api/faucet", {
       method: "POST",
       headers: { "content-type": "application/json" },
       body: JSON.stringify({ 
@@ -163,9 +176,18 @@ document.getElementById("claim").onclick = async () => {
       })
     });
 
-    const data = await resp.json();
+    let data = await resp.json();
+
+    // Claims are queued by default; wait for the worker to send them
+    if (resp.status === 202) {
+      document.getElementById("output").textContent = `Claim queued for ${selectedToken}.\nWaiting for the transaction to be sent...`;
+      ({ resp, data } = await waitForClaim(data.status_url));
+    }
     
-    if (resp.ok) {
+    if (resp.ok && data.status === 'queued') {
+      showAlert('warning', `⏳ Your claim is still queued. Check back shortly.`);
+      document.getElementById("output").textContent = `⏳ Claim ${data.claim_id} is still queued.`;
+    } else if (resp.ok) {
       // Validate transaction hash format
       const txHash = data.tx_hash;
       let etherscanUrl;